@@ -0,0 +1,262 @@
+"""
+Rilevamento di anomalie nel Log unificato.
+
+Controlla i rifornimenti nell'ordine del Log (per data) e segnala:
+- odo_non_crescente: chilometraggio minore del rifornimento precedente
+- km_impossibili: km percorsi dal rifornimento precedente dello stesso
+  serbatoio (meno ExcludeDistance) superiori all'autonomia massima del
+  serbatoio (capacità × consumo massimo plausibile)
+- kg_oltre_capacita: carburante superiore alla capacità del serbatoio
+- prezzo_incoerente: 'Price' diverso da kg × VolumePrice oltre la tolleranza
+- consumo_anomalo: consumo con z-score oltre la soglia rispetto alla media
+  mobile dei consumi precedenti dello stesso serbatoio
+
+Le capacità dei serbatoi vengono lette da Vehicle.csv (Tank1Capacity,
+Tank2Capacity). Tutti i controlli sono vettoriali (differenze e somme
+cumulative con numpy) e producono un unico rapporto con una riga per anomalia.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from consumi import COLONNA_CONSUMO, _numerico
+from schemi_fuelio import leggi_tabella_fuelio
+
+
+# Tolleranza sul prezzo totale: arrotondamento del prezzo (€) più quello di
+# VolumePrice (2 decimali) moltiplicato per i kg
+TOLLERANZA_PREZZO = 0.05
+ARROTONDAMENTO_PREZZO_UNITARIO = 0.005
+
+# Il carburante può superare di poco la capacità nominale (es. metano a bassa temperatura)
+TOLLERANZA_CAPACITA = 0.10
+
+# Consumo massimo plausibile = fattore × consumo mediano del serbatoio
+FATTORE_CONSUMO_MASSIMO = 2.0
+
+# Media mobile dei consumi: numero di consumi precedenti e minimo per il confronto
+FINESTRA_CONSUMI = 20
+MINIMO_CONSUMI = 5
+SOGLIA_Z = 3.0
+
+ANOMALIE = ['odo_non_crescente', 'km_impossibili', 'kg_oltre_capacita',
+            'prezzo_incoerente', 'consumo_anomalo']
+
+COLONNE_RAPPORTO = ['riga', 'UniqueId', 'Data', 'TankNumber', 'Odo (km)',
+                    'anomalia', 'valore', 'riferimento']
+
+FILE_RAPPORTO = 'Log_unificato.anomalie.csv'
+
+
+def carica_capacita(file_veicolo: str = 'Vehicle.csv') -> dict:
+    """
+    Legge le capacità dei serbatoi del veicolo.
+
+    Args:
+        file_veicolo: Tabella Vehicle di Fuelio
+
+    Returns:
+        Dizionario {numero serbatoio: capacità}, senza i serbatoi a capacità 0
+    """
+    veicolo = leggi_tabella_fuelio(file_veicolo, 'Vehicle', uso='capacita').iloc[0]
+    n_serbatoi = int(pd.to_numeric(veicolo.get('TankCount'), errors='coerce') or 1)
+
+    capacita = {}
+    for serbatoio in range(1, n_serbatoi + 1):
+        valore = pd.to_numeric(veicolo.get(f'Tank{serbatoio}Capacity'), errors='coerce')
+        if pd.notna(valore) and valore > 0:
+            capacita[serbatoio] = float(valore)
+    return capacita
+
+
+def _media_mobile(valori: np.ndarray, gruppo: np.ndarray, finestra: int) -> tuple:
+    """
+    Media e deviazione standard dei 'finestra' valori precedenti dello stesso gruppo.
+
+    Args:
+        valori: Valori ordinati per gruppo
+        gruppo: Gruppo di ogni valore (contiguo)
+        finestra: Numero di valori precedenti
+
+    Returns:
+        Tupla (media, deviazione standard, numero di valori usati)
+    """
+    posizioni = np.arange(len(valori))
+    nuovo_gruppo = np.r_[True, gruppo[1:] != gruppo[:-1]]
+    inizio_gruppo = np.maximum.accumulate(np.where(nuovo_gruppo, posizioni, 0))
+    inizio = np.maximum(inizio_gruppo, posizioni - finestra)
+    numero = posizioni - inizio
+
+    somma = np.r_[0.0, np.cumsum(valori)]
+    quadrati = np.r_[0.0, np.cumsum(valori * valori)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = (somma[posizioni] - somma[inizio]) / numero
+        varianza = (quadrati[posizioni] - quadrati[inizio]) / numero - media * media
+        deviazione = np.sqrt(np.maximum(varianza * numero / (numero - 1), 0))
+    return media, deviazione, numero
+
+
+def rileva_anomalie(df: pd.DataFrame, capacita: dict = None,
+                    consumo_massimo: dict = None,
+                    tolleranza_prezzo: float = TOLLERANZA_PREZZO,
+                    finestra: int = FINESTRA_CONSUMI,
+                    soglia_z: float = SOGLIA_Z) -> pd.DataFrame:
+    """
+    Esegue tutti i controlli sul Log e restituisce le anomalie trovate.
+
+    Args:
+        df: DataFrame nel formato Log (viene ordinato per data se non lo è)
+        capacita: Capacità dei serbatoi {serbatoio: capacità}; senza capacità
+            i controlli su kg e km del serbatoio vengono saltati
+        consumo_massimo: Consumo massimo plausibile {serbatoio: km per unità}
+            (default: FATTORE_CONSUMO_MASSIMO × consumo mediano del serbatoio)
+        tolleranza_prezzo: Differenza massima in € tra Price e kg × VolumePrice
+        finestra: Numero di consumi precedenti per la media mobile
+        soglia_z: Z-score oltre il quale un consumo è anomalo
+
+    Returns:
+        DataFrame con colonne COLONNE_RAPPORTO, una riga per anomalia, nell'ordine del Log
+    """
+    capacita = capacita or {}
+    consumo_massimo = dict(consumo_massimo or {})
+
+    if len(df) == 0:
+        return pd.DataFrame(columns=COLONNE_RAPPORTO)
+    if not df['Data'].is_monotonic_increasing:
+        df = df.sort_values('Data', kind='stable')
+
+    odo = _numerico(df['Odo (km)'])
+    kg = _numerico(df['kg'])
+    serbatoio = np.nan_to_num(_numerico(df['TankNumber'])).astype(np.int64)
+    escludi = np.nan_to_num(_numerico(df['ExcludeDistance']))
+    prezzo = _numerico(df['Price (optional)'])
+    prezzo_unitario = _numerico(df['VolumePrice'])
+    consumo = _numerico(df[COLONNA_CONSUMO])
+    consumo = np.where(consumo > 0, consumo, np.nan)  # Fuelio scrive 0 dove il consumo non è calcolabile
+
+    # Ordine per serbatoio mantenendo l'ordine cronologico
+    ordine = np.argsort(serbatoio, kind='stable')
+    serbatoio_ordinato = serbatoio[ordine]
+    stesso_serbatoio = np.r_[False, serbatoio_ordinato[1:] == serbatoio_ordinato[:-1]]
+    inizi = np.flatnonzero(~stesso_serbatoio)
+    serbatoi = serbatoio_ordinato[inizi]
+
+    # Capacità e consumo massimo di ogni serbatoio (NaN se non disponibili)
+    consumo_ordinato = consumo[ordine]
+    for numero, consumi_serbatoio in zip(serbatoi, np.split(consumo_ordinato, inizi[1:])):
+        if numero not in consumo_massimo and not np.isnan(consumi_serbatoio).all():
+            consumo_massimo[numero] = FATTORE_CONSUMO_MASSIMO * np.nanmedian(consumi_serbatoio)
+    capacita_serbatoi = np.array([capacita.get(numero, np.nan) for numero in serbatoi])
+    autonomia_serbatoi = capacita_serbatoi * np.array([consumo_massimo.get(numero, np.nan) for numero in serbatoi])
+
+    trovate = []
+
+    def segnala(anomalia, posizioni, valore, riferimento):
+        trovate.append((posizioni, anomalia, valore, riferimento))
+
+    # 1. Chilometraggio minore di quello del rifornimento precedente
+    posizioni = np.flatnonzero(odo[1:] < odo[:-1]) + 1
+    segnala('odo_non_crescente', posizioni, odo[posizioni], odo[posizioni - 1])
+
+    # 2. Km dal rifornimento precedente dello stesso serbatoio oltre l'autonomia
+    km = np.diff(odo[ordine], prepend=np.nan) - escludi[ordine]
+    km[~stesso_serbatoio] = np.nan
+    autonomia = autonomia_serbatoi[np.cumsum(~stesso_serbatoio) - 1]
+    fuori = np.flatnonzero(km > autonomia)
+    segnala('km_impossibili', ordine[fuori], km[fuori], autonomia[fuori])
+
+    # 3. Carburante oltre la capacità del serbatoio
+    capacita_riga = capacita_serbatoi[np.searchsorted(serbatoi, serbatoio)]
+    posizioni = np.flatnonzero(kg > capacita_riga * (1 + TOLLERANZA_CAPACITA))
+    segnala('kg_oltre_capacita', posizioni, kg[posizioni], capacita_riga[posizioni])
+
+    # 4. Prezzo totale diverso da kg × prezzo unitario
+    atteso = kg * prezzo_unitario
+    posizioni = np.flatnonzero(np.abs(prezzo - atteso) > tolleranza_prezzo + kg * ARROTONDAMENTO_PREZZO_UNITARIO)
+    segnala('prezzo_incoerente', posizioni, prezzo[posizioni], atteso[posizioni])
+
+    # 5. Consumo lontano dalla media mobile dei consumi precedenti del serbatoio
+    validi = ordine[~np.isnan(consumo_ordinato)]
+    valori = consumo[validi]
+    media, deviazione, numero = _media_mobile(valori, serbatoio[validi], finestra)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (valori - media) / deviazione
+    fuori = np.flatnonzero((numero >= MINIMO_CONSUMI) & (deviazione > 0) & (np.abs(z) > soglia_z))
+    limite = media[fuori] + np.sign(z[fuori]) * soglia_z * deviazione[fuori]
+    segnala('consumo_anomalo', validi[fuori], valori[fuori], limite)
+
+    # Rapporto unico, nell'ordine del Log e dei controlli
+    posizioni = np.concatenate([t[0] for t in trovate])
+    tipi = np.concatenate([np.full(len(t[0]), indice) for indice, t in enumerate(trovate)])
+    ordine_rapporto = np.lexsort((tipi, posizioni))
+    posizioni = posizioni[ordine_rapporto]
+
+    rapporto = pd.DataFrame({
+        'riga': df.index[posizioni],
+        'UniqueId': df['UniqueId'].iloc[posizioni].to_numpy(),
+        'Data': df['Data'].iloc[posizioni].to_numpy(),
+        'TankNumber': serbatoio[posizioni],
+        'Odo (km)': odo[posizioni],
+        'anomalia': np.array([t[1] for t in trovate], dtype=object)[tipi[ordine_rapporto]],
+        'valore': np.round(np.concatenate([t[2] for t in trovate])[ordine_rapporto], 2),
+        'riferimento': np.round(np.concatenate([t[3] for t in trovate])[ordine_rapporto], 2),
+    }, columns=COLONNE_RAPPORTO)
+    return rapporto
+
+
+def main(argv: list = None):
+    """
+    Cerca le anomalie in un Log e salva il rapporto.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Rileva anomalie di chilometraggio, prezzo e consumo nel Log unificato")
+    parser.add_argument('file_log', nargs='?', default='Log_unificato.csv',
+                        help="Log unificato o Log di Fuelio (default: Log_unificato.csv)")
+    parser.add_argument('--veicolo', default='Vehicle.csv',
+                        help="Tabella Vehicle con le capacità dei serbatoi (default: Vehicle.csv)")
+    parser.add_argument('--rapporto', default=FILE_RAPPORTO,
+                        help=f"File CSV del rapporto (default: {FILE_RAPPORTO})")
+    parser.add_argument('--soglia-z', type=float, default=SOGLIA_Z,
+                        help=f"Z-score oltre il quale un consumo è anomalo (default: {SOGLIA_Z})")
+    parser.add_argument('--finestra', type=int, default=FINESTRA_CONSUMI,
+                        help=f"Consumi precedenti nella media mobile (default: {FINESTRA_CONSUMI})")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("ANOMALIE NEL LOG")
+    print("=" * 60)
+
+    df = leggi_tabella_fuelio(args.file_log, 'Log', uso='anomalie')
+    try:
+        capacita = carica_capacita(args.veicolo)
+    except FileNotFoundError:
+        print(f"⚠ File '{args.veicolo}' non trovato: controlli sulla capacità saltati")
+        capacita = {}
+
+    print(f"\n✓ {len(df)} rifornimenti, capacità serbatoi: "
+          + (", ".join(f"{s}: {c:g}" for s, c in capacita.items()) or "non disponibili"))
+
+    rapporto = rileva_anomalie(df, capacita, finestra=args.finestra, soglia_z=args.soglia_z)
+
+    print()
+    conteggi = rapporto['anomalia'].value_counts()
+    for anomalia in ANOMALIE:
+        simbolo = '⚠' if conteggi.get(anomalia, 0) else '✅'
+        print(f"  {simbolo} {anomalia:<20} {conteggi.get(anomalia, 0)}")
+
+    if len(rapporto) > 0:
+        rapporto.to_csv(args.rapporto, index=False)
+        print(f"\n→ Rapporto salvato in: {args.rapporto}")
+        print(rapporto.head(10).to_string(index=False))
+    else:
+        print("\n✅ Nessuna anomalia trovata")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
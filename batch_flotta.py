@@ -0,0 +1,251 @@
+"""
+Elaborazione in batch di una flotta di veicoli.
+
+Cerca in una directory tutti i file 'vehicle-N-sync.csv' esportati da Fuelio
+e, per ogni veicolo, esegue in parallelo (un processo per veicolo):
+1. Separazione delle tabelle
+2. Unione dei dati storici con il Log Fuelio
+3. Riunione delle tabelle nel file esteso
+4. Verifica del file generato
+
+Ogni veicolo viene elaborato in una propria directory di output
+(es. 'output/vehicle-2/'), con il log dell'elaborazione in 'elaborazione.log'.
+Al termine viene stampato e salvato un riepilogo consolidato.
+
+File per veicolo (nella directory di input):
+- vehicle-N-sync.csv       - Export di Fuelio (obbligatorio)
+- vehicle-N-storico.xlsx   - Dati storici Excel (opzionale, stesso formato di
+                             Contabilita_consumi_Punto.xlsx)
+- vehicle-N-conversione.xlsx - Tabella conversione distributori del veicolo
+                             (opzionale, altrimenti Tabella_Conversione_Distro.xlsx)
+"""
+
+import argparse
+import contextlib
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+
+# Nome dei file di export di Fuelio (esclude i file '-sync-extended.csv')
+PATTERN_SYNC = re.compile(r'^vehicle-(\d+)-sync\.csv$')
+
+
+def trova_veicoli(input_dir: str = '.') -> list:
+    """
+    Trova i file di export dei veicoli e i relativi file storici.
+
+    Args:
+        input_dir: Directory in cui cercare i file 'vehicle-N-sync.csv'
+
+    Returns:
+        Lista di dizionari (uno per veicolo, ordinati per numero) con le chiavi
+        'veicolo', 'file_sync', 'file_excel' e 'file_conversione'
+        (None se il file non esiste)
+    """
+    input_dir = Path(input_dir)
+    conversione_comune = input_dir / 'Tabella_Conversione_Distro.xlsx'
+    veicoli = []
+
+    for file_sync in input_dir.glob('vehicle-*-sync.csv'):
+        match = PATTERN_SYNC.match(file_sync.name)
+        if not match:
+            continue
+        numero = int(match.group(1))
+
+        file_excel = input_dir / f'vehicle-{numero}-storico.xlsx'
+        file_conversione = input_dir / f'vehicle-{numero}-conversione.xlsx'
+        if not file_conversione.exists():
+            file_conversione = conversione_comune
+
+        veicoli.append({
+            'veicolo': numero,
+            'file_sync': file_sync,
+            'file_excel': file_excel if file_excel.exists() else None,
+            'file_conversione': file_conversione if file_conversione.exists() else None,
+        })
+
+    return sorted(veicoli, key=lambda v: v['veicolo'])
+
+
+def elabora_veicolo(veicolo: dict, output_dir: str, usa_cache: bool = True,
+                    duplicati: str = None) -> dict:
+    """
+    Esegue separazione, unione, riunione e verifica per un singolo veicolo.
+
+    Tutto l'output dell'elaborazione viene scritto in 'elaborazione.log' nella
+    directory del veicolo, per non mescolarlo con quello degli altri processi.
+
+    Args:
+        veicolo: Dizionario restituito da trova_veicoli
+        output_dir: Directory di output della flotta
+        usa_cache: Se True, riusa i risultati delle fasi con input invariati
+        duplicati: Politica per i rifornimenti duplicati (vedi deduplicazione.POLITICHE)
+
+    Returns:
+        Dizionario con il riepilogo dell'elaborazione del veicolo
+    """
+    # Import locali: ogni processo carica pandas solo quando serve
+    from pipeline_fuelio import crea_pipeline_fuelio, esegui_pipeline
+    from separa_tabelle_fuelio import separa_tabelle_fuelio
+
+    numero = veicolo['veicolo']
+    directory = Path(output_dir) / f'vehicle-{numero}'
+    directory.mkdir(parents=True, exist_ok=True)
+    file_output = f'vehicle-{numero}-sync-extended.csv'
+
+    riepilogo = {
+        'veicolo': numero,
+        'esito': 'ERRORE',
+        'record_fuelio': 0,
+        'record_storici': 0,
+        'record_log': 0,
+        'verifica': False,
+        'secondi': 0.0,
+        'file_output': '',
+        'errore': '',
+    }
+
+    inizio = time.perf_counter()
+    with open(directory / 'elaborazione.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            # 1. Separazione delle tabelle nella directory del veicolo
+            tabelle = separa_tabelle_fuelio(veicolo['file_sync'], directory)
+            if 'Log' not in tabelle:
+                raise ValueError(f"Tabella Log non trovata in {veicolo['file_sync'].name}")
+
+            # 2-4. Unione, riunione e verifica
+            risultati = esegui_pipeline(crea_pipeline_fuelio(
+                directory,
+                file_output=file_output,
+                usa_cache=usa_cache,
+                file_excel=veicolo['file_excel'],
+                file_conversione=veicolo['file_conversione'] or directory / 'Tabella_Conversione_Distro.xlsx',
+                usa_storico=veicolo['file_excel'] is not None,
+                duplicati=duplicati,
+            ))
+
+            storico = risultati['storico']
+            riepilogo.update({
+                'esito': 'OK' if risultati['verifica'] else 'VERIFICA FALLITA',
+                'record_fuelio': tabelle['Log'],
+                'record_storici': 0 if storico is None else len(storico),
+                'record_log': len(risultati['unito']),
+                'verifica': risultati['verifica'],
+                'file_output': str(risultati['file_fuelio']),
+            })
+        except Exception as e:
+            riepilogo['errore'] = str(e)
+            import traceback
+            traceback.print_exc()
+
+    riepilogo['secondi'] = round(time.perf_counter() - inizio, 2)
+    return riepilogo
+
+
+def elabora_flotta(input_dir: str = '.', output_dir: str = 'output', max_workers: int = None,
+                   usa_cache: bool = True, duplicati: str = None) -> list:
+    """
+    Elabora tutti i veicoli trovati in input_dir, in parallelo su un pool di processi.
+
+    Args:
+        input_dir: Directory con i file 'vehicle-N-sync.csv'
+        output_dir: Directory in cui creare una sottodirectory per ogni veicolo
+        max_workers: Numero massimo di processi (default: numero di core)
+        usa_cache: Se True, riusa i risultati delle fasi con input invariati
+        duplicati: Politica per i rifornimenti duplicati (vedi deduplicazione.POLITICHE)
+
+    Returns:
+        Lista dei riepiloghi per veicolo, ordinata per numero di veicolo
+    """
+    print("=" * 60)
+    print("ELABORAZIONE FLOTTA FUELIO")
+    print("=" * 60)
+
+    veicoli = trova_veicoli(input_dir)
+    if not veicoli:
+        print(f"\n⚠ Nessun file 'vehicle-N-sync.csv' trovato in {Path(input_dir).absolute()}")
+        return []
+
+    max_workers = max_workers or os.cpu_count()
+    print(f"\nVeicoli trovati: {len(veicoli)} (processi: {min(max_workers, len(veicoli))})")
+    for veicolo in veicoli:
+        storico = veicolo['file_excel'].name if veicolo['file_excel'] else 'nessun file storico'
+        print(f"  - {veicolo['file_sync'].name} ({storico})")
+
+    riepiloghi = []
+    inizio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(elabora_veicolo, veicolo, output_dir, usa_cache, duplicati): veicolo
+                   for veicolo in veicoli}
+        for future in as_completed(futures):
+            riepilogo = future.result()
+            riepiloghi.append(riepilogo)
+            simbolo = '✅' if riepilogo['esito'] == 'OK' else '❌'
+            print(f"  {simbolo} Veicolo {riepilogo['veicolo']}: {riepilogo['esito']} "
+                  f"({riepilogo['record_log']} record, {riepilogo['secondi']:.1f} s)")
+
+    riepiloghi.sort(key=lambda r: r['veicolo'])
+    salva_riepilogo(riepiloghi, Path(output_dir) / 'riepilogo_flotta.csv')
+
+    print("\n" + "=" * 60)
+    print("RIEPILOGO FLOTTA")
+    print("=" * 60)
+    ok = sum(1 for r in riepiloghi if r['esito'] == 'OK')
+    print(f"\nVeicoli elaborati: {ok}/{len(riepiloghi)} senza errori")
+    print(f"Record totali nel Log: {sum(r['record_log'] for r in riepiloghi):,}")
+    print(f"Tempo totale: {time.perf_counter() - inizio:.1f} s")
+    for r in riepiloghi:
+        if r['errore']:
+            print(f"  ❌ Veicolo {r['veicolo']}: {r['errore']}")
+    print(f"\nRiepilogo salvato in: {(Path(output_dir) / 'riepilogo_flotta.csv').absolute()}")
+
+    return riepiloghi
+
+
+def salva_riepilogo(riepiloghi: list, file_output: Path):
+    """
+    Salva il riepilogo consolidato della flotta in CSV.
+
+    Args:
+        riepiloghi: Lista dei riepiloghi per veicolo
+        file_output: Percorso del file CSV
+    """
+    file_output.parent.mkdir(parents=True, exist_ok=True)
+    colonne = ['veicolo', 'esito', 'record_fuelio', 'record_storici', 'record_log',
+               'verifica', 'secondi', 'file_output', 'errore']
+    with open(file_output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=colonne, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(riepiloghi)
+
+
+if __name__ == "__main__":
+    from deduplicazione import POLITICA_PREDEFINITA, POLITICHE
+
+    parser = argparse.ArgumentParser(description="Elabora tutti i veicoli di una flotta Fuelio")
+    parser.add_argument('--input', default='.', help="directory con i file vehicle-N-sync.csv")
+    parser.add_argument('--output', default='output', help="directory di output (default: output)")
+    parser.add_argument('--processi', type=int, default=None,
+                        help="numero massimo di processi (default: numero di core)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ricalcola tutte le fasi senza usare la cache")
+    parser.add_argument('--duplicati', choices=list(POLITICHE), default=POLITICA_PREDEFINITA,
+                        help="record da tenere se un rifornimento è sia nello storico sia in Fuelio "
+                             f"(default: {POLITICA_PREDEFINITA})")
+    args = parser.parse_args()
+
+    try:
+        riepiloghi = elabora_flotta(args.input, args.output, args.processi, not args.no_cache,
+                                    args.duplicati)
+        if any(r['esito'] != 'OK' for r in riepiloghi):
+            sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n⚠ Processo interrotto dall'utente")
+        sys.exit(1)
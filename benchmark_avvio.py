@@ -0,0 +1,88 @@
+"""
+Benchmark dei tempi di avvio del comando `fuelio` (main.py).
+
+Esegue più volte in un nuovo interprete l'aiuto del comando e dei
+sottocomandi definiti in main.py, e confronta la mediana con
+main.BUDGET_AVVIO_MS. Come riferimento misura anche l'avvio di un
+interprete vuoto e l'import di pandas, che i sottocomandi caricano solo
+quando vengono eseguiti.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from main import BUDGET_AVVIO_MS
+
+
+# Comandi misurati (argomenti di main.py) che devono rispettare il budget
+COMANDI_BUDGET = [
+    ['--help'],
+    ['split', '--help'],
+    ['assemble', '--help'],
+    ['verify', '--help'],
+    ['check-conversion', '--help'],
+]
+
+
+def misura_ms(comando: list, ripetizioni: int) -> float:
+    """
+    Esegue un comando più volte e restituisce la mediana del tempo trascorso.
+
+    Args:
+        comando: Comando da eseguire (lista di argomenti)
+        ripetizioni: Numero di esecuzioni
+
+    Returns:
+        Mediana dei tempi in millisecondi
+    """
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        subprocess.run(comando, stdout=subprocess.DEVNULL, check=True)
+        tempi.append((time.perf_counter() - inizio) * 1000)
+    return statistics.median(tempi)
+
+
+def main(argv: list = None):
+    """
+    Esegue il benchmark e stampa i tempi rispetto al budget.
+
+    Returns:
+        True se tutti i comandi rispettano il budget
+    """
+    parser = argparse.ArgumentParser(description="Benchmark dei tempi di avvio di fuelio")
+    parser.add_argument('--ripetizioni', type=int, default=10,
+                        help="esecuzioni per comando (default: 10)")
+    args = parser.parse_args(argv)
+
+    script = str(Path(__file__).with_name('main.py'))
+
+    print("=" * 60)
+    print("BENCHMARK AVVIO FUELIO")
+    print("=" * 60)
+    print(f"\nBudget: {BUDGET_AVVIO_MS} ms (mediana di {args.ripetizioni} esecuzioni)")
+
+    print(f"\nRiferimenti:")
+    print(f"  {'python -c pass':<32} {misura_ms([sys.executable, '-c', 'pass'], args.ripetizioni):8.1f} ms")
+    print(f"  {'python -c \"import pandas\"':<32} "
+          f"{misura_ms([sys.executable, '-c', 'import pandas'], args.ripetizioni):8.1f} ms")
+
+    print(f"\nComandi:")
+    tutto_ok = True
+    for argomenti in COMANDI_BUDGET:
+        mediana = misura_ms([sys.executable, script] + argomenti, args.ripetizioni)
+        entro = mediana <= BUDGET_AVVIO_MS
+        tutto_ok &= entro
+        print(f"  {'fuelio ' + ' '.join(argomenti):<32} {mediana:8.1f} ms {'✅' if entro else '❌'}")
+
+    print("\n" + "=" * 60)
+    return tutto_ok
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,189 @@
+"""
+Benchmark della conversione distributori su un Log sintetico.
+
+Confronta applica_conversione_distributori (join vettoriale) con la
+versione precedente basata su iterrows e assegnazioni df.at, su un Log
+sintetico di almeno 1 milione di righe, sia per i dati storici
+(chiave Distro_temp) sia per i dati Fuelio (chiave StationID).
+Verifica anche che i due metodi producano lo stesso risultato.
+
+Misura infine la ricerca approssimata dei Distro (ricerca_distributori) su
+nomi con errori di battitura, confrontata con una stima del confronto a
+coppie (difflib) di ogni nome distinto con ogni testo della tabella.
+"""
+
+import argparse
+import contextlib
+import difflib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from dati_sintetici import genera_log_fuelio, genera_storico_excel, genera_tabella_conversione
+from ricerca_distributori import SOGLIA_PREDEFINITA, costruisci_indice, migliori_distributori, normalizza_nome
+from unisci_log_storico import applica_conversione_distributori, converti_dati_excel
+
+
+# Nomi distinti usati per stimare il tempo del confronto a coppie
+CAMPIONE_COPPIE = 50
+
+
+def applica_conversione_iterrows(df: pd.DataFrame, df_conversione: pd.DataFrame,
+                                 is_storico: bool = False) -> pd.DataFrame:
+    """
+    Versione di riferimento (precedente) della conversione distributori, riga per riga.
+    
+    Args:
+        df: DataFrame da processare
+        df_conversione: DataFrame con la tabella di conversione
+        is_storico: True se sono dati storici (usa colonna Distro), False se sono dati Fuelio (usa StationID)
+        
+    Returns:
+        DataFrame con i campi distributore popolati
+    """
+    chiave = 'Conversione' if is_storico else 'StationID'
+    chiave_match = 'Distro_temp' if is_storico else 'StationID (optional)'
+    
+    df_conv_clean = df_conversione.dropna(subset=[chiave])
+    df_conv_clean = df_conv_clean.drop_duplicates(subset=[chiave], keep='first')
+    conversione_dict = df_conv_clean.set_index(chiave).to_dict('index')
+    
+    for idx, row in df.iterrows():
+        valore = row.get(chiave_match)
+        
+        if pd.isna(valore) or valore == 0 or valore == '':
+            continue
+        
+        if valore in conversione_dict:
+            info_distro = conversione_dict[valore]
+            
+            name_brand = info_distro.get('NameBrand', '')
+            description = info_distro.get('Description', '')
+            
+            if pd.notna(name_brand) and pd.notna(description) and name_brand and description:
+                df.at[idx, 'City (optional)'] = f"{name_brand} - {description}"
+            elif pd.notna(name_brand) and name_brand:
+                df.at[idx, 'City (optional)'] = name_brand
+            elif pd.notna(description) and description:
+                df.at[idx, 'City (optional)'] = description
+            
+            if 'Latitude' in info_distro and pd.notna(info_distro['Latitude']):
+                df.at[idx, 'latitude (optional)'] = info_distro['Latitude']
+            
+            if 'Longitude' in info_distro and pd.notna(info_distro['Longitude']):
+                df.at[idx, 'longitude (optional)'] = info_distro['Longitude']
+            
+            if 'StationID' in info_distro and pd.notna(info_distro['StationID']):
+                df.at[idx, 'StationID (optional)'] = info_distro['StationID']
+    
+    if 'Distro_temp' in df.columns:
+        df = df.drop('Distro_temp', axis=1)
+    
+    return df
+
+
+def introduci_errori(nomi: pd.Series, quota: float = 0.2, seed: int = 0) -> pd.Series:
+    """
+    Sostituisce un carattere a caso in una parte dei nomi (errori di battitura).
+    
+    Args:
+        nomi: Nomi originali
+        quota: Frazione dei nomi da modificare
+        seed: Seme del generatore casuale
+        
+    Returns:
+        Nomi con gli errori
+    """
+    rng = np.random.default_rng(seed)
+    nomi = nomi.astype(object).to_numpy().copy()
+    for i in np.flatnonzero((rng.random(len(nomi)) < quota) & pd.notna(nomi)):
+        nome = str(nomi[i])
+        posizione = rng.integers(len(nome))
+        nomi[i] = nome[:posizione] + chr(rng.integers(65, 91)) + nome[posizione + 1:]
+    return pd.Series(nomi)
+
+
+def confronto_a_coppie(nomi, testi: list) -> float:
+    """
+    Stima il tempo del confronto a coppie (difflib) di ogni nome distinto con ogni testo.
+    
+    Args:
+        nomi: Nomi distinti da cercare
+        testi: Testi normalizzati della tabella di conversione
+        
+    Returns:
+        Secondi stimati per tutti i nomi, misurati su un campione
+    """
+    campione = list(nomi)[:CAMPIONE_COPPIE]
+    inizio = time.perf_counter()
+    for nome in campione:
+        max(difflib.SequenceMatcher(None, nome, testo).ratio() for testo in testi)
+    return (time.perf_counter() - inizio) / len(campione) * len(nomi)
+
+
+def cronometra(funzione, *args, **kwargs):
+    """
+    Esegue una funzione sopprimendo l'output e misura il tempo trascorso.
+    
+    Returns:
+        Tupla (risultato, secondi)
+    """
+    inizio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        risultato = funzione(*args, **kwargs)
+    return risultato, time.perf_counter() - inizio
+
+
+def main(argv: list = None):
+    """
+    Esegue il benchmark e stampa i tempi e lo speedup.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark della conversione distributori")
+    parser.add_argument('--righe', type=int, default=1_000_000,
+                        help="numero di righe del Log sintetico (default: 1.000.000)")
+    parser.add_argument('--distributori', type=int, default=2_000,
+                        help="numero di distributori nella tabella di conversione")
+    args = parser.parse_args(argv)
+    
+    print("=" * 60)
+    print("BENCHMARK CONVERSIONE DISTRIBUTORI")
+    print("=" * 60)
+    print(f"\nGenerazione dati sintetici: {args.righe:,} righe, {args.distributori:,} distributori...")
+    
+    df_conversione = genera_tabella_conversione(args.distributori)
+    df_storico, _ = cronometra(converti_dati_excel, genera_storico_excel(args.righe, df_conversione))
+    df_fuelio = genera_log_fuelio(args.righe, df_conversione)
+    
+    for descrizione, df, is_storico in [('Dati storici (Distro_temp)', df_storico, True),
+                                        ('Dati Fuelio (StationID)', df_fuelio, False)]:
+        print(f"\n{descrizione}:")
+        
+        atteso, t_loop = cronometra(applica_conversione_iterrows, df.copy(), df_conversione, is_storico)
+        print(f"  → iterrows:   {t_loop:8.2f} s")
+        
+        ottenuto, t_join = cronometra(applica_conversione_distributori, df.copy(), df_conversione, is_storico)
+        print(f"  → vettoriale: {t_join:8.2f} s")
+        print(f"  → Speedup: {t_loop / t_join:,.0f}x")
+        
+        pd.testing.assert_frame_equal(ottenuto, atteso, check_dtype=False)
+        print(f"  ✅ Risultati identici")
+    
+    print(f"\nRicerca approssimata dei Distro (20% con errori di battitura):")
+    nomi = introduci_errori(df_storico['Distro_temp'])
+    indice, t_indice = cronometra(costruisci_indice, df_conversione)
+    (righe, _), t_ricerca = cronometra(migliori_distributori, nomi, indice, SOGLIA_PREDEFINITA)
+    distinti = pd.unique(nomi.dropna().map(normalizza_nome))
+    t_coppie = confronto_a_coppie(distinti, [normalizza_nome(t) for t in indice['testi']])
+    print(f"  → Nomi distinti: {len(distinti):,}, testi indicizzati: {len(indice['testi']):,}")
+    print(f"  → Costruzione indice: {t_indice:8.2f} s")
+    print(f"  → Ricerca trigrammi:  {t_ricerca:8.2f} s ({len(nomi) / t_ricerca:,.0f} nomi/s)")
+    print(f"  → A coppie (stima):   {t_coppie:8.2f} s")
+    print(f"  → Nomi associati: {(righe >= 0).mean():.1%}")
+    
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
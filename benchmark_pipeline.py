@@ -0,0 +1,326 @@
+"""
+Benchmark di tutte le fasi della pipeline su dati sintetici.
+
+Per ogni dimensione (numero totale di rifornimenti) genera con dati_sintetici
+un insieme completo di file di input (file Excel storico, tabella di
+conversione ed export 'vehicle-1-sync.csv') ed esegue in sequenza le fasi:
+
+1. separa_tabelle_fuelio
+2. carica_dati_excel (lettura del foglio senza cache)
+3. carica_log_fuelio
+4. converti_dati_excel
+5. applica_conversione_distributori (dati storici e dati Fuelio)
+6. unisci_e_ordina
+7. salva_log_unificato
+8. carica_log_fuelio_testo, unisci_e_ordina_testo e salva_log_unificato_testo
+   (unione con il testo originale delle righe Fuelio, vedi unione_testuale)
+9. riunisci_tabelle_fuelio
+10. verifica_file_fuelio
+
+Per ogni fase misura tempo reale, tempo CPU e (in una seconda esecuzione,
+perché tracemalloc rallenta il codice) il picco di memoria allocata.
+I risultati vengono salvati in JSON (default: benchmark_risultati.json),
+insieme al commit e alle versioni delle librerie, e possono essere
+confrontati con quelli di un commit precedente con --confronta.
+
+Dimensioni predefinite: 1.000, 100.000 e 1.000.000 di rifornimenti;
+--completo aggiunge 10.000.000 (richiede molta memoria e tempo).
+Il file Excel storico è limitato alle righe massime di un foglio Excel:
+oltre questo limite i rifornimenti in più finiscono nel Log di Fuelio.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dati_sintetici import genera_input_sintetici
+from lettura_excel import TIPI_CONVERSIONE, TIPI_STORICO, leggi_foglio_excel
+from riunisci_tabelle_fuelio import riunisci_tabelle_fuelio
+from separa_tabelle_fuelio import separa_tabelle_fuelio
+from unisci_log_storico import (
+    applica_conversione_distributori,
+    carica_log_fuelio,
+    converti_dati_excel,
+    salva_log_unificato,
+    unisci_e_ordina,
+)
+from unione_testuale import carica_log_fuelio_testo, salva_log_unificato_testo, unisci_e_ordina_testo
+from verifica_file_fuelio import verifica_file_fuelio
+
+
+DIMENSIONI = [1_000, 100_000, 1_000_000]
+DIMENSIONI_COMPLETE = DIMENSIONI + [10_000_000]
+
+FILE_RISULTATI = 'benchmark_risultati.json'
+
+# Da incrementare se cambia la struttura del file dei risultati
+VERSIONE_RISULTATI = 1
+
+# Peggioramento oltre il quale una fase viene segnalata nel confronto (20%)
+SOGLIA_REGRESSIONE = 0.20
+
+# Differenza minima in secondi per segnalare una fase (le fasi molto brevi sono rumorose)
+DIFFERENZA_MINIMA = 0.05
+
+
+def _copia_argomenti(args: tuple, kwargs: dict) -> tuple:
+    """
+    Copia gli argomenti DataFrame, perché alcune fasi li modificano sul posto.
+
+    Args:
+        args: Argomenti posizionali
+        kwargs: Argomenti con nome
+
+    Returns:
+        Tupla (args, kwargs) con i DataFrame copiati
+    """
+    copia = lambda v: v.copy() if isinstance(v, pd.DataFrame) else v
+    return tuple(copia(v) for v in args), {k: copia(v) for k, v in kwargs.items()}
+
+
+def misura(funzione, *args, memoria: bool = True, **kwargs) -> tuple:
+    """
+    Esegue una fase sopprimendone l'output e ne misura tempi e memoria.
+
+    Args:
+        funzione: Funzione della fase
+        *args, **kwargs: Argomenti della funzione
+        memoria: Se True, riesegue la fase con tracemalloc per misurarne il picco di memoria
+
+    Returns:
+        Tupla (risultato, misure) con misure = {'secondi', 'secondi_cpu', 'picco_memoria_mb'}
+    """
+    a, k = _copia_argomenti(args, kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        inizio, inizio_cpu = time.perf_counter(), time.process_time()
+        risultato = funzione(*a, **k)
+        secondi, secondi_cpu = time.perf_counter() - inizio, time.process_time() - inizio_cpu
+
+    picco = None
+    if memoria:
+        a, k = _copia_argomenti(args, kwargs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            try:
+                funzione(*a, **k)
+                picco = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            finally:
+                tracemalloc.stop()
+
+    return risultato, {
+        'secondi': round(secondi, 4),
+        'secondi_cpu': round(secondi_cpu, 4),
+        'picco_memoria_mb': None if picco is None else round(picco, 2),
+    }
+
+
+def benchmark_dimensione(n_rifornimenti: int, directory: Path, memoria: bool = True) -> list:
+    """
+    Genera gli input sintetici ed esegue il benchmark di tutte le fasi.
+
+    Args:
+        n_rifornimenti: Numero totale di rifornimenti
+        directory: Directory di lavoro (input e output delle fasi)
+        memoria: Se True, misura anche il picco di memoria delle fasi
+
+    Returns:
+        Lista di risultati, uno per fase
+    """
+    print(f"\n{n_rifornimenti:,} rifornimenti")
+    print("-" * 60)
+
+    inizio = time.perf_counter()
+    input_sintetici = genera_input_sintetici(directory, n_rifornimenti)
+    print(f"  Generazione input: {time.perf_counter() - inizio:.1f} s "
+          f"({input_sintetici['record_storici']:,} storici + {input_sintetici['record_fuelio']:,} Fuelio)")
+
+    risultati = []
+
+    def esegui(fase: str, righe: int, funzione, *args, **kwargs):
+        risultato, misure = misura(funzione, *args, memoria=memoria, **kwargs)
+        misure = {
+            'rifornimenti': n_rifornimenti,
+            'fase': fase,
+            'righe': righe,
+            **misure,
+            'righe_al_secondo': round(righe / misure['secondi']) if misure['secondi'] > 0 else None,
+        }
+        risultati.append(misure)
+        picco = '' if misure['picco_memoria_mb'] is None else f"  {misure['picco_memoria_mb']:10,.1f} MB"
+        print(f"  {fase:<45} {misure['secondi']:9.3f} s{picco}")
+        return risultato
+
+    n_storici = input_sintetici['record_storici']
+    n_fuelio = input_sintetici['record_fuelio']
+
+    # Le fasi scrivono i loro file (Log.csv, Log_unificato.csv, ...) nella directory di lavoro
+    with contextlib.chdir(directory):
+        esegui('separa_tabelle_fuelio', n_fuelio,
+               separa_tabelle_fuelio, input_sintetici['file_sync'], directory)
+        df_excel = esegui('carica_dati_excel', n_storici, leggi_foglio_excel,
+                          input_sintetici['file_excel'], header=2, dtype=TIPI_STORICO)
+        df_conversione = leggi_foglio_excel(input_sintetici['file_conversione'], dtype=TIPI_CONVERSIONE)
+        df_fuelio = esegui('carica_log_fuelio', n_fuelio, carica_log_fuelio, 'Log.csv')
+        df_storico = esegui('converti_dati_excel', n_storici,
+                            converti_dati_excel, df_excel, df_conversione)
+        df_storico = esegui('applica_conversione_distributori (storico)', n_storici,
+                            applica_conversione_distributori, df_storico, df_conversione, is_storico=True)
+        df_fuelio = esegui('applica_conversione_distributori (Fuelio)', n_fuelio,
+                           applica_conversione_distributori, df_fuelio, df_conversione, is_storico=False)
+        df_unito = esegui('unisci_e_ordina', n_rifornimenti, unisci_e_ordina, df_storico, df_fuelio)
+        esegui('salva_log_unificato', n_rifornimenti, salva_log_unificato, df_unito, 'Log_unificato.csv')
+        # Unione con il testo originale delle righe Fuelio (--testo-originale)
+        df_fuelio_testo = esegui('carica_log_fuelio_testo', n_fuelio, carica_log_fuelio_testo, 'Log.csv')
+        df_unito_testo = esegui('unisci_e_ordina_testo', n_rifornimenti,
+                                unisci_e_ordina_testo, df_storico, df_fuelio_testo)
+        esegui('salva_log_unificato_testo', n_rifornimenti,
+               salva_log_unificato_testo, df_unito_testo, 'Log_unificato.testo.csv')
+        esegui('riunisci_tabelle_fuelio', n_rifornimenti,
+               riunisci_tabelle_fuelio, 'vehicle-1-sync-extended.csv', directory)
+        verificato = esegui('verifica_file_fuelio', n_rifornimenti, verifica_file_fuelio,
+                            'vehicle-1-sync-extended.csv', record_attesi=n_rifornimenti)
+
+    if not verificato:
+        print("  ❌ Verifica del file generato fallita")
+
+    return risultati
+
+
+def _commit_corrente() -> str | None:
+    """
+    Restituisce l'hash del commit git corrente, se disponibile.
+
+    Returns:
+        Hash del commit, oppure None
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def salva_risultati(risultati: list, file_output: str):
+    """
+    Salva i risultati del benchmark in JSON, con le informazioni sull'ambiente.
+
+    Args:
+        risultati: Lista dei risultati per fase
+        file_output: Percorso del file JSON
+    """
+    documento = {
+        'versione': VERSIONE_RISULTATI,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_corrente(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'piattaforma': platform.platform(),
+        'cpu': os.cpu_count(),
+        'risultati': risultati,
+    }
+    with open(file_output, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, indent=2, ensure_ascii=False)
+
+
+def confronta_risultati(risultati: list, file_precedente: str, soglia: float = SOGLIA_REGRESSIONE) -> list:
+    """
+    Confronta i risultati con quelli di un'esecuzione precedente.
+
+    Args:
+        risultati: Risultati dell'esecuzione corrente
+        file_precedente: File JSON di un'esecuzione precedente
+        soglia: Peggioramento relativo oltre il quale una fase è segnalata
+
+    Returns:
+        Lista delle fasi peggiorate, come tuple (rifornimenti, fase, secondi prima, secondi ora)
+    """
+    with open(file_precedente, 'r', encoding='utf-8') as f:
+        precedente = json.load(f)
+
+    prima = {(r['rifornimenti'], r['fase']): r for r in precedente['risultati']}
+    peggiorate = []
+
+    print("\n" + "=" * 60)
+    print(f"CONFRONTO CON {file_precedente} (commit {str(precedente.get('commit'))[:10]})")
+    print("=" * 60)
+
+    for r in risultati:
+        vecchio = prima.get((r['rifornimenti'], r['fase']))
+        if vecchio is None or not vecchio['secondi']:
+            continue
+        rapporto = r['secondi'] / vecchio['secondi']
+        peggiorata = rapporto > 1 + soglia and r['secondi'] - vecchio['secondi'] > DIFFERENZA_MINIMA
+        simbolo = '⚠' if peggiorata else ' '
+        print(f" {simbolo} {r['rifornimenti']:>12,}  {r['fase']:<45} "
+              f"{vecchio['secondi']:9.3f} s → {r['secondi']:9.3f} s ({rapporto - 1:+.0%})")
+        if peggiorata:
+            peggiorate.append((r['rifornimenti'], r['fase'], vecchio['secondi'], r['secondi']))
+
+    return peggiorate
+
+
+def main(argv: list = None):
+    """
+    Esegue il benchmark e salva i risultati.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark delle fasi della pipeline su dati sintetici")
+    parser.add_argument('--dimensioni', type=int, nargs='+', default=None,
+                        help="numero di rifornimenti da provare (default: 1000 100000 1000000)")
+    parser.add_argument('--completo', action='store_true',
+                        help="prova anche 10.000.000 di rifornimenti")
+    parser.add_argument('--senza-memoria', action='store_true',
+                        help="non misura il picco di memoria (evita la seconda esecuzione delle fasi)")
+    parser.add_argument('--output', default=FILE_RISULTATI,
+                        help=f"file JSON dei risultati (default: {FILE_RISULTATI})")
+    parser.add_argument('--confronta', default=None,
+                        help="file JSON di un'esecuzione precedente con cui confrontare i tempi")
+    parser.add_argument('--directory', default=None,
+                        help="directory di lavoro per i file generati (default: temporanea)")
+    args = parser.parse_args(argv)
+
+    dimensioni = args.dimensioni or (DIMENSIONI_COMPLETE if args.completo else DIMENSIONI)
+
+    print("=" * 60)
+    print("BENCHMARK PIPELINE FUELIO")
+    print("=" * 60)
+
+    risultati = []
+    for n in dimensioni:
+        if args.directory:
+            directory = Path(args.directory) / f'rifornimenti-{n}'
+            risultati.extend(benchmark_dimensione(n, directory.absolute(), not args.senza_memoria))
+        else:
+            with tempfile.TemporaryDirectory(prefix='fuelio-benchmark-') as directory:
+                risultati.extend(benchmark_dimensione(n, Path(directory), not args.senza_memoria))
+
+    salva_risultati(risultati, args.output)
+    print(f"\nRisultati salvati in: {Path(args.output).absolute()}")
+
+    if args.confronta:
+        peggiorate = confronta_risultati(risultati, args.confronta)
+        if peggiorate:
+            print(f"\n⚠ {len(peggiorate)} fasi più lente di oltre il {SOGLIA_REGRESSIONE:.0%}")
+            sys.exit(1)
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
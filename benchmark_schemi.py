@@ -0,0 +1,78 @@
+"""
+Benchmark della lettura del Log con gli schemi di schemi_fuelio.
+
+Scrive un Log di Fuelio sintetico su un CSV temporaneo e, per la lettura
+completa e per ogni uso di sola lettura (USI), confronta la lettura di prima
+(pd.read_csv di tutto il file con inferenza dei tipi) con leggi_tabella_fuelio
+(tipi espliciti e solo le colonne dell'uso): tempo di lettura e memoria
+occupata dal DataFrame.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from dati_sintetici import genera_log_fuelio, genera_tabella_conversione
+from schemi_fuelio import USI, leggi_tabella_fuelio
+
+
+def cronometra(funzione, *args, **kwargs):
+    """
+    Esegue una funzione e misura il tempo trascorso.
+
+    Returns:
+        Tupla (risultato, secondi)
+    """
+    inizio = time.perf_counter()
+    risultato = funzione(*args, **kwargs)
+    return risultato, time.perf_counter() - inizio
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    """
+    Memoria occupata dal DataFrame, comprese le stringhe (MB).
+    """
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def main(argv: list = None):
+    """
+    Esegue il benchmark e stampa tempi e memoria prima/dopo.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark della lettura con schemi espliciti")
+    parser.add_argument('--righe', type=int, default=1_000_000,
+                        help="numero di righe del Log sintetico (default: 1.000.000)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("BENCHMARK LETTURA CON SCHEMI")
+    print("=" * 60)
+    print(f"\nGenerazione Log sintetico: {args.righe:,} righe...")
+
+    df_log = genera_log_fuelio(args.righe, genera_tabella_conversione())
+
+    with tempfile.TemporaryDirectory(prefix='fuelio-schemi-') as directory:
+        file_log = Path(directory) / 'Log.csv'
+        df_log.to_csv(file_log, index=False)
+        del df_log
+        print(f"  → {file_log.stat().st_size / 1e6:.1f} MB su disco")
+
+        prima, t_prima = cronometra(pd.read_csv, file_log)
+        mb_prima = memoria_mb(prima)
+        del prima
+
+        letture = [('completa', None)] + [(uso, uso) for uso, (tabella, _) in USI.items() if tabella == 'Log']
+
+        print(f"\n{'Lettura':<12} {'prima':>10} {'dopo':>10} {'MB prima':>10} {'MB dopo':>10}")
+        for nome, uso in letture:
+            dopo, t_dopo = cronometra(leggi_tabella_fuelio, file_log, 'Log', uso=uso)
+            print(f"{nome:<12} {t_prima:9.2f}s {t_dopo:9.2f}s {mb_prima:10.1f} {memoria_mb(dopo):10.1f}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
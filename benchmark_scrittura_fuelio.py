@@ -0,0 +1,98 @@
+"""
+Benchmark della scrittura del Log unificato.
+
+Confronta la scrittura precedente (formatta_log_unificato + df.to_csv con
+QUOTE_ALL) con scrivi_csv_fuelio, su un Log unificato sintetico (dati
+storici convertiti + Log di Fuelio), e verifica che i due file siano
+identici byte per byte. Misura anche la scrittura compressa (gzip).
+"""
+
+import argparse
+import contextlib
+import csv
+import filecmp
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from dati_sintetici import genera_log_fuelio, genera_storico_excel, genera_tabella_conversione
+from scrittura_fuelio import scrivi_csv_fuelio
+from unisci_log_storico import (
+    COLONNE_LOG,
+    FORMATI_LOG,
+    applica_conversione_distributori,
+    converti_dati_excel,
+    formatta_log_unificato,
+    unisci_e_ordina,
+)
+
+
+def scrivi_to_csv(df, file_output):
+    """
+    Scrittura di riferimento (precedente) del Log unificato con df.to_csv.
+    """
+    formatta_log_unificato(df).to_csv(file_output, index=False, quoting=csv.QUOTE_ALL)
+
+
+def cronometra(funzione, *args, **kwargs):
+    """
+    Esegue una funzione e misura il tempo trascorso.
+
+    Returns:
+        Tupla (risultato, secondi)
+    """
+    inizio = time.perf_counter()
+    risultato = funzione(*args, **kwargs)
+    return risultato, time.perf_counter() - inizio
+
+
+def main(argv: list = None):
+    """
+    Esegue il benchmark e stampa tempi, throughput e speedup.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark della scrittura del Log unificato")
+    parser.add_argument('--righe', type=int, default=1_000_000,
+                        help="numero di righe del Log sintetico (default: 1.000.000)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("BENCHMARK SCRITTURA LOG UNIFICATO")
+    print("=" * 60)
+    print(f"\nGenerazione dati sintetici: {args.righe:,} righe...")
+
+    df_conversione = genera_tabella_conversione(2_000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_storico = converti_dati_excel(genera_storico_excel(args.righe // 2, df_conversione))
+        df_storico = applica_conversione_distributori(df_storico, df_conversione, is_storico=True)
+        df_fuelio = applica_conversione_distributori(
+            genera_log_fuelio(args.righe - args.righe // 2, df_conversione), df_conversione)
+        df = unisci_e_ordina(df_storico, df_fuelio)
+
+    with tempfile.TemporaryDirectory() as directory:
+        riferimento = Path(directory) / 'to_csv.csv'
+        veloce = Path(directory) / 'scrittura_fuelio.csv'
+        compresso = Path(directory) / 'scrittura_fuelio.csv.gz'
+
+        _, t_to_csv = cronometra(scrivi_to_csv, df, riferimento)
+        _, t_veloce = cronometra(scrivi_csv_fuelio, df[COLONNE_LOG], veloce, formati=FORMATI_LOG)
+        _, t_gzip = cronometra(scrivi_csv_fuelio, df[COLONNE_LOG], compresso, formati=FORMATI_LOG)
+
+        mb = riferimento.stat().st_size / 1024 / 1024
+        print(f"\nDimensione file: {mb:,.1f} MB ({compresso.stat().st_size / 1024 / 1024:,.1f} MB gzip)")
+        print(f"  → to_csv:            {t_to_csv:8.2f} s  ({mb / t_to_csv:6.1f} MB/s, "
+              f"{len(df) / t_to_csv:,.0f} righe/s)")
+        print(f"  → scrivi_csv_fuelio: {t_veloce:8.2f} s  ({mb / t_veloce:6.1f} MB/s, "
+              f"{len(df) / t_veloce:,.0f} righe/s)")
+        print(f"  → con gzip:          {t_gzip:8.2f} s")
+        print(f"  → Speedup: {t_to_csv / t_veloce:.1f}x")
+
+        if not filecmp.cmp(riferimento, veloce, shallow=False):
+            raise AssertionError("I file scritti sono diversi")
+        print(f"  ✅ File identici byte per byte")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Cache su disco dei risultati delle fasi di elaborazione.
+
+Ogni risultato è indicizzato da un'impronta (SHA-256) calcolata su:
+- il codice sorgente del modulo della fase e di tutti i moduli del progetto
+  che importa (vedi versione_codice)
+- tutti gli argomenti, con i file di input identificati dal loro contenuto
+  e i DataFrame dal loro contenuto
+
+Se gli input di una fase non cambiano, il risultato salvato viene ricaricato
+invece di essere ricalcolato. La cache ha una dimensione massima: quando viene
+superata, vengono eliminati i risultati usati meno di recente (LRU).
+
+Le modifiche al codice del progetto invalidano la cache da sole; dopo un
+aggiornamento delle librerie (a parte pandas) o se i risultati sembrano non
+aggiornati, eseguire con --no-cache o cancellare la directory .cache_fuelio.
+"""
+
+import ast
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+
+# Directory predefinita della cache
+CARTELLA_CACHE = Path('.cache_fuelio')
+
+# Directory dei moduli del progetto, il cui sorgente entra nelle impronte
+CARTELLA_PROGETTO = Path(__file__).resolve().parent
+
+# Dimensione massima della cache in byte (500 MB)
+DIMENSIONE_MASSIMA = 500 * 1024 * 1024
+
+# Da incrementare se cambia il formato delle impronte o dei file salvati
+VERSIONE_CACHE = 2
+
+
+def impronta_file(file_path: Path) -> str:
+    """
+    Calcola l'impronta SHA-256 del contenuto di un file.
+
+    Args:
+        file_path: Percorso del file
+
+    Returns:
+        Impronta esadecimale
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for blocco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(blocco)
+    return h.hexdigest()
+
+
+def _aggiorna_impronta(h, valore: Any):
+    """
+    Aggiunge un valore all'impronta in modo deterministico.
+
+    Args:
+        h: Oggetto hashlib da aggiornare
+        valore: Valore da includere nell'impronta
+    """
+    if isinstance(valore, pd.DataFrame):
+        h.update(b'DataFrame')
+        h.update(repr(list(valore.columns)).encode())
+        h.update(repr([str(t) for t in valore.dtypes]).encode())
+        h.update(pd.util.hash_pandas_object(valore, index=True).to_numpy().tobytes())
+    elif isinstance(valore, pd.Series):
+        h.update(b'Series')
+        h.update(repr((valore.name, str(valore.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(valore, index=True).to_numpy().tobytes())
+    elif isinstance(valore, (str, Path)) and Path(valore).is_file():
+        # I file sono identificati dal contenuto, non dal percorso
+        h.update(b'File')
+        h.update(impronta_file(Path(valore)).encode())
+    elif valore is None or isinstance(valore, (bool, int, float, str, bytes)):
+        h.update(repr(valore).encode())
+    elif isinstance(valore, (list, tuple)):
+        h.update(type(valore).__name__.encode())
+        for elemento in valore:
+            _aggiorna_impronta(h, elemento)
+    elif isinstance(valore, dict):
+        h.update(b'dict')
+        for chiave in sorted(valore, key=repr):
+            _aggiorna_impronta(h, chiave)
+            _aggiorna_impronta(h, valore[chiave])
+    else:
+        h.update(pickle.dumps(valore))
+
+
+@functools.lru_cache(maxsize=None)
+def _moduli_progetto(nome_modulo: str) -> tuple:
+    """
+    Trova i moduli del progetto usati da un modulo, direttamente o indirettamente.
+
+    Vengono considerati tutti gli import del sorgente (anche quelli locali
+    dentro le funzioni) che corrispondono a un file .py della directory del
+    progetto.
+
+    Args:
+        nome_modulo: Nome del modulo di partenza
+
+    Returns:
+        Nomi dei moduli (ordinati), compreso quello di partenza
+    """
+    trovati = set()
+    da_visitare = [nome_modulo]
+    while da_visitare:
+        nome = da_visitare.pop()
+        file_modulo = CARTELLA_PROGETTO / f"{nome}.py"
+        if nome in trovati or not file_modulo.is_file():
+            continue
+        trovati.add(nome)
+        for nodo in ast.walk(ast.parse(file_modulo.read_bytes())):
+            if isinstance(nodo, ast.Import):
+                da_visitare.extend(alias.name.split('.')[0] for alias in nodo.names)
+            elif isinstance(nodo, ast.ImportFrom) and nodo.module and nodo.level == 0:
+                da_visitare.append(nodo.module.split('.')[0])
+    return tuple(sorted(trovati))
+
+
+def versione_codice(funzione: Callable) -> str:
+    """
+    Restituisce un'impronta del codice da cui dipende la funzione.
+
+    L'impronta copre il sorgente dell'intero modulo della funzione e di tutti
+    i moduli del progetto che importa: se cambia una funzione ausiliaria
+    (es. consumi.riempi_consumi per unisci_e_ordina) i risultati salvati non
+    vengono più riusati. Le librerie esterne non sono coperte, a parte la
+    versione di pandas inclusa in chiave_cache.
+
+    Args:
+        funzione: Funzione della fase
+
+    Returns:
+        Impronta esadecimale del sorgente
+    """
+    h = hashlib.sha256()
+    try:
+        # Dal file e non da __module__, che vale '__main__' se lo script è eseguito direttamente
+        file_sorgente = Path(inspect.getsourcefile(inspect.unwrap(funzione))).resolve()
+    except TypeError:
+        file_sorgente = None
+    progetto = file_sorgente is not None and file_sorgente.parent == CARTELLA_PROGETTO
+    moduli = _moduli_progetto(file_sorgente.stem) if progetto else ()
+    if not moduli:
+        # Funzione definita fuori dai file del progetto (es. in un notebook)
+        try:
+            h.update(inspect.getsource(funzione).encode('utf-8'))
+        except (OSError, TypeError):
+            h.update(f"{funzione.__module__}.{funzione.__qualname__}".encode())
+    for nome in moduli:
+        h.update(nome.encode())
+        h.update(impronta_file(CARTELLA_PROGETTO / f"{nome}.py").encode())
+    return h.hexdigest()
+
+
+def chiave_cache(funzione: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    Calcola la chiave di cache per una chiamata di funzione.
+
+    Gli argomenti non passati vengono completati con i valori predefiniti,
+    in modo che chiamate equivalenti abbiano la stessa chiave.
+
+    Args:
+        funzione: Funzione della fase
+        args: Argomenti posizionali
+        kwargs: Argomenti con nome
+
+    Returns:
+        Chiave esadecimale
+    """
+    argomenti = inspect.signature(funzione).bind(*args, **kwargs)
+    argomenti.apply_defaults()
+
+    h = hashlib.sha256()
+    h.update(f"v{VERSIONE_CACHE}|{pd.__version__}|{funzione.__qualname__}|".encode())
+    h.update(versione_codice(funzione).encode())
+    for nome, valore in argomenti.arguments.items():
+        h.update(nome.encode())
+        _aggiorna_impronta(h, valore)
+    return h.hexdigest()
+
+
+def pulisci_cache(cartella: Path = CARTELLA_CACHE, dimensione_massima: int = DIMENSIONE_MASSIMA) -> int:
+    """
+    Elimina i risultati usati meno di recente finché la cache non rientra nella dimensione massima.
+
+    Args:
+        cartella: Directory della cache
+        dimensione_massima: Dimensione massima in byte
+
+    Returns:
+        Numero di file eliminati
+    """
+    cartella = Path(cartella)
+    if not cartella.exists():
+        return 0
+
+    voci = []
+    for percorso in cartella.glob('*.pkl'):
+        try:
+            stat = percorso.stat()
+        except FileNotFoundError:
+            # Eliminato nel frattempo da un altro processo
+            continue
+        voci.append((stat.st_mtime_ns, stat.st_size, percorso))
+
+    totale = sum(dimensione for _, dimensione, _ in voci)
+    eliminati = 0
+
+    # Dal meno recente al più recente
+    for _, dimensione, percorso in sorted(voci):
+        if totale <= dimensione_massima:
+            break
+        percorso.unlink(missing_ok=True)
+        totale -= dimensione
+        eliminati += 1
+
+    return eliminati
+
+
+def con_cache(funzione: Callable, attiva: bool = True, cartella: Path = CARTELLA_CACHE,
+              dimensione_massima: int = DIMENSIONE_MASSIMA) -> Callable:
+    """
+    Restituisce una versione della funzione che salva e riusa i risultati su disco.
+
+    Esempio:
+        df_excel = con_cache(carica_dati_excel)()
+
+    Args:
+        funzione: Funzione della fase
+        attiva: Se False, la funzione viene eseguita sempre (equivale a --no-cache)
+        cartella: Directory della cache
+        dimensione_massima: Dimensione massima della cache in byte
+
+    Returns:
+        Funzione con la stessa firma dell'originale
+    """
+    if not attiva:
+        return funzione
+
+    cartella = Path(cartella)
+
+    @functools.wraps(funzione)
+    def wrapper(*args, **kwargs):
+        chiave = chiave_cache(funzione, args, kwargs)
+        percorso = cartella / f"{funzione.__name__}-{chiave[:32]}.pkl"
+
+        if percorso.exists():
+            try:
+                risultato = pd.read_pickle(percorso)
+                # Aggiorna la data di modifica per la politica LRU
+                os.utime(percorso)
+                print(f"  → Cache: risultato di {funzione.__name__} riutilizzato")
+                return risultato
+            except Exception:
+                # File corrotto o incompatibile: viene ricalcolato
+                percorso.unlink(missing_ok=True)
+
+        risultato = funzione(*args, **kwargs)
+
+        cartella.mkdir(parents=True, exist_ok=True)
+        temporaneo = percorso.with_suffix(f'.{os.getpid()}.tmp')
+        pd.to_pickle(risultato, temporaneo)
+        os.replace(temporaneo, percorso)
+        pulisci_cache(cartella, dimensione_massima)
+
+        return risultato
+
+    return wrapper
@@ -1,6 +1,8 @@
-import pandas as pd
+from cache_fasi import con_cache
+from lettura_excel import leggi_foglio_excel
 
-df = pd.read_excel('Tabella_Conversione_Distro.xlsx', header=[2])
+# Il foglio viene letto una volta per versione del file (cache indicizzata per contenuto)
+df = con_cache(leggi_foglio_excel)('Tabella_Conversione_Distro.xlsx', header=2)
 print("Colonne:", df.columns.tolist())
 print("\nPrime righe:")
 print(df.head())
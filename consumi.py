@@ -0,0 +1,189 @@
+"""
+Calcolo dei consumi "da pieno a pieno" per serbatoio.
+
+Replica il calcolo di Fuelio sul Log: per ogni serbatoio i rifornimenti sono
+ordinati per chilometraggio e ogni rifornimento con livello del serbatoio
+noto chiude un tratto che inizia dal precedente dello stesso serbatoio:
+- Full=1: pieno
+- Full=2: livello calcolato da Fuelio (TankCalc), con TankCalc il carburante
+  che mancava al pieno dopo il rifornimento
+
+    km/kg = (Odo - Odo del precedente - ExcludeDistance) / carburante
+
+dove il carburante è la somma dei kg del tratto (rifornimenti parziali
+compresi), più TankCalc del rifornimento che apre il tratto e meno TankCalc di
+quello che lo chiude; ExcludeDistance è quella del solo rifornimento che
+chiude il tratto, come fa Fuelio. Un tratto con un rifornimento saltato
+(Missed=1) o con carburante non positivo non ha consumo, così come il primo
+pieno di ogni serbatoio e i rifornimenti parziali (Full=0).
+
+Fuelio salva il consumo come 100 / (kg per 100 km arrotondati a 2 decimali):
+i valori calcolati qui differiscono da quelli dell'app per questo
+arrotondamento, molto più visibile sui consumi alti (es. 426.12 contro 434.78
+per 0.23 kg/100 km).
+
+Il calcolo è interamente vettoriale (ordinamento e somme cumulative con
+numpy), senza cicli sulle righe.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from schemi_fuelio import leggi_tabella_fuelio
+
+
+# Colonne del Log usate dal calcolo
+COLONNA_CONSUMO = 'km/l (optional)'
+COLONNE_CONSUMI = ['Odo (km)', 'kg', 'Full', 'Missed', 'ExcludeDistance', 'TankCalc']
+
+# Valori di Full con livello del serbatoio noto: pieno e livello calcolato (TankCalc)
+PIENO = 1
+LIVELLO_CALCOLATO = 2
+
+# Chiavi che identificano una sequenza di rifornimenti (per una flotta: veicolo + serbatoio)
+CHIAVI_SERBATOIO = ('TankNumber',)
+
+
+def _numerico(serie: pd.Series) -> np.ndarray:
+    """
+    Converte una colonna in un array float64 (valori non numerici come NaN).
+
+    Args:
+        serie: Colonna del Log
+
+    Returns:
+        Array di float
+    """
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def calcola_consumi(df: pd.DataFrame, chiavi=CHIAVI_SERBATOIO) -> pd.Series:
+    """
+    Calcola il consumo da pieno a pieno di ogni rifornimento.
+
+    Args:
+        df: DataFrame nel formato Log (anche non ordinato)
+        chiavi: Colonne che identificano la sequenza di un serbatoio
+
+    Returns:
+        Serie con il consumo (km per unità di carburante, 2 decimali), NaN dove
+        non è calcolabile; stesso indice di df
+    """
+    chiavi = list(chiavi)
+    if len(df) == 0:
+        return pd.Series(np.nan, index=df.index, dtype=np.float64, name=COLONNA_CONSUMO)
+
+    # Ordine stabile per serbatoio e chilometraggio
+    gruppo = df.groupby(chiavi, dropna=False).ngroup().to_numpy()
+    odo = _numerico(df['Odo (km)'])
+    ordine = np.lexsort((odo, gruppo))
+    gruppo = gruppo[ordine]
+    odo = odo[ordine]
+    kg = _numerico(df['kg'])[ordine]
+    completo = _numerico(df['Full'])[ordine]
+    pieno = (completo == PIENO) | (completo == LIVELLO_CALCOLATO)
+    # Carburante che mancava al pieno dopo il rifornimento (0 per i pieni)
+    if 'TankCalc' in df.columns:
+        mancante = np.where(completo == LIVELLO_CALCOLATO, np.nan_to_num(_numerico(df['TankCalc'])[ordine]), 0.0)
+    else:
+        mancante = np.zeros(len(ordine))
+    saltato = _numerico(df['Missed'])[ordine] == 1
+    escludi = np.nan_to_num(_numerico(df['ExcludeDistance'])[ordine])
+
+    # Un tratto inizia con un nuovo serbatoio o dopo un pieno dello stesso serbatoio
+    nuovo_gruppo = np.r_[True, gruppo[1:] != gruppo[:-1]]
+    dopo_pieno = np.r_[False, pieno[:-1]] & ~nuovo_gruppo
+    posizioni = np.arange(len(ordine))
+    primo = np.maximum.accumulate(np.where(nuovo_gruppo | dopo_pieno, posizioni, 0))
+
+    # Somme cumulative dall'inizio del tratto: carburante, rifornimenti saltati o senza kg
+    def _dal_primo(valori):
+        cumulata = np.r_[0.0, np.cumsum(valori)]
+        return cumulata[posizioni + 1] - cumulata[primo]
+
+    carburante = _dal_primo(np.nan_to_num(kg)) + mancante[np.maximum(primo - 1, 0)] - mancante
+    non_validi = _dal_primo(saltato | np.isnan(kg))
+
+    # Il tratto deve partire da un pieno dello stesso serbatoio
+    odo_precedente = np.where(dopo_pieno[primo], odo[np.maximum(primo - 1, 0)], np.nan)
+    distanza = odo - odo_precedente - escludi
+
+    validi = pieno & dopo_pieno[primo] & (non_validi == 0) & (carburante > 0) & (distanza > 0)
+    consumo = np.full(len(ordine), np.nan)
+    consumo[validi] = distanza[validi] / carburante[validi]
+
+    risultato = np.empty(len(ordine))
+    risultato[ordine] = np.round(consumo, 2)
+    return pd.Series(risultato, index=df.index, name=COLONNA_CONSUMO)
+
+
+def riempi_consumi(df: pd.DataFrame, chiavi=CHIAVI_SERBATOIO) -> pd.DataFrame:
+    """
+    Riempie il consumo dei rifornimenti che non ce l'hanno (es. i dati storici).
+
+    I consumi già presenti (scritti da Fuelio) non vengono modificati.
+
+    Args:
+        df: DataFrame nel formato Log
+        chiavi: Colonne che identificano la sequenza di un serbatoio
+
+    Returns:
+        Copia del DataFrame con il consumo calcolato dove mancava
+    """
+    df = df.copy()
+    consumi = calcola_consumi(df, chiavi)
+
+    attuale = df[COLONNA_CONSUMO]
+    mancante = attuale.isna() | attuale.astype(str).str.strip().eq('')
+    da_riempire = mancante & consumi.notna()
+
+    if da_riempire.any():
+        df[COLONNA_CONSUMO] = attuale.astype(object).where(~da_riempire, consumi)
+    return df
+
+
+def main(argv: list = None):
+    """
+    Confronta i consumi calcolati con quelli registrati da Fuelio in un Log.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Calcola i consumi da pieno a pieno di un Log di Fuelio")
+    parser.add_argument('file_log', nargs='?', default='Log.csv',
+                        help="Log di Fuelio o Log unificato (default: Log.csv)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("CONSUMI DA PIENO A PIENO")
+    print("=" * 60)
+
+    df = leggi_tabella_fuelio(args.file_log, 'Log', uso='consumi')
+    consumi = calcola_consumi(df)
+    registrati = pd.to_numeric(df[COLONNA_CONSUMO], errors='coerce')
+
+    for serbatoio, righe in df.groupby('TankNumber').groups.items():
+        calcolati = consumi.loc[righe]
+        print(f"\nSerbatoio {serbatoio}: {len(righe)} rifornimenti, {calcolati.notna().sum()} consumi calcolati")
+        if calcolati.notna().any():
+            print(f"  → Media: {calcolati.mean():.2f} km/unità "
+                  f"(min {calcolati.min():.2f}, max {calcolati.max():.2f})")
+
+        # Fuelio scrive 0 dove il consumo non è calcolabile
+        confrontabili = calcolati.notna() & registrati.loc[righe].gt(0)
+        if confrontabili.any():
+            differenza = (calcolati - registrati.loc[righe])[confrontabili].abs()
+            print(f"  → Confronto con Fuelio su {confrontabili.sum()} rifornimenti: "
+                  f"differenza media {differenza.mean():.3f}, massima {differenza.max():.2f}")
+            # Fuelio salva kg per 100 km a 2 decimali: il confronto in quell'unità è il più preciso
+            per_100 = (100 / calcolati - 100 / registrati.loc[righe])[confrontabili].abs()
+            print(f"  → In kg/100 km (precisione di Fuelio): differenza media {per_100.mean():.4f}, "
+                  f"massima {per_100.max():.4f}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Costo di possesso: costi (Costs.csv) e rifornimenti (Log) analizzati insieme.
+
+Ogni costo viene attribuito, con merge_asof, all'intervallo del Log in cui
+cade: il rifornimento precedente per chilometraggio ('rifornimento') e, per
+i costi senza Odo (0 in Fuelio), il chilometraggio stimato interpolando per
+data tra i rifornimenti vicini.
+
+I costi attribuiti vengono salvati in 'costi_attribuiti.csv'.
+
+Gli aggregati mensili (per veicolo e mese) contengono km, carburante e spesa
+per categoria di costo (CostCategories.csv); da questi si ottiene il costo
+per km per categoria, per mese o per veicolo. Gli aggregati possono essere
+aggiornati ricalcolando solo i mesi a partire da quello dei nuovi record.
+
+Tutte le funzioni lavorano su tabelle con la colonna 'veicolo': per un solo
+veicolo vale 1, per una flotta le tabelle dei veicoli vengono concatenate
+(carica_flotta).
+"""
+
+import argparse
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from indice_tabelle_fuelio import leggi_tabella
+from schemi_fuelio import FORMATO_DATA_ORA, USI, leggi_tabella_fuelio
+
+
+CHIAVE_VEICOLO = 'veicolo'
+
+# Spesa per il carburante negli aggregati (insieme alle categorie di CostCategories)
+CARBURANTE = 'Carburante'
+TOTALE = 'Totale'
+
+COLONNE_LOG_COSTI = USI['costi'][1]
+
+FILE_AGGREGATI = 'costi_mensili.csv'
+FILE_ATTRIBUITI = 'costi_attribuiti.csv'
+
+# Colonne del file dei costi attribuiti ai rifornimenti
+COLONNE_ATTRIBUITI = [CHIAVE_VEICOLO, 'UniqueId', 'Date', 'CostTitle', 'Categoria', 'Importo',
+                      'Odo', 'Odo stimato', 'rifornimento']
+
+
+def prepara_costi(df_costi: pd.DataFrame, df_categorie: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizza la tabella Costs: categoria, importo con segno e Odo mancanti.
+
+    I modelli (isTemplate=1) vengono esclusi e le entrate (isIncome=1) hanno
+    importo negativo; Odo 0 (non inserito in Fuelio) diventa NaN.
+
+    Args:
+        df_costi: Tabella Costs di Fuelio
+        df_categorie: Tabella CostCategories di Fuelio
+
+    Returns:
+        DataFrame dei costi con le colonne 'Categoria', 'Importo' e 'mese'
+    """
+    df = df_costi
+    if 'isTemplate' in df.columns:
+        df = df[pd.to_numeric(df['isTemplate'], errors='coerce').fillna(0) != 1]
+    df = df.copy()
+
+    nomi = dict(zip(df_categorie['CostTypeID'], df_categorie['Name']))
+    df['Categoria'] = df['CostTypeID'].map(nomi).fillna('Altro')
+
+    importo = pd.to_numeric(df['Cost'], errors='coerce').fillna(0.0)
+    if 'isIncome' in df.columns:
+        importo = importo.where(pd.to_numeric(df['isIncome'], errors='coerce').fillna(0) != 1, -importo)
+    df['Importo'] = importo
+
+    df['Odo'] = pd.to_numeric(df['Odo'], errors='coerce').replace(0, np.nan)
+    df['mese'] = df['Date'].astype(str).str[:7]
+    if CHIAVE_VEICOLO not in df.columns:
+        df[CHIAVE_VEICOLO] = 1
+    return df
+
+
+def carica_costi(file_costi: str = 'Costs.csv', file_categorie: str = 'CostCategories.csv') -> pd.DataFrame:
+    """
+    Legge e normalizza le tabelle Costs e CostCategories separate.
+
+    Args:
+        file_costi: Tabella Costs
+        file_categorie: Tabella CostCategories
+
+    Returns:
+        DataFrame dei costi (vedi prepara_costi)
+    """
+    return prepara_costi(leggi_tabella_fuelio(file_costi, 'Costs'),
+                         leggi_tabella_fuelio(file_categorie, 'CostCategories'))
+
+
+def carica_flotta(output_dir: str = 'output') -> tuple:
+    """
+    Legge Log, Costs e CostCategories dei file estesi di tutti i veicoli.
+
+    Cerca i file 'vehicle-N/vehicle-N-sync-extended.csv' prodotti da
+    batch_flotta e legge solo le tre tabelle con l'indice del file.
+
+    Args:
+        output_dir: Directory di output della flotta
+
+    Returns:
+        Tupla (Log, costi) con la colonna 'veicolo', Log ordinato per veicolo e data
+    """
+    logs, costi = [], []
+    file_estesi = sorted(Path(output_dir).glob('vehicle-*/vehicle-*-sync-extended.csv'),
+                         key=lambda percorso: int(percorso.parent.name.split('-')[1]))
+
+    for file_esteso in file_estesi:
+        numero = int(file_esteso.parent.name.split('-')[1])
+        tabelle = {}
+        for nome in ('Log', 'Costs', 'CostCategories'):
+            intestazione, righe = leggi_tabella(file_esteso, nome)
+            tabelle[nome] = leggi_tabella_fuelio(io.StringIO('\n'.join([intestazione] + righe)), nome,
+                                                 uso='costi' if nome == 'Log' else None)
+
+        log = tabelle['Log'].assign(**{CHIAVE_VEICOLO: numero})
+        logs.append(log)
+        costi.append(prepara_costi(tabelle['Costs'].assign(**{CHIAVE_VEICOLO: numero}),
+                                   tabelle['CostCategories']))
+
+    if not logs:
+        raise FileNotFoundError(f"Nessun file 'vehicle-N-sync-extended.csv' in {output_dir}")
+    return pd.concat(logs, ignore_index=True), pd.concat(costi, ignore_index=True)
+
+
+def _con_veicolo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggiunge la colonna 'veicolo' (1) alle tabelle di un solo veicolo.
+
+    Args:
+        df: Tabella
+
+    Returns:
+        Tabella con la colonna 'veicolo'
+    """
+    return df if CHIAVE_VEICOLO in df.columns else df.assign(**{CHIAVE_VEICOLO: 1})
+
+
+def attribuisci_costi(df_log: pd.DataFrame, df_costi: pd.DataFrame) -> pd.DataFrame:
+    """
+    Attribuisce ogni costo all'intervallo di rifornimenti in cui cade.
+
+    Args:
+        df_log: Log (unificato) con 'Data', 'Odo (km)' e 'UniqueId'
+        df_costi: Costi normalizzati (prepara_costi)
+
+    Returns:
+        Copia dei costi con le colonne 'Odo stimato' (Odo del costo o
+        interpolato per data) e 'rifornimento' (UniqueId del rifornimento
+        precedente per chilometraggio)
+    """
+    log = _con_veicolo(df_log)
+    log = pd.DataFrame({
+        CHIAVE_VEICOLO: log[CHIAVE_VEICOLO].to_numpy(),
+        'istante': pd.to_datetime(log['Data'], format=FORMATO_DATA_ORA).to_numpy(dtype='datetime64[ns]'),
+        'odo': pd.to_numeric(log['Odo (km)'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+        'rifornimento': log['UniqueId'].to_numpy(),
+    }).dropna(subset=['odo'])
+    costi = df_costi.assign(istante=pd.to_datetime(df_costi['Date'], format=FORMATO_DATA_ORA).astype('datetime64[ns]'),
+                            posizione=np.arange(len(df_costi)))
+    costi = costi.sort_values('istante', kind='stable')
+
+    # Rifornimenti subito prima e subito dopo la data del costo
+    per_data = log.sort_values('istante', kind='stable')
+    vicini = {}
+    for direzione in ('backward', 'forward'):
+        destra = per_data[[CHIAVE_VEICOLO, 'istante', 'odo']].rename(
+            columns={'istante': 'istante_vicino', 'odo': 'odo_vicino'})
+        vicini[direzione] = pd.merge_asof(costi[[CHIAVE_VEICOLO, 'istante']], destra,
+                                          left_on='istante', right_on='istante_vicino',
+                                          by=CHIAVE_VEICOLO, direction=direzione)
+
+    # Chilometraggio stimato: interpolazione per data tra i due rifornimenti
+    secondi = {direzione: df['istante_vicino'].to_numpy().astype('datetime64[s]').astype(np.float64)
+               for direzione, df in vicini.items()}
+    istante = costi['istante'].to_numpy().astype('datetime64[s]').astype(np.float64)
+    odo_prima = vicini['backward']['odo_vicino'].to_numpy(dtype=np.float64)
+    odo_dopo = vicini['forward']['odo_vicino'].to_numpy(dtype=np.float64)
+    durata = secondi['forward'] - secondi['backward']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frazione = np.where(durata > 0, (istante - secondi['backward']) / durata, 0.0)
+    stimato = odo_prima + frazione * (odo_dopo - odo_prima)
+    stimato = np.where(np.isnan(odo_prima), odo_dopo, np.where(np.isnan(odo_dopo), odo_prima, stimato))
+
+    odo = costi['Odo'].to_numpy(dtype=np.float64)
+    costi['Odo stimato'] = np.round(np.where(np.isnan(odo), stimato, odo), 0)
+
+    # Rifornimento che apre l'intervallo di chilometraggio del costo (merge_asof non accetta chiavi nulle)
+    con_odo = costi['Odo stimato'].notna()
+    attribuiti = pd.merge_asof(costi[con_odo].sort_values('Odo stimato', kind='stable'),
+                               log.sort_values('odo', kind='stable')[[CHIAVE_VEICOLO, 'odo', 'rifornimento']],
+                               left_on='Odo stimato', right_on='odo', by=CHIAVE_VEICOLO, direction='backward')
+    costi = pd.concat([attribuiti, costi[~con_odo]], ignore_index=True)
+
+    costi = costi.sort_values('posizione').drop(columns=['istante', 'posizione', 'odo'])
+    costi['rifornimento'] = costi['rifornimento'].astype('Int64')
+    costi.index = df_costi.index
+    return costi
+
+
+def _righe_dal_mese(df_log: pd.DataFrame, dal_mese: str) -> tuple:
+    """
+    Seleziona le righe del Log dal mese indicato, più il rifornimento precedente di ogni veicolo.
+
+    Il Log deve essere ordinato per veicolo e data (come il Log unificato):
+    l'inizio di ogni veicolo è trovato con una ricerca binaria sulle date.
+
+    Args:
+        df_log: Log con la colonna 'veicolo'
+        dal_mese: Primo mese ('YYYY-MM'), None per tutto il Log
+
+    Returns:
+        Tupla (righe selezionate, maschera delle righe precedenti da non aggregare)
+    """
+    if dal_mese is None:
+        return df_log, np.zeros(len(df_log), dtype=bool)
+
+    veicoli = df_log[CHIAVE_VEICOLO].to_numpy()
+    date = df_log['Data'].astype(str).to_numpy()
+    confini = np.r_[0, np.flatnonzero(veicoli[1:] != veicoli[:-1]) + 1, len(df_log)]
+
+    posizioni, precedenti = [], []
+    for inizio, fine in zip(confini[:-1], confini[1:]):
+        primo = inizio + int(np.searchsorted(date[inizio:fine], dal_mese))
+        if primo > inizio:
+            precedenti.append(primo - 1)
+        posizioni.append(np.arange(max(primo - 1, inizio), fine))
+
+    posizioni = np.concatenate(posizioni) if posizioni else np.empty(0, dtype=np.int64)
+    return df_log.iloc[posizioni], np.isin(posizioni, precedenti)
+
+
+def aggregati_mensili(df_log: pd.DataFrame, df_costi: pd.DataFrame, dal_mese: str = None) -> pd.DataFrame:
+    """
+    Calcola km, carburante e costi per categoria di ogni veicolo e mese.
+
+    I km di un rifornimento sono quelli percorsi dal rifornimento precedente
+    dello stesso veicolo e vengono attribuiti al mese del rifornimento.
+
+    Args:
+        df_log: Log ordinato per veicolo e data
+        df_costi: Costi normalizzati (prepara_costi)
+        dal_mese: Se indicato ('YYYY-MM'), calcola solo i mesi da questo in poi
+
+    Returns:
+        DataFrame con indice (veicolo, mese) e colonne 'rifornimenti', 'km',
+        'kg', 'Carburante', una colonna per categoria di costo e 'Totale'
+    """
+    log, precedenti = _righe_dal_mese(_con_veicolo(df_log), dal_mese)
+
+    veicoli = log[CHIAVE_VEICOLO].to_numpy()
+    odo = pd.to_numeric(log['Odo (km)'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    stesso_veicolo = np.r_[False, veicoli[1:] == veicoli[:-1]]
+    km = np.where(stesso_veicolo, np.diff(odo, prepend=np.nan), 0.0)
+
+    rifornimenti = pd.DataFrame({
+        CHIAVE_VEICOLO: veicoli,
+        'mese': log['Data'].astype(str).str[:7].to_numpy(),
+        'rifornimenti': 1,
+        'km': np.nan_to_num(km),
+        'kg': pd.to_numeric(log['kg'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+        CARBURANTE: pd.to_numeric(log['Price (optional)'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+    })[~precedenti]
+    aggregati = rifornimenti.groupby([CHIAVE_VEICOLO, 'mese']).sum()
+
+    costi = _con_veicolo(df_costi)
+    if dal_mese is not None:
+        costi = costi[costi['mese'] >= dal_mese]
+    per_categoria = costi.pivot_table(index=[CHIAVE_VEICOLO, 'mese'], columns='Categoria',
+                                      values='Importo', aggfunc='sum', fill_value=0.0)
+    per_categoria.columns.name = None
+
+    aggregati = aggregati.join(per_categoria, how='outer').fillna(0.0)
+    aggregati['rifornimenti'] = aggregati['rifornimenti'].astype(np.int64)
+    aggregati[TOTALE] = aggregati[_colonne_spesa(aggregati)].sum(axis=1)
+    return aggregati.sort_index()
+
+
+def _colonne_spesa(aggregati: pd.DataFrame) -> list:
+    """
+    Colonne di spesa degli aggregati: carburante e categorie di costo.
+
+    Args:
+        aggregati: Aggregati mensili
+
+    Returns:
+        Lista di nomi di colonna
+    """
+    return [colonna for colonna in aggregati.columns
+            if colonna not in ('rifornimenti', 'km', 'kg', TOTALE)]
+
+
+def aggiorna_aggregati(aggregati: pd.DataFrame, df_log: pd.DataFrame, df_costi: pd.DataFrame,
+                       dal_mese: str) -> pd.DataFrame:
+    """
+    Ricalcola gli aggregati dal mese indicato in poi, tenendo quelli precedenti.
+
+    Args:
+        aggregati: Aggregati mensili già calcolati
+        df_log: Log completo ordinato per veicolo e data
+        df_costi: Costi normalizzati completi
+        dal_mese: Primo mese da ricalcolare ('YYYY-MM'), es. quello dei nuovi record
+
+    Returns:
+        Aggregati aggiornati
+    """
+    mesi = aggregati.index.get_level_values('mese')
+    recenti = aggregati_mensili(df_log, df_costi, dal_mese)
+    aggiornati = pd.concat([aggregati[mesi < dal_mese], recenti]).fillna(0.0)
+    aggiornati['rifornimenti'] = aggiornati['rifornimenti'].astype(np.int64)
+    colonne = ['rifornimenti', 'km', 'kg'] + _colonne_spesa(aggiornati) + [TOTALE]
+    return aggiornati[colonne].sort_index()
+
+
+def costo_per_km(aggregati: pd.DataFrame, livelli=(CHIAVE_VEICOLO,)) -> pd.DataFrame:
+    """
+    Costo per km di ogni voce di spesa, raggruppando gli aggregati mensili.
+
+    Args:
+        aggregati: Aggregati mensili
+        livelli: Livelli dell'indice da mantenere (es. ('veicolo',),
+            ('veicolo', 'mese') o () per il totale)
+
+    Returns:
+        DataFrame con 'km' e il costo in €/km di ogni voce di spesa e del totale
+    """
+    livelli = list(livelli)
+    if livelli:
+        totali = aggregati.groupby(level=livelli).sum()
+    else:
+        totali = aggregati.sum().to_frame(TOTALE).T
+
+    spese = _colonne_spesa(totali) + [TOTALE]
+    km = totali['km'].where(totali['km'] > 0)
+    risultato = totali[spese].div(km, axis=0).round(4)
+    risultato.insert(0, 'km', totali['km'])
+    return risultato
+
+
+def main(argv: list = None):
+    """
+    Calcola gli aggregati mensili e il costo per km di un veicolo o di una flotta.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Costo di possesso: costi e rifornimenti per mese e categoria")
+    parser.add_argument('--log', default='Log_unificato.csv', help="Log unificato (default: Log_unificato.csv)")
+    parser.add_argument('--costi', default='Costs.csv', help="tabella Costs (default: Costs.csv)")
+    parser.add_argument('--categorie', default='CostCategories.csv',
+                        help="tabella CostCategories (default: CostCategories.csv)")
+    parser.add_argument('--flotta', default=None, metavar='DIRECTORY',
+                        help="legge i file estesi di tutti i veicoli (output di batch_flotta)")
+    parser.add_argument('--aggregati', default=FILE_AGGREGATI,
+                        help=f"file CSV degli aggregati mensili (default: {FILE_AGGREGATI})")
+    parser.add_argument('--attribuiti', default=FILE_ATTRIBUITI,
+                        help=f"file CSV dei costi attribuiti ai rifornimenti (default: {FILE_ATTRIBUITI})")
+    parser.add_argument('--dal', default=None, metavar='YYYY-MM',
+                        help="aggiorna gli aggregati esistenti ricalcolando solo i mesi da questo in poi")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("COSTO DI POSSESSO")
+    print("=" * 60)
+
+    if args.flotta:
+        df_log, df_costi = carica_flotta(args.flotta)
+    else:
+        df_log = leggi_tabella_fuelio(args.log, 'Log', uso='costi')
+        df_costi = carica_costi(args.costi, args.categorie)
+    print(f"\n✓ {len(df_log)} rifornimenti e {len(df_costi)} costi "
+          f"({df_log[CHIAVE_VEICOLO].nunique() if CHIAVE_VEICOLO in df_log.columns else 1} veicoli)")
+
+    if args.dal and Path(args.aggregati).exists():
+        precedenti = pd.read_csv(args.aggregati, index_col=[CHIAVE_VEICOLO, 'mese'])
+        aggregati = aggiorna_aggregati(precedenti, df_log, df_costi, args.dal)
+        print(f"→ Aggregati aggiornati dal {args.dal}")
+    else:
+        aggregati = aggregati_mensili(df_log, df_costi)
+    aggregati.round(2).to_csv(args.aggregati)
+    print(f"→ Aggregati mensili salvati in: {args.aggregati} ({len(aggregati)} mesi)")
+
+    costi = attribuisci_costi(df_log, df_costi)
+    costi[[colonna for colonna in COLONNE_ATTRIBUITI if colonna in costi.columns]].to_csv(
+        args.attribuiti, index=False)
+    print(f"→ Costi attribuiti ai rifornimenti salvati in: {args.attribuiti} "
+          f"({costi['rifornimento'].notna().sum()} di {len(costi)} costi)")
+    stimati = costi['Odo'].isna().sum()
+    if stimati:
+        print(f"→ Chilometraggio stimato per data per {stimati} costi senza Odo")
+
+    print("\nCosto per km per veicolo (€/km):")
+    print(costo_per_km(aggregati).to_string())
+
+    print("\nUltimi 12 mesi, tutti i veicoli (€/km):")
+    print(costo_per_km(aggregati, ('mese',)).tail(12).to_string())
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
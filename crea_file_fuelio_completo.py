@@ -7,49 +7,50 @@ Esegue tutti i passaggi necessari:
 3. Verifica il file generato
 """
 
-import subprocess
+import argparse
 import sys
 from pathlib import Path
 
+from deduplicazione import POLITICA_PREDEFINITA, POLITICHE
+from pipeline_fuelio import crea_pipeline_fuelio, esegui_pipeline
+import strumentazione
 
-def esegui_script(script_name: str, descrizione: str) -> bool:
+
+def main(argv: list = None):
     """
-    Esegue uno script Python e gestisce eventuali errori.
+    Esegue il processo completo di creazione del file Fuelio.
+    
+    Tutti i passaggi vengono eseguiti nello stesso processo tramite la pipeline
+    di pipeline_fuelio, passando i dati in memoria tra una fase e l'altra.
     
     Args:
-        script_name: Nome del file script da eseguire
-        descrizione: Descrizione del passaggio
+        argv: Argomenti da riga di comando (default: sys.argv)
         
     Returns:
-        True se eseguito con successo, False altrimenti
+        True se il file è stato creato e verificato con successo
     """
-    print("\n" + "=" * 60)
-    print(f"PASSO: {descrizione}")
-    print("=" * 60)
-    print(f"Esecuzione: {script_name}\n")
+    parser = argparse.ArgumentParser(description="Crea il file CSV esteso per Fuelio")
+    parser.add_argument('--non-interattivo', action='store_true',
+                        help="non chiede conferma prima di iniziare (per esecuzioni pianificate)")
+    parser.add_argument('--salva-intermedi', action='store_true',
+                        help="scrive anche Log_unificato.csv su disco")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ricalcola tutte le fasi senza usare la cache")
+    parser.add_argument('--duplicati', choices=list(POLITICHE), default=POLITICA_PREDEFINITA,
+                        help="record da tenere se un rifornimento è sia nello storico sia in Fuelio "
+                             f"(default: {POLITICA_PREDEFINITA})")
+    parser.add_argument('--directory', default='.',
+                        help="directory con i file di input (default: directory corrente)")
+    parser.add_argument('--rapporto', default=None, metavar='FILE',
+                        help="misura tempi, memoria e righe di ogni fase e salva il rapporto (.json o .csv)")
+    parser.add_argument('--profila', default=None, metavar='FASE',
+                        help="profila con cProfile la fase indicata (es. unisci_e_ordina)")
+    args = parser.parse_args(argv)
+    directory = Path(args.directory)
+    
+    if args.rapporto or args.profila:
+        strumentazione.attiva_strumentazione(profila=args.profila)
     
-    try:
-        result = subprocess.run(
-            [sys.executable, script_name],
-            check=True,
-            capture_output=False,
-            text=True
-        )
-        print(f"\n✅ {descrizione} completato!")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ ERRORE durante: {descrizione}")
-        print(f"   Codice di errore: {e.returncode}")
-        return False
-    except Exception as e:
-        print(f"\n❌ ERRORE imprevisto: {e}")
-        return False
-
-
-def main():
-    """
-    Esegue il processo completo di creazione del file Fuelio.
-    """
     print("=" * 60)
     print("CREAZIONE FILE FUELIO COMPLETO")
     print("=" * 60)
@@ -58,7 +59,8 @@ def main():
     print("2. Riunione di tutte le tabelle CSV")
     print("3. Verifica del file generato")
     
-    input("\nPremi INVIO per iniziare...")
+    if not args.non_interattivo:
+        input("\nPremi INVIO per iniziare...")
     
     # Verifica che i file necessari esistano
     print("\n" + "=" * 60)
@@ -79,7 +81,7 @@ def main():
     
     mancanti = []
     for file, desc in file_richiesti.items():
-        if Path(file).exists():
+        if (directory / file).exists():
             print(f"  ✅ {file}")
         else:
             print(f"  ❌ {file} - MANCANTE!")
@@ -94,44 +96,26 @@ def main():
     
     print("\n✅ Tutti i file necessari sono presenti!")
     
-    # Passo 1: Unione dati storici
-    if not esegui_script(
-        'unisci_log_storico.py',
-        'Unione dati storici Excel + Log Fuelio'
-    ):
-        print("\n⚠ Impossibile continuare senza il Log unificato.")
-        return False
-    
-    # Verifica che Log_unificato.csv sia stato creato
-    if not Path('Log_unificato.csv').exists():
-        print("\n❌ ERRORE: File Log_unificato.csv non creato!")
-        return False
-    
-    # Passo 2: Riunione tabelle
-    if not esegui_script(
-        'riunisci_tabelle_fuelio.py',
-        'Riunione di tutte le tabelle CSV'
-    ):
-        print("\n⚠ File non creato correttamente.")
-        return False
-    
-    # Verifica che il file finale sia stato creato
-    if not Path('vehicle-1-sync-extended.csv').exists():
-        print("\n❌ ERRORE: File vehicle-1-sync-extended.csv non creato!")
+    # Esegue tutti i passaggi in-process
+    try:
+        risultati = esegui_pipeline(crea_pipeline_fuelio(
+            directory, salva_intermedi=args.salva_intermedi, usa_cache=not args.no_cache,
+            duplicati=args.duplicati
+        ))
+    except RuntimeError as e:
+        print(f"\n❌ ERRORE: {e}")
         return False
-    
-    # Passo 3: Verifica finale
-    esegui_script(
-        'verifica_file_fuelio.py',
-        'Verifica del file generato'
-    )
+    finally:
+        if args.rapporto:
+            strumentazione.stampa_rapporto()
+            strumentazione.salva_rapporto(args.rapporto)
     
     # Riepilogo finale
     print("\n" + "=" * 60)
     print("PROCESSO COMPLETATO!")
     print("=" * 60)
     
-    output_file = Path('vehicle-1-sync-extended.csv')
+    output_file = risultati['file_fuelio']
     print(f"\n✅ File creato: {output_file.absolute()}")
     print(f"   Dimensione: {output_file.stat().st_size:,} bytes")
     
@@ -143,7 +127,7 @@ def main():
     
     print("\n" + "=" * 60)
     
-    return True
+    return risultati['verifica']
 
 
 if __name__ == "__main__":
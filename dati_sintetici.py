@@ -0,0 +1,354 @@
+"""
+Generatore di dati sintetici realistici per i benchmark.
+
+Produce tabelle con la stessa struttura dei file reali (tabella di conversione
+distributori, file Excel storico, Log di Fuelio) e dimensione arbitraria,
+per misurare come gli script scalano con il numero di rifornimenti.
+
+genera_input_sintetici scrive su disco un insieme completo di file di input
+(file Excel storico, tabella di conversione ed export 'vehicle-1-sync.csv'
+con tutte le tabelle di Fuelio).
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from scrittura_fuelio import scrivi_csv_fuelio
+from unisci_log_storico import COLONNE_LOG
+
+
+# Righe massime di dati in un foglio Excel (1.048.576 righe meno titolo, riga vuota e intestazione)
+MAX_RIGHE_EXCEL = 1_048_576 - 3
+
+# Quota dei rifornimenti nel file storico (come nei dati reali: 672 storici su 1069)
+QUOTA_STORICO = 0.6
+
+
+MARCHI = ['IP', 'Q8', 'ENI', 'Esso', 'Tamoil', 'Metano Service', 'SEP', 'IS', 'Api', 'Green Service']
+LOCALITA = ['Perugia', 'Balanzano', 'Semonte', 'Umbertide', 'Gubbio', 'Ponte S. Giovanni',
+            'Gualdo Tadino', 'San Sisto', 'Ponte Rio', 'Città di Castello']
+
+
+def genera_tabella_conversione(n_distributori: int = 1000, seed: int = 0) -> pd.DataFrame:
+    """
+    Genera una tabella di conversione distributori sintetica.
+
+    Circa il 5% delle righe ha 'Conversione' nulla e il 5% ha 'Description' vuota,
+    come nei file reali.
+
+    Args:
+        n_distributori: Numero di distributori
+        seed: Seme del generatore casuale
+
+    Returns:
+        DataFrame con le colonne di Tabella_Conversione_Distro.xlsx
+    """
+    rng = np.random.default_rng(seed)
+
+    marchi = rng.choice(MARCHI, n_distributori)
+    localita = rng.choice(LOCALITA, n_distributori)
+    descrizioni = np.where(rng.random(n_distributori) < 0.05, '', localita).astype(object)
+    conversione = np.array([f"D{i:06d}" for i in range(n_distributori)], dtype=object)
+    conversione[rng.random(n_distributori) < 0.05] = None
+
+    return pd.DataFrame({
+        'NameBrand': marchi,
+        'Latitude': np.round(rng.uniform(42.8, 43.6, n_distributori), 5),
+        'Longitude': np.round(rng.uniform(12.1, 12.9, n_distributori), 5),
+        'StationID': rng.choice(np.arange(10_000, 1_000_000), n_distributori, replace=False),
+        'Description': descrizioni,
+        'CountryCode': 'ITA',
+        'Conversione': conversione,
+    })
+
+
+def _date_crescenti(n_righe: int, inizio: str, rng: np.random.Generator) -> pd.Series:
+    """
+    Genera date di rifornimento crescenti.
+
+    Per pochi rifornimenti la distanza media è di 3,5 giorni; per volumi grandi
+    viene ridotta in modo che il periodo totale non superi i 40 anni.
+
+    Args:
+        n_righe: Numero di date
+        inizio: Data iniziale
+        rng: Generatore casuale
+
+    Returns:
+        Serie di datetime
+    """
+    media_minuti = max(min(3.5 * 24 * 60, 40 * 365 * 24 * 60 / max(n_righe, 1)), 2)
+    minuti = np.cumsum(np.maximum(rng.uniform(0.5, 1.5, n_righe) * media_minuti, 1).astype('int64'))
+    return pd.Timestamp(inizio) + pd.to_timedelta(minuti, unit='m')
+
+
+def genera_storico_excel(n_righe: int, df_conversione: pd.DataFrame, seed: int = 1) -> pd.DataFrame:
+    """
+    Genera dati storici con la struttura di Contabilita_consumi_Punto.xlsx.
+
+    Args:
+        n_righe: Numero di rifornimenti
+        df_conversione: Tabella di conversione (per i codici Distro)
+        seed: Seme del generatore casuale
+
+    Returns:
+        DataFrame con le colonne del file Excel storico
+    """
+    rng = np.random.default_rng(seed)
+
+    serbatoio = np.where(rng.random(n_righe) < 0.85, 1, 2)
+    kg = np.round(rng.uniform(8, 16, n_righe), 2)
+    prezzo = np.round(rng.uniform(0.8, 1.6, n_righe), 3)
+
+    # 90% codici noti, 10% codici sconosciuti
+    codici = df_conversione['Conversione'].dropna().to_numpy()
+    distro = rng.choice(codici, n_righe).astype(object)
+    sconosciuti = rng.random(n_righe) < 0.10
+    distro[sconosciuti] = [f"X{i}" for i in rng.integers(0, 1000, sconosciuti.sum())]
+
+    a_benzina = np.where(rng.random(n_righe) < 0.1, rng.integers(5, 50, n_righe), np.nan)
+
+    return pd.DataFrame({
+        'Data': _date_crescenti(n_righe, '2010-01-01', rng).normalize(),
+        'Km': np.cumsum(rng.integers(150, 450, n_righe)),
+        'Tot': np.round(kg * prezzo, 2),
+        'Kg': kg,
+        '€/Kg': prezzo,
+        'L': np.nan,
+        '€/L': np.nan,
+        'Distro': distro,
+        'A benzina': a_benzina,
+        'Serbatoio': serbatoio,
+    })
+
+
+def genera_log_fuelio(n_righe: int, df_conversione: pd.DataFrame, seed: int = 2,
+                      inizio: str = '2020-11-01', odo_iniziale: float = 200_000) -> pd.DataFrame:
+    """
+    Genera un Log di Fuelio sintetico (dal più recente al più vecchio, come Log.csv).
+
+    Args:
+        n_righe: Numero di rifornimenti
+        df_conversione: Tabella di conversione (per gli StationID)
+        seed: Seme del generatore casuale
+        inizio: Data del primo rifornimento
+        odo_iniziale: Chilometraggio prima del primo rifornimento
+
+    Returns:
+        DataFrame con le colonne del Log di Fuelio
+    """
+    rng = np.random.default_rng(seed)
+
+    date = _date_crescenti(n_righe, inizio, rng)
+    serbatoio = np.where(rng.random(n_righe) < 0.85, 1, 2)
+    kg = np.round(rng.uniform(8, 16, n_righe), 3)
+    prezzo = np.round(rng.uniform(0.9, 1.9, n_righe), 3)
+
+    # 80% StationID noti, 10% sconosciuti, 10% mancanti
+    station_id = rng.choice(df_conversione['StationID'].to_numpy(), n_righe).astype('float64')
+    caso = rng.random(n_righe)
+    station_id[caso < 0.10] = rng.integers(2_000_000, 3_000_000, (caso < 0.10).sum())
+    station_id[caso > 0.90] = np.nan
+
+    df = pd.DataFrame({
+        'Data': date.strftime('%Y-%m-%d %H:%M'),
+        'Odo (km)': np.cumsum(rng.integers(150, 450, n_righe)).astype('float64') + odo_iniziale,
+        'kg': kg,
+        'Full': 1,
+        'Price (optional)': np.round(kg * prezzo, 2),
+        'km/l (optional)': np.round(rng.uniform(18, 30, n_righe), 2),
+        'latitude (optional)': np.round(rng.uniform(42.8, 43.6, n_righe), 5),
+        'longitude (optional)': np.round(rng.uniform(12.1, 12.9, n_righe), 5),
+        'City (optional)': rng.choice(LOCALITA, n_righe),
+        'Notes (optional)': np.nan,
+        'Missed': 0,
+        'TankNumber': serbatoio,
+        'FuelType': np.where(serbatoio == 1, 501, 110),
+        'VolumePrice': prezzo,
+        'StationID (optional)': station_id,
+        'ExcludeDistance': np.where(rng.random(n_righe) < 0.1, 20.0, 0.0),
+        'UniqueId': np.arange(1, n_righe + 1),
+        'TankCalc': 0.0,
+        'Weather': np.nan,
+    }, columns=COLONNE_LOG)
+
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def genera_costi(n_costi: int, seed: int = 3) -> pd.DataFrame:
+    """
+    Genera la tabella Costs di Fuelio (manutenzioni, assicurazione, bollo, ...).
+
+    Args:
+        n_costi: Numero di costi
+        seed: Seme del generatore casuale
+
+    Returns:
+        DataFrame con le colonne della tabella Costs
+    """
+    rng = np.random.default_rng(seed)
+    titoli = ['Tagliando', 'Cambio gomme', 'Assicurazione', 'Bollo', 'Revisione', 'Lavaggio']
+
+    return pd.DataFrame({
+        'CostTitle': rng.choice(titoli, n_costi),
+        'Date': _date_crescenti(n_costi, '2010-01-01', rng).strftime('%Y-%m-%d %H:%M'),
+        'Odo': np.cumsum(rng.integers(500, 5000, n_costi)),
+        'CostTypeID': rng.integers(1, 7, n_costi),
+        'Notes': '',
+        'Cost': np.round(rng.uniform(10, 600, n_costi), 1),
+        'flag': 0,
+        'idR': 0,
+        'read': 1,
+        'RemindOdo': 0,
+        'RemindDate': '2011-01-01',
+        'isTemplate': 0,
+        'RepeatOdo': 0,
+        'RepeatMonths': 0,
+        'isIncome': 0,
+        'UniqueId': np.arange(1, n_costi + 1),
+    }).iloc[::-1]
+
+
+def salva_storico_excel(df_storico: pd.DataFrame, file_excel: Path):
+    """
+    Salva i dati storici nel formato di Contabilita_consumi_Punto.xlsx
+    (titolo nella prima riga, intestazione nella terza).
+
+    Args:
+        df_storico: Dati generati con genera_storico_excel
+        file_excel: Percorso del file Excel
+    """
+    if len(df_storico) > MAX_RIGHE_EXCEL:
+        raise ValueError(f"Troppe righe per un foglio Excel: {len(df_storico):,} (max {MAX_RIGHE_EXCEL:,})")
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Consumi')
+    ws.append(['Contabilità consumi'])
+    ws.append([])
+    ws.append(list(df_storico.columns))
+
+    colonne = [df_storico[c].astype(object).where(df_storico[c].notna(), None).tolist()
+               for c in df_storico.columns]
+    for riga in zip(*colonne):
+        ws.append(riga)
+
+    wb.save(file_excel)
+
+
+def salva_tabella_conversione(df_conversione: pd.DataFrame, file_excel: Path):
+    """
+    Salva la tabella di conversione nel formato di Tabella_Conversione_Distro.xlsx.
+
+    Args:
+        df_conversione: Tabella generata con genera_tabella_conversione
+        file_excel: Percorso del file Excel
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Conversione')
+    ws.append(list(df_conversione.columns))
+    for riga in df_conversione.astype(object).where(df_conversione.notna(), None).itertuples(index=False):
+        ws.append(list(riga))
+    wb.save(file_excel)
+
+
+def genera_file_sync(file_sync: Path, df_log: pd.DataFrame, df_conversione: pd.DataFrame,
+                     seed: int = 4) -> dict:
+    """
+    Scrive un export di Fuelio ('vehicle-N-sync.csv') con tutte le tabelle.
+
+    Args:
+        file_sync: Percorso del file da scrivere
+        df_log: Log di Fuelio (es. da genera_log_fuelio)
+        df_conversione: Tabella di conversione (per i distributori preferiti)
+        seed: Seme del generatore casuale
+
+    Returns:
+        Dizionario {nome tabella: numero di record}
+    """
+    tabelle = {
+        'Vehicle': pd.DataFrame([{
+            'Name': 'Veicolo sintetico', 'Description': '', 'DistUnit': 0, 'FuelUnit': 4,
+            'ConsumptionUnit': 3, 'ImportCSVDateFormat': 'yyyy-MM-dd', 'VIN': '', 'Insurance': '',
+            'Plate': 'AB123CD', 'Make': 'FIAT', 'Model': 'Punto Evo', 'Year': 2010, 'TankCount': 2,
+            'Tank1Type': 500, 'Tank2Type': 100, 'Active': 1, 'Tank1Capacity': 16.0,
+            'Tank2Capacity': 45.0, 'FuelUnitTank2': 0, 'FuelConsumptionTank2': 3,
+        }]),
+        'Log': df_log[COLONNE_LOG],
+        'CostCategories': pd.DataFrame({
+            'CostTypeID': range(1, 7),
+            'Name': ['Servizio', 'Manutenzione', 'Assicurazione', 'Tasse', 'Revisione', 'Lavaggio'],
+            'priority': 0,
+            'color': '',
+        }),
+        'Costs': genera_costi(max(5, len(df_log) // 5), seed),
+        'FavStations': df_conversione.drop(columns='Conversione').head(50),
+        'Pictures': pd.DataFrame(columns=['Filename', 'Note', 'Type', 'target_id']),
+        'Category': pd.DataFrame({'IdCategory': [1, 2], 'Name': ['Privato', 'Di lavoro']}),
+    }
+
+    with open(file_sync, 'w', encoding='utf-8', newline='') as f:
+        for nome, df in tabelle.items():
+            f.write(f'"## {nome}"\n')
+            formati = {'StationID (optional)': 'intero'} if nome == 'Log' else None
+            scrivi_csv_fuelio(df, f, formati=formati, lineterminator='\n')
+
+    return {nome: len(df) for nome, df in tabelle.items()}
+
+
+def genera_input_sintetici(directory: str, n_rifornimenti: int, seed: int = 0) -> dict:
+    """
+    Scrive in una directory un insieme completo di file di input sintetici.
+
+    Il 60% dei rifornimenti va nel file Excel storico (fino al limite di righe
+    di un foglio Excel) e il resto nel Log di Fuelio, con date successive.
+
+    File creati:
+    - Contabilita_consumi_Punto.xlsx  - Dati storici
+    - Tabella_Conversione_Distro.xlsx - Tabella di conversione distributori
+    - vehicle-1-sync.csv              - Export di Fuelio con tutte le tabelle
+
+    Args:
+        directory: Directory in cui scrivere i file (creata se non esiste)
+        n_rifornimenti: Numero totale di rifornimenti (storici + Fuelio)
+        seed: Seme del generatore casuale
+
+    Returns:
+        Dizionario con i percorsi dei file ('file_excel', 'file_conversione',
+        'file_sync') e il numero di record ('record_storici', 'record_fuelio')
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    n_storici = min(math.ceil(n_rifornimenti * QUOTA_STORICO), MAX_RIGHE_EXCEL)
+    n_fuelio = n_rifornimenti - n_storici
+    n_distributori = int(min(max(100, n_rifornimenti // 50), 20_000))
+
+    df_conversione = genera_tabella_conversione(n_distributori, seed)
+    df_storico = genera_storico_excel(n_storici, df_conversione, seed + 1)
+
+    # Il Log di Fuelio prosegue dall'ultimo rifornimento storico
+    inizio_fuelio, odo_iniziale = '2020-11-01', 200_000
+    if n_storici:
+        inizio_fuelio = str(df_storico['Data'].max() + pd.Timedelta(days=1))
+        odo_iniziale = float(df_storico['Km'].max())
+    df_log = genera_log_fuelio(n_fuelio, df_conversione, seed + 2, inizio_fuelio, odo_iniziale)
+
+    file_excel = directory / 'Contabilita_consumi_Punto.xlsx'
+    file_conversione = directory / 'Tabella_Conversione_Distro.xlsx'
+    file_sync = directory / 'vehicle-1-sync.csv'
+
+    salva_storico_excel(df_storico, file_excel)
+    salva_tabella_conversione(df_conversione, file_conversione)
+    genera_file_sync(file_sync, df_log, df_conversione, seed + 3)
+
+    return {
+        'file_excel': file_excel,
+        'file_conversione': file_conversione,
+        'file_sync': file_sync,
+        'record_storici': n_storici,
+        'record_fuelio': n_fuelio,
+    }
@@ -0,0 +1,235 @@
+"""
+Rimozione dei rifornimenti presenti sia nello storico Excel sia nel Log di Fuelio.
+
+Se i due periodi si sovrappongono (rifornimenti scritti sia nel foglio sia
+nell'app), l'unione produrrebbe dei doppioni con UniqueId diversi. Due
+record sono considerati lo stesso rifornimento se hanno lo stesso
+serbatoio, date entro qualche giorno (lo storico ha solo il giorno, con ora
+fissata alle 12:00), chilometraggio e kg entro una tolleranza.
+
+Il confronto è limitato alla finestra in cui i due periodi si
+sovrappongono; al suo interno i record vengono accoppiati con un sort-merge
+sulla chiave normalizzata (serbatoio, chilometraggio): per ogni record
+storico una ricerca binaria trova i soli record Fuelio dello stesso
+serbatoio entro la tolleranza di km, poi vengono controllati giorno e kg.
+Il tempo cresce in modo quasi lineare (n log n) con il numero di record.
+Ogni record viene accoppiato al più con un altro, scegliendo le coppie più
+vicine.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schemi_fuelio import FORMATO_DATA_ORA
+
+
+# Tolleranze predefinite per considerare due record lo stesso rifornimento
+TOLLERANZA_GIORNI = 1
+TOLLERANZA_KM = 5.0
+TOLLERANZA_KG = 0.1
+
+# Quale record tenere di ogni coppia di doppioni
+POLITICHE = {
+    'fuelio': "tiene il record di Fuelio (ora, posizione e consumo registrati dall'app)",
+    'storico': "tiene il record dello storico Excel",
+    'entrambi': "tiene entrambi i record (i doppioni vengono solo segnalati)",
+}
+POLITICA_PREDEFINITA = 'fuelio'
+
+COLONNE_RAPPORTO = [
+    'riga_storico', 'riga_fuelio', 'Data_storico', 'Data_fuelio',
+    'Odo_storico', 'Odo_fuelio', 'kg_storico', 'kg_fuelio', 'TankNumber',
+    'UniqueId_fuelio', 'differenza_giorni', 'differenza_km', 'differenza_kg', 'tenuto',
+]
+
+
+def _chiavi(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estrae le colonne normalizzate usate per il confronto.
+
+    Args:
+        df: DataFrame nel formato Log
+
+    Returns:
+        DataFrame con riga (posizione in df), data, giorno, serbatoio, odo e kg
+    """
+    data = pd.to_datetime(df['Data'], format=FORMATO_DATA_ORA, errors='coerce')
+    return pd.DataFrame({
+        'riga': np.arange(len(df)),
+        'data': data.to_numpy(),
+        'giorno': data.dt.floor('D').to_numpy(),
+        'TankNumber': pd.to_numeric(df['TankNumber'], errors='coerce').to_numpy(),
+        'odo': pd.to_numeric(df['Odo (km)'], errors='coerce').to_numpy(dtype=np.float64),
+        'kg': pd.to_numeric(df['kg'], errors='coerce').to_numpy(dtype=np.float64),
+    })
+
+
+def _accoppia(candidati: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sceglie coppie uno a uno tra i candidati, partendo da quelle più vicine.
+
+    A ogni passo vengono accettate le coppie in cui ciascuno dei due record
+    è il candidato migliore dell'altro; i record accoppiati escono dai
+    candidati e si ripete finché ne restano.
+
+    Args:
+        candidati: Coppie candidate con riga_storico, riga_fuelio e distanza
+
+    Returns:
+        Coppie scelte
+    """
+    scelte = []
+    candidati = candidati.sort_values(['distanza', 'riga_storico', 'riga_fuelio'], kind='stable')
+    while len(candidati) > 0:
+        migliori = (~candidati['riga_storico'].duplicated()) & (~candidati['riga_fuelio'].duplicated())
+        accettate = candidati[migliori]
+        scelte.append(accettate)
+        candidati = candidati[~candidati['riga_storico'].isin(accettate['riga_storico'])
+                              & ~candidati['riga_fuelio'].isin(accettate['riga_fuelio'])]
+    return pd.concat(scelte) if scelte else candidati
+
+
+def trova_duplicati(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame,
+                    tolleranza_giorni: int = TOLLERANZA_GIORNI, tolleranza_km: float = TOLLERANZA_KM,
+                    tolleranza_kg: float = TOLLERANZA_KG) -> pd.DataFrame:
+    """
+    Trova le coppie di record storici e Fuelio che descrivono lo stesso rifornimento.
+
+    Args:
+        df_storico: Dati storici convertiti nel formato Log
+        df_fuelio: Dati del Log di Fuelio
+        tolleranza_giorni: Differenza massima tra i giorni dei due record
+        tolleranza_km: Differenza massima di chilometraggio
+        tolleranza_kg: Differenza massima di kg (due kg mancanti sono uguali)
+
+    Returns:
+        DataFrame con una riga per coppia (vedi COLONNE_RAPPORTO, senza 'tenuto'),
+        ordinato per riga dello storico
+    """
+    vuoto = pd.DataFrame(columns=COLONNE_RAPPORTO[:-1])
+    if len(df_storico) == 0 or len(df_fuelio) == 0:
+        return vuoto
+
+    storico = _chiavi(df_storico)
+    fuelio = _chiavi(df_fuelio)
+
+    # Finestra di sovrapposizione dei due periodi
+    margine = pd.Timedelta(days=tolleranza_giorni)
+    inizio = max(storico['giorno'].min(), fuelio['giorno'].min()) - margine
+    fine = min(storico['giorno'].max(), fuelio['giorno'].max()) + margine
+    if pd.isna(inizio) or pd.isna(fine) or inizio > fine:
+        return vuoto
+    storico = storico[storico['giorno'].between(inizio, fine) & storico['TankNumber'].notna()
+                      & storico['odo'].notna()]
+    fuelio = fuelio[fuelio['giorno'].between(inizio, fine) & fuelio['TankNumber'].notna()
+                    & fuelio['odo'].notna()]
+    if len(storico) == 0 or len(fuelio) == 0:
+        return vuoto
+
+    # Sort-merge sul chilometraggio all'interno di ogni serbatoio: ogni serbatoio
+    # occupa un intervallo separato della chiave, distante più della tolleranza
+    _, codici = np.unique(np.r_[storico['TankNumber'].to_numpy(), fuelio['TankNumber'].to_numpy()],
+                          return_inverse=True)
+    odo_minimo = min(storico['odo'].min(), fuelio['odo'].min())
+    ampiezza = max(storico['odo'].max(), fuelio['odo'].max()) - odo_minimo + 2 * tolleranza_km + 1
+    chiave = codici * ampiezza + (np.r_[storico['odo'].to_numpy(), fuelio['odo'].to_numpy()] - odo_minimo)
+    chiave_storico, chiave_fuelio = chiave[:len(storico)], chiave[len(storico):]
+
+    ordine = np.argsort(chiave_fuelio, kind='stable')
+    chiave_fuelio = chiave_fuelio[ordine]
+    inizi = np.searchsorted(chiave_fuelio, chiave_storico - tolleranza_km - 1e-9, side='left')
+    quanti = np.searchsorted(chiave_fuelio, chiave_storico + tolleranza_km + 1e-9, side='right') - inizi
+    posizioni = (np.repeat(inizi, quanti)
+                 + np.arange(quanti.sum()) - np.repeat(np.cumsum(quanti) - quanti, quanti))
+    candidati = pd.concat([
+        storico.iloc[np.repeat(np.arange(len(storico)), quanti)].add_suffix('_storico').reset_index(drop=True),
+        fuelio.iloc[ordine[posizioni]].add_suffix('_fuelio').reset_index(drop=True),
+    ], axis=1)
+    candidati['TankNumber'] = candidati['TankNumber_storico']
+    candidati = candidati[(candidati['giorno_fuelio'] - candidati['giorno_storico']).abs() <= margine]
+
+    differenza_km = (candidati['odo_storico'] - candidati['odo_fuelio']).abs()
+    differenza_kg = (candidati['kg_storico'] - candidati['kg_fuelio']).abs()
+    kg_mancanti = candidati['kg_storico'].isna() & candidati['kg_fuelio'].isna()
+    differenza_kg = differenza_kg.where(~kg_mancanti, 0.0)
+    compatibili = (differenza_km <= tolleranza_km) & (differenza_kg <= tolleranza_kg + 1e-9)
+    candidati = candidati[compatibili].assign(
+        differenza_km=differenza_km[compatibili],
+        differenza_kg=differenza_kg[compatibili],
+        differenza_giorni=(candidati['data_fuelio'].dt.floor('D')
+                           - candidati['data_storico'].dt.floor('D'))[compatibili].dt.days.abs(),
+    )
+    if len(candidati) == 0:
+        return vuoto
+
+    # Distanza normalizzata sulle tolleranze: le coppie più vicine vengono scelte per prime
+    candidati['distanza'] = (candidati['differenza_km'] / max(tolleranza_km, 1e-9)
+                             + candidati['differenza_kg'] / max(tolleranza_kg, 1e-9)
+                             + candidati['differenza_giorni'] / max(tolleranza_giorni, 1))
+    coppie = _accoppia(candidati).sort_values('riga_storico', kind='stable')
+
+    riga_storico = coppie['riga_storico'].to_numpy()
+    riga_fuelio = coppie['riga_fuelio'].to_numpy()
+    return pd.DataFrame({
+        'riga_storico': riga_storico,
+        'riga_fuelio': riga_fuelio,
+        'Data_storico': df_storico['Data'].to_numpy()[riga_storico],
+        'Data_fuelio': df_fuelio['Data'].to_numpy()[riga_fuelio],
+        'Odo_storico': coppie['odo_storico'].to_numpy(),
+        'Odo_fuelio': coppie['odo_fuelio'].to_numpy(),
+        'kg_storico': coppie['kg_storico'].to_numpy(),
+        'kg_fuelio': coppie['kg_fuelio'].to_numpy(),
+        'TankNumber': coppie['TankNumber'].to_numpy(),
+        'UniqueId_fuelio': df_fuelio['UniqueId'].to_numpy()[riga_fuelio],
+        'differenza_giorni': coppie['differenza_giorni'].to_numpy(),
+        'differenza_km': coppie['differenza_km'].to_numpy(),
+        'differenza_kg': coppie['differenza_kg'].round(3).to_numpy(),
+    }, columns=COLONNE_RAPPORTO[:-1])
+
+
+def rimuovi_duplicati(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame,
+                      politica: str = POLITICA_PREDEFINITA, file_rapporto: str = None,
+                      tolleranza_giorni: int = TOLLERANZA_GIORNI, tolleranza_km: float = TOLLERANZA_KM,
+                      tolleranza_kg: float = TOLLERANZA_KG):
+    """
+    Rimuove i rifornimenti presenti sia nello storico sia nel Log di Fuelio.
+
+    Args:
+        df_storico: Dati storici convertiti nel formato Log
+        df_fuelio: Dati del Log di Fuelio
+        politica: Record da tenere di ogni coppia (vedi POLITICHE)
+        file_rapporto: File CSV in cui scrivere le coppie trovate (solo se ce ne sono)
+        tolleranza_giorni: Differenza massima tra i giorni dei due record
+        tolleranza_km: Differenza massima di chilometraggio
+        tolleranza_kg: Differenza massima di kg
+
+    Returns:
+        Tupla (df_storico, df_fuelio, coppie) senza i record scartati
+    """
+    if politica not in POLITICHE:
+        raise ValueError(f"Politica sconosciuta: {politica} (ammesse: {', '.join(POLITICHE)})")
+
+    print("\nRicerca dei rifornimenti duplicati tra storico e Fuelio...")
+    coppie = trova_duplicati(df_storico, df_fuelio, tolleranza_giorni, tolleranza_km, tolleranza_kg)
+    coppie['tenuto'] = politica
+
+    if len(coppie) == 0:
+        print("  → Nessun duplicato")
+        if file_rapporto is not None:
+            # Un rapporto di un'esecuzione precedente non è più valido
+            Path(file_rapporto).unlink(missing_ok=True)
+        return df_storico, df_fuelio, coppie
+
+    print(f"  → Duplicati trovati: {len(coppie)} ({POLITICHE[politica]})")
+    if politica == 'fuelio':
+        df_storico = df_storico.drop(index=df_storico.index[coppie['riga_storico'].to_numpy()])
+    elif politica == 'storico':
+        df_fuelio = df_fuelio.drop(index=df_fuelio.index[coppie['riga_fuelio'].to_numpy()])
+
+    if file_rapporto is not None:
+        coppie.to_csv(file_rapporto, index=False)
+        print(f"  → Rapporto salvato in {file_rapporto}")
+
+    return df_storico, df_fuelio, coppie
@@ -0,0 +1,191 @@
+"""
+Script per creare un indice delle tabelle di un file CSV di Fuelio.
+
+L'indice registra, per ogni sezione "##NomeTabella", l'offset in byte, la
+lunghezza e il numero di righe di dati. Viene salvato in un file accanto al
+file originale (es. 'vehicle-1-sync.csv.indice.json') e ricostruito
+automaticamente quando dimensione o data di modifica del file cambiano.
+
+Con l'indice è possibile leggere una sola tabella (es. Costs o FavStations)
+saltando direttamente alla sua posizione tramite mmap, senza scorrere
+tutto il file dall'inizio.
+"""
+
+import json
+import mmap
+from pathlib import Path
+
+from separa_tabelle_fuelio import nome_tabella_da_marker
+
+
+VERSIONE_INDICE = 1
+
+
+def file_indice(file_path: str) -> Path:
+    """
+    Restituisce il percorso del file indice associato a un file Fuelio.
+    
+    Args:
+        file_path: Percorso del file CSV di Fuelio
+        
+    Returns:
+        Percorso del file indice
+    """
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + '.indice.json')
+
+
+def costruisci_indice(file_path: str = "vehicle-1-sync.csv") -> dict:
+    """
+    Scorre il file una volta e registra la posizione di ogni tabella.
+    
+    Per ogni tabella vengono salvati:
+    - offset: posizione in byte dell'intestazione (riga dopo il marker)
+    - lunghezza: byte dall'intestazione fino al marker successivo
+    - righe: numero di righe di dati non vuote (esclusa l'intestazione)
+    
+    Args:
+        file_path: Percorso del file CSV di Fuelio
+        
+    Returns:
+        Dizionario con l'indice del file
+    """
+    file_path = Path(file_path)
+    
+    if not file_path.exists():
+        raise FileNotFoundError(f"File non trovato: {file_path}")
+    
+    stat = file_path.stat()
+    tabelle = {}
+    tabella_corrente = None
+    ha_intestazione = False
+    posizione = 0
+    
+    with open(file_path, 'rb') as f:
+        for riga in f:
+            inizio_riga = posizione
+            posizione += len(riga)
+            riga_stripped = riga.strip()
+            
+            # Decodifica solo le righe candidate a essere un marker
+            if riga_stripped.startswith(b'"##'):
+                nome = nome_tabella_da_marker(riga_stripped.decode('utf-8'))
+                if nome is not None:
+                    if tabella_corrente is not None:
+                        tabella_corrente['lunghezza'] = inizio_riga - tabella_corrente['offset']
+                    tabella_corrente = {'offset': posizione, 'lunghezza': 0, 'righe': 0}
+                    tabelle[nome] = tabella_corrente
+                    ha_intestazione = False
+                    continue
+            
+            if tabella_corrente is None:
+                continue
+            
+            if not ha_intestazione:
+                ha_intestazione = True
+            elif riga_stripped:
+                tabella_corrente['righe'] += 1
+    
+    if tabella_corrente is not None:
+        tabella_corrente['lunghezza'] = posizione - tabella_corrente['offset']
+    
+    return {
+        'versione': VERSIONE_INDICE,
+        'dimensione': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'tabelle': tabelle,
+    }
+
+
+def carica_indice(file_path: str = "vehicle-1-sync.csv") -> dict:
+    """
+    Carica l'indice del file, ricostruendolo se mancante o non aggiornato.
+    
+    L'indice è considerato valido solo se dimensione e data di modifica
+    del file corrispondono a quelle registrate.
+    
+    Args:
+        file_path: Percorso del file CSV di Fuelio
+        
+    Returns:
+        Dizionario con l'indice del file
+    """
+    file_path = Path(file_path)
+    percorso_indice = file_indice(file_path)
+    
+    if not file_path.exists():
+        raise FileNotFoundError(f"File non trovato: {file_path}")
+    
+    stat = file_path.stat()
+    
+    if percorso_indice.exists():
+        try:
+            with open(percorso_indice, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+            if (indice.get('versione') == VERSIONE_INDICE
+                    and indice.get('dimensione') == stat.st_size
+                    and indice.get('mtime_ns') == stat.st_mtime_ns):
+                return indice
+        except (OSError, ValueError):
+            pass
+    
+    indice = costruisci_indice(file_path)
+    
+    with open(percorso_indice, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2)
+    
+    return indice
+
+
+def leggi_tabella(file_path: str, nome_tabella: str) -> tuple[str, list]:
+    """
+    Legge una sola tabella del file usando l'indice e mmap.
+    
+    Il tempo di lettura è proporzionale alla dimensione della tabella,
+    non a quella dell'intero file.
+    
+    Args:
+        file_path: Percorso del file CSV di Fuelio
+        nome_tabella: Nome della tabella da leggere (es. 'Costs')
+        
+    Returns:
+        Tupla (intestazione, lista di righe di dati non vuote)
+    """
+    indice = carica_indice(file_path)
+    
+    if nome_tabella not in indice['tabelle']:
+        raise KeyError(f"Tabella '{nome_tabella}' non presente in {file_path}")
+    
+    info = indice['tabelle'][nome_tabella]
+    if info['lunghezza'] == 0:
+        return '', []
+    
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            contenuto = mm[info['offset']:info['offset'] + info['lunghezza']]
+    
+    righe = [riga.strip() for riga in contenuto.decode('utf-8').splitlines()]
+    if not righe:
+        return '', []
+    
+    intestazione = righe[0]
+    return intestazione, [riga for riga in righe[1:] if riga]
+
+
+if __name__ == "__main__":
+    try:
+        indice = carica_indice()
+        
+        print("=" * 60)
+        print("INDICE TABELLE FUELIO")
+        print("=" * 60)
+        print(f"\nIndice salvato in: {file_indice('vehicle-1-sync.csv')}")
+        print()
+        for nome, info in indice['tabelle'].items():
+            print(f"  - {nome}: offset {info['offset']:,} byte, "
+                  f"{info['lunghezza']:,} byte, {info['righe']} righe")
+    except FileNotFoundError as e:
+        print(f"ERRORE: {e}")
+        print("Assicurati che il file 'vehicle-1-sync.csv' sia nella stessa directory dello script.")
+    except Exception as e:
+        print(f"ERRORE imprevisto: {e}")
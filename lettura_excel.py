@@ -0,0 +1,263 @@
+"""
+Lettura veloce dei fogli Excel.
+
+I fogli vengono letti in streaming con openpyxl in modalità read-only
+(iter_rows), a blocchi di righe, applicando tipi di colonna espliciti.
+Il risultato non viene salvato qui: chi legge un foglio completo passa dalla
+cache delle fasi (cache_fasi.con_cache), che lo indicizza per contenuto del
+file, così ogni versione di un file viene letta una sola volta:
+carica_dati_excel e carica_tabella_conversione (unisci_log_storico e
+pipeline), check_tabella_conversione e check_excel. Non passano dalla cache
+leggi_blocchi_excel (ordinamento_esterno legge lo storico a blocchi per non
+tenerlo in memoria) e benchmark_pipeline, che misura proprio la lettura.
+
+Il risultato è equivalente a pd.read_excel (stessi nomi di colonna,
+stessa gestione di celle vuote, valori NA e righe vuote finali).
+"""
+
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+from schemi_fuelio import TIPI_CONVERSIONE, TIPI_STORICO  # noqa: F401 (riesportati)
+
+
+# Righe elaborate per blocco durante la lettura
+RIGHE_PER_BLOCCO = 50_000
+
+# Stringhe interpretate come valore mancante (come in pd.read_excel)
+VALORI_NA = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+}
+
+# Valori di errore di Excel (letti come valore mancante)
+ERRORI_EXCEL = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+
+def _converti_cella(valore):
+    """
+    Converte il valore di una cella come fa pd.read_excel.
+
+    Args:
+        valore: Valore letto da openpyxl
+
+    Returns:
+        Valore convertito (None per le celle vuote, con valore NA o con errori)
+    """
+    if isinstance(valore, float) and valore.is_integer():
+        # I numeri interi salvati come float diventano int
+        return int(valore)
+    if isinstance(valore, str) and (valore in VALORI_NA or valore in ERRORI_EXCEL):
+        return None
+    return valore
+
+
+def _taglia_vuote_finali(riga: tuple) -> list:
+    """
+    Rimuove le celle vuote alla fine di una riga.
+
+    Args:
+        riga: Valori della riga
+
+    Returns:
+        Lista dei valori senza le celle vuote finali
+    """
+    fine = len(riga)
+    while fine > 0 and riga[fine - 1] is None:
+        fine -= 1
+    return list(riga[:fine])
+
+
+def _nomi_colonne(intestazione: list) -> list:
+    """
+    Costruisce i nomi delle colonne come pd.read_excel ('Unnamed: N', duplicati con suffisso '.N').
+
+    Args:
+        intestazione: Valori della riga di intestazione
+
+    Returns:
+        Lista dei nomi delle colonne
+    """
+    nomi = []
+    visti = {}
+    for i, valore in enumerate(intestazione):
+        nome = f"Unnamed: {i}" if valore is None else valore
+        if nome in visti:
+            visti[nome] += 1
+            nuovo = f"{nome}.{visti[nome]}"
+            while nuovo in visti:
+                visti[nome] += 1
+                nuovo = f"{nome}.{visti[nome]}"
+            visti[nuovo] = 0
+            nome = nuovo
+        else:
+            visti[nome] = 0
+        nomi.append(nome)
+    return nomi
+
+
+def _blocco_dataframe(righe: list, colonne: list, dtype: dict) -> pd.DataFrame:
+    """
+    Converte un blocco di righe in DataFrame applicando i tipi espliciti.
+
+    Args:
+        righe: Lista di righe (liste di valori, tutte lunghe quanto colonne)
+        colonne: Nomi delle colonne
+        dtype: Tipi espliciti {colonna: dtype}
+
+    Returns:
+        DataFrame del blocco
+    """
+    dati = {nome: [riga[i] for riga in righe] for i, nome in enumerate(colonne)}
+    return _applica_tipi(pd.DataFrame(dati, columns=colonne), dtype)
+
+
+def _applica_tipi(df: pd.DataFrame, dtype: dict) -> pd.DataFrame:
+    """
+    Applica i tipi espliciti e inferisce quelli delle altre colonne.
+
+    Come in pd.read_excel, le colonne completamente vuote diventano float64.
+
+    Args:
+        df: DataFrame da convertire
+        dtype: Tipi espliciti {colonna: dtype}
+
+    Returns:
+        DataFrame con i tipi applicati
+    """
+    for nome in df.columns:
+        if nome in dtype:
+            df[nome] = df[nome].astype(dtype[nome])
+        elif df[nome].dtype == object:
+            if df[nome].isna().all():
+                df[nome] = df[nome].astype('float64')
+            else:
+                df[nome] = df[nome].infer_objects()
+    return df
+
+
+def leggi_blocchi_excel(file_excel: str, header: int = 0, dtype: dict = None, foglio=0,
+                        righe_per_blocco: int = RIGHE_PER_BLOCCO):
+    """
+    Legge un foglio Excel in streaming, restituendo un DataFrame per ogni blocco di righe.
+
+    Permette di elaborare fogli più grandi della memoria disponibile. I blocchi
+    concatenati equivalgono al risultato di leggi_foglio_excel.
+
+    Args:
+        file_excel: Percorso del file Excel
+        header: Indice (0-based) della riga di intestazione
+        dtype: Tipi espliciti {colonna: dtype}
+        foglio: Nome o indice del foglio
+        righe_per_blocco: Numero massimo di righe per blocco
+
+    Yields:
+        DataFrame con le righe del blocco
+    """
+    dtype = dtype or {}
+    wb = openpyxl.load_workbook(file_excel, read_only=True, data_only=True)
+    try:
+        ws = wb[foglio] if isinstance(foglio, str) else wb.worksheets[foglio]
+
+        colonne = None
+        blocco = []
+        vuote_in_sospeso = []
+        restituiti = 0
+
+        for i, riga in enumerate(ws.iter_rows(values_only=True)):
+            if i < header:
+                continue
+
+            valori = _taglia_vuote_finali(tuple(_converti_cella(v) for v in riga))
+
+            if colonne is None:
+                colonne = _nomi_colonne(valori)
+                continue
+
+            # Colonne oltre l'intestazione: come pd.read_excel, diventano 'Unnamed: N'
+            while len(valori) > len(colonne):
+                colonne.append(f"Unnamed: {len(colonne)}")
+
+            if not valori:
+                # Le righe vuote vengono tenute solo se seguite da righe con dati
+                vuote_in_sospeso.append(valori)
+                continue
+
+            blocco.extend(vuote_in_sospeso)
+            vuote_in_sospeso = []
+            blocco.append(valori)
+
+            if len(blocco) >= righe_per_blocco:
+                yield _blocco_dataframe(_completa(blocco, len(colonne)), colonne, dtype)
+                restituiti += 1
+                blocco = []
+
+        if colonne is not None and (blocco or restituiti == 0):
+            yield _blocco_dataframe(_completa(blocco, len(colonne)), colonne, dtype)
+    finally:
+        wb.close()
+
+
+def _leggi_foglio(file_excel: Path, header: int, dtype: dict, foglio) -> pd.DataFrame:
+    """
+    Legge il foglio in streaming, a blocchi di RIGHE_PER_BLOCCO righe.
+
+    Args:
+        file_excel: Percorso del file Excel
+        header: Indice (0-based) della riga di intestazione
+        dtype: Tipi espliciti {colonna: dtype}
+        foglio: Nome o indice del foglio
+
+    Returns:
+        DataFrame con i dati del foglio
+    """
+    blocchi = list(leggi_blocchi_excel(file_excel, header, dtype, foglio))
+
+    if not blocchi:
+        return pd.DataFrame()
+
+    if len(blocchi) == 1:
+        return blocchi[0]
+
+    return _applica_tipi(pd.concat(blocchi, ignore_index=True), dtype)
+
+
+def _completa(righe: list, numero_colonne: int) -> list:
+    """
+    Completa con None le righe più corte del numero di colonne.
+
+    Args:
+        righe: Lista di righe
+        numero_colonne: Numero di colonne
+
+    Returns:
+        Lista di righe tutte della stessa lunghezza
+    """
+    return [riga + [None] * (numero_colonne - len(riga)) for riga in righe]
+
+
+def leggi_foglio_excel(file_excel: str, header: int = 0, dtype: dict = None, foglio=0) -> pd.DataFrame:
+    """
+    Legge un foglio Excel.
+
+    Args:
+        file_excel: Percorso del file Excel
+        header: Indice (0-based) della riga di intestazione (come in pd.read_excel)
+        dtype: Tipi espliciti {colonna: dtype}; le colonne non elencate vengono inferite
+        foglio: Nome o indice del foglio (default: il primo)
+
+    Returns:
+        DataFrame con i dati del foglio
+    """
+    file_excel = Path(file_excel)
+
+    if not file_excel.exists():
+        raise FileNotFoundError(f"File non trovato: {file_excel}")
+
+    if isinstance(header, (list, tuple)):
+        # header=[2] equivale a header=2
+        header = header[0]
+
+    return _leggi_foglio(file_excel, header, dtype or {}, foglio)
@@ -1,6 +1,123 @@
-def main():
-    print("Hello from fuelio!")
+"""
+Comando unico `fuelio` con i sottocomandi degli script del progetto.
+
+    fuelio split              separa vehicle-1-sync.csv nelle tabelle CSV
+    fuelio merge              unisce lo storico Excel con il Log di Fuelio
+    fuelio assemble           riunisce le tabelle nel file per Fuelio
+    fuelio verify             verifica il file riassemblato
+    fuelio check-conversion   verifica la tabella di conversione distributori
+    fuelio stats              statistiche per periodo del Log unificato
+
+Ogni sottocomando importa i propri moduli (e quindi pandas) solo quando
+viene eseguito: `fuelio --help` e `fuelio verify --help` non li caricano.
+benchmark_avvio.py misura i tempi di avvio rispetto a BUDGET_AVVIO_MS.
+"""
+
+import argparse
+import sys
+
+
+# Tempo massimo di avvio (ms) per l'aiuto dei sottocomandi, misurato da benchmark_avvio.py
+BUDGET_AVVIO_MS = 100
+
+
+def _split(args, altri: list):
+    from separa_tabelle_fuelio import separa_tabelle_fuelio
+    separa_tabelle_fuelio(args.file, output_dir=args.directory)
+
+
+def _merge(args, altri: list):
+    from unisci_log_storico import main as unisci
+    return unisci(altri)
+
+
+def _assemble(args, altri: list):
+    from riunisci_tabelle_fuelio import riunisci_tabelle_fuelio
+    riunisci_tabelle_fuelio(args.output, input_dir=args.directory)
+
+
+def _verify(args, altri: list):
+    from verifica_file_fuelio import verifica_file_fuelio
+    return verifica_file_fuelio(args.file, record_attesi=args.record_attesi, processi=args.processi)
+
+
+def _check_conversion(args, altri: list):
+    from check_tabella_conversione import verifica_tabella_conversione
+    verifica_tabella_conversione(args.file, usa_cache=not args.no_cache)
+
+
+def _stats(args, altri: list):
+    from statistiche import main as statistiche
+    return statistiche(altri)
+
+
+def crea_parser() -> argparse.ArgumentParser:
+    """
+    Crea il parser del comando `fuelio`, senza importare i moduli dei sottocomandi.
+
+    I sottocomandi merge e stats passano i loro argomenti al main dello
+    script corrispondente (il loro --help richiede quindi pandas).
+
+    Returns:
+        Parser con un sottocomando per script
+    """
+    parser = argparse.ArgumentParser(prog='fuelio', description="Strumenti per i file di sincronizzazione di Fuelio")
+    comandi = parser.add_subparsers(dest='comando', required=True, metavar='COMANDO')
+
+    split = comandi.add_parser('split', help="separa il file di Fuelio nelle tabelle CSV")
+    split.add_argument('file', nargs='?', default='vehicle-1-sync.csv',
+                       help="file di sincronizzazione di Fuelio (default: vehicle-1-sync.csv)")
+    split.add_argument('--directory', default=None, help="directory delle tabelle (default: corrente)")
+    split.set_defaults(esegui=_split)
+
+    merge = comandi.add_parser('merge', add_help=False,
+                               help="unisce lo storico Excel con il Log (opzioni: fuelio merge --help)")
+    merge.set_defaults(esegui=_merge, inoltra=True)
+
+    assemble = comandi.add_parser('assemble', help="riunisce le tabelle nel file per Fuelio")
+    assemble.add_argument('--output', default='vehicle-1-sync-extended.csv',
+                          help="file di output (default: vehicle-1-sync-extended.csv)")
+    assemble.add_argument('--directory', default=None, help="directory delle tabelle (default: corrente)")
+    assemble.set_defaults(esegui=_assemble)
+
+    verify = comandi.add_parser('verify', help="verifica il file riassemblato per Fuelio")
+    verify.add_argument('file', nargs='?', default='vehicle-1-sync-extended.csv',
+                        help="file da verificare (default: vehicle-1-sync-extended.csv)")
+    verify.add_argument('--record-attesi', type=int, default=None,
+                        help="numero di record atteso nella tabella Log")
+    verify.add_argument('--processi', type=int, default=None,
+                        help="numero massimo di processi (default: numero di core)")
+    verify.set_defaults(esegui=_verify)
+
+    conversione = comandi.add_parser('check-conversion', help="verifica la tabella di conversione distributori")
+    conversione.add_argument('file', nargs='?', default='Tabella_Conversione_Distro.xlsx',
+                             help="tabella di conversione (default: Tabella_Conversione_Distro.xlsx)")
+    conversione.add_argument('--no-cache', action='store_true',
+                             help="rilegge il file anche se è già nella cache (.cache_fuelio)")
+    conversione.set_defaults(esegui=_check_conversion)
+
+    stats = comandi.add_parser('stats', add_help=False,
+                               help="statistiche per periodo del Log unificato (opzioni: fuelio stats --help)")
+    stats.set_defaults(esegui=_stats, inoltra=True)
+
+    return parser
+
+
+def main(argv: list = None):
+    """
+    Esegue il sottocomando richiesto.
+
+    Returns:
+        Codice di uscita (0 = successo)
+    """
+    parser = crea_parser()
+    args, altri = parser.parse_known_args(argv)
+    if altri and not getattr(args, 'inoltra', False):
+        parser.error(f"argomenti non riconosciuti: {' '.join(altri)}")
+
+    risultato = args.esegui(args, altri)
+    return 1 if risultato is False else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
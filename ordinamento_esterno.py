@@ -0,0 +1,417 @@
+"""
+Unione e ordinamento su disco (ordinamento esterno) per Log unificati molto grandi.
+
+Produce lo stesso Log_unificato.csv di unisci_log_storico.py, ma senza mai
+caricare in memoria tutti i rifornimenti:
+1. Le sorgenti (foglio Excel storico e uno o più Log di Fuelio) vengono lette
+   a blocchi; ogni blocco viene convertito, ordinato per Data e scritto su
+   disco come "run" ordinato, con le righe già formattate nel formato Fuelio
+2. I run vengono fusi con un merge a k vie (heapq.merge) in un unico flusso
+   ordinato; se sono troppi per essere aperti insieme, vengono prima fusi a gruppi
+3. Durante la fusione UniqueId viene assegnato al volo e il file viene
+   scritto con le virgolette su tutti i campi (QUOTE_ALL)
+
+A parità di data i record sono ordinati per chilometraggio e, a parità anche
+di chilometraggio, viene mantenuto l'ordine delle sorgenti (prima lo storico,
+poi i Log nell'ordine indicato) e, all'interno di ogni sorgente, l'ordine
+originale delle righe: il risultato coincide con l'ordinamento stabile di
+unisci_e_ordina.
+
+La memoria massima usata è regolata dal numero di righe per run
+(--righe-per-run) o, in modo approssimato, da --memoria-mb.
+
+I rifornimenti presenti sia nello storico sia in Fuelio non vengono rimossi
+(vedi deduplicazione.py): servirebbe tenere in memoria tutte le sorgenti.
+Se i due periodi si sovrappongono, usare unisci_log_storico.py.
+"""
+
+import argparse
+import contextlib
+import csv
+import heapq
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from consumi import CHIAVI_SERBATOIO, COLONNA_CONSUMO, COLONNE_CONSUMI, riempi_consumi
+from lettura_excel import TIPI_STORICO, leggi_blocchi_excel
+from schemi_fuelio import FORMATO_DATA_ORA, leggi_tabella_fuelio
+from scrittura_fuelio import righe_csv_fuelio
+from unisci_log_storico import (
+    COLONNE_LOG,
+    FORMATI_LOG,
+    applica_conversione_distributori,
+    carica_tabella_conversione,
+    converti_dati_excel,
+)
+
+
+# Righe per run predefinite
+RIGHE_PER_RUN = 200_000
+
+# Memoria stimata per riga durante la creazione di un run (DataFrame + testo formattato)
+BYTE_PER_RIGA = 2_000
+
+# Numero massimo di run fusi contemporaneamente (file aperti)
+MAX_RUN_APERTI = 64
+
+# Posizione della colonna UniqueId nel Log
+INDICE_UNIQUEID = COLONNE_LOG.index('UniqueId')
+
+# Colonne numeriche sempre float nel Log unificato. Nell'unione in memoria
+# pd.concat le porta a float64 in tutte le righe; qui ogni blocco viene
+# convertito esplicitamente, perché un singolo blocco potrebbe essere letto come intero.
+COLONNE_FLOAT = [
+    'Odo (km)', 'kg', 'Price (optional)', 'latitude (optional)',
+    'longitude (optional)', 'VolumePrice', 'ExcludeDistance', 'TankCalc',
+]
+
+# Chiave usata per le date non valide: come in sort_values, finiscono in fondo
+CHIAVE_DATA_MANCANTE = np.iinfo('int64').max
+
+# Chiave usata per i chilometraggi mancanti: come in sort_values, finiscono in fondo alla data
+CHIAVE_ODO_MANCANTE = float('inf')
+
+
+def righe_per_memoria(memoria_mb: float) -> int:
+    """
+    Stima il numero di righe per run che rientra nella memoria indicata.
+
+    Args:
+        memoria_mb: Memoria massima in MB
+
+    Returns:
+        Numero di righe per run (almeno 1000)
+    """
+    return max(1_000, int(memoria_mb * 1024 * 1024 // BYTE_PER_RIGA))
+
+
+def _silenzioso(funzione, *args, **kwargs):
+    """
+    Esegue una funzione sopprimendone l'output (le funzioni di conversione
+    stampano un riepilogo che, ripetuto per ogni blocco, sarebbe solo rumore).
+
+    Args:
+        funzione: Funzione da eseguire
+        *args, **kwargs: Argomenti della funzione
+
+    Returns:
+        Risultato della funzione
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funzione(*args, **kwargs)
+
+
+def blocchi_storico(file_excel: str, df_conversione: pd.DataFrame = None,
+                    righe_per_blocco: int = RIGHE_PER_RUN, directory_temp: str = None):
+    """
+    Legge il file Excel storico a blocchi, convertendolo nel formato Log.
+
+    Il consumo dei record storici dipende dall'intera sequenza di ogni
+    serbatoio (ordinata per chilometraggio): i blocchi convertiti vengono prima
+    salvati su disco, tenendo in memoria solo le colonne del calcolo, e poi
+    riletti con il consumo calcolato come in unisci_e_ordina.
+
+    Args:
+        file_excel: Percorso del file Excel storico
+        df_conversione: Tabella di conversione distributori (opzionale)
+        righe_per_blocco: Righe per blocco
+        directory_temp: Directory per i blocchi temporanei (default: quella di sistema)
+
+    Yields:
+        DataFrame con i record storici del blocco nel formato Log
+    """
+    colonne_consumi = list(CHIAVI_SERBATOIO) + COLONNE_CONSUMI + [COLONNA_CONSUMO]
+
+    with tempfile.TemporaryDirectory(prefix='fuelio-storico-', dir=directory_temp) as directory:
+        file_blocchi = []
+        sequenze = []
+        for blocco in leggi_blocchi_excel(file_excel, header=2, dtype=TIPI_STORICO,
+                                          righe_per_blocco=righe_per_blocco):
+            df = _silenzioso(converti_dati_excel, blocco, df_conversione)
+            if df_conversione is not None:
+                df = _silenzioso(applica_conversione_distributori, df, df_conversione, is_storico=True)
+            file_blocco = Path(directory) / f'storico-{len(file_blocchi):05d}.pkl'
+            df.to_pickle(file_blocco)
+            file_blocchi.append(file_blocco)
+            sequenze.append(df[colonne_consumi])
+
+        if not file_blocchi:
+            return
+        consumi = riempi_consumi(pd.concat(sequenze, ignore_index=True))[COLONNA_CONSUMO].to_numpy()
+        del sequenze
+
+        inizio = 0
+        for file_blocco in file_blocchi:
+            df = pd.read_pickle(file_blocco)
+            file_blocco.unlink()
+            df[COLONNA_CONSUMO] = consumi[inizio:inizio + len(df)]
+            inizio += len(df)
+            yield df
+
+
+def blocchi_fuelio(file_log: str, df_conversione: pd.DataFrame = None,
+                   righe_per_blocco: int = RIGHE_PER_RUN):
+    """
+    Legge un Log di Fuelio a blocchi.
+
+    Args:
+        file_log: Percorso del Log.csv
+        df_conversione: Tabella di conversione distributori (opzionale)
+        righe_per_blocco: Righe per blocco
+
+    Yields:
+        DataFrame con i record del blocco
+    """
+    with leggi_tabella_fuelio(file_log, 'Log', uso='unione', chunksize=righe_per_blocco) as lettore:
+        for df in lettore:
+            if df_conversione is not None:
+                df = _silenzioso(applica_conversione_distributori, df, df_conversione, is_storico=False)
+            yield df
+
+
+def scrivi_run(df: pd.DataFrame, primo_progressivo: int, file_run: Path):
+    """
+    Ordina un blocco per Data e Odo e lo scrive su disco come run.
+
+    Ogni riga del run contiene le chiavi di ordinamento (Data in nanosecondi e
+    Odo), il progressivo della riga nell'ordine delle sorgenti e la riga del
+    Log già formattata, divisa in due parti attorno a UniqueId.
+
+    Args:
+        df: Blocco di record nel formato Log
+        primo_progressivo: Progressivo globale della prima riga del blocco
+        file_run: Percorso del run da scrivere
+    """
+    date = pd.to_datetime(df['Data'], format=FORMATO_DATA_ORA)
+    chiavi = date.to_numpy(dtype='datetime64[ns]').view('int64').copy()
+    chiavi[date.isna().to_numpy()] = CHIAVE_DATA_MANCANTE
+    odo = pd.to_numeric(df['Odo (km)'], errors='coerce').to_numpy(dtype='float64').copy()
+    odo[np.isnan(odo)] = CHIAVE_ODO_MANCANTE
+    # lexsort è stabile e ordina per l'ultima chiave, poi per la precedente
+    ordine = np.lexsort((odo, chiavi))
+
+    df = df.iloc[ordine].copy()
+    for col in COLONNE_FLOAT:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype('float64')
+
+    prima = righe_csv_fuelio(df[COLONNE_LOG[:INDICE_UNIQUEID]], FORMATI_LOG)
+    dopo = righe_csv_fuelio(df[COLONNE_LOG[INDICE_UNIQUEID + 1:]], FORMATI_LOG)
+    progressivi = np.arange(primo_progressivo, primo_progressivo + len(df))[ordine]
+
+    with open(file_run, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(
+            zip(chiavi[ordine].tolist(), odo[ordine].tolist(), progressivi.tolist(), prima, dopo)
+        )
+
+
+def leggi_run(file_run: Path):
+    """
+    Legge un run in ordine.
+
+    Args:
+        file_run: Percorso del run
+
+    Yields:
+        Tuple (chiave data, chiave odo, progressivo, prima parte, seconda parte)
+    """
+    with open(file_run, 'r', encoding='utf-8', newline='') as f:
+        for chiave, odo, progressivo, prima, dopo in csv.reader(f):
+            yield int(chiave), float(odo), int(progressivo), prima, dopo
+
+
+def fondi_run(file_run: list, file_output: Path):
+    """
+    Fonde più run in un unico run ordinato.
+
+    Args:
+        file_run: Percorsi dei run da fondere
+        file_output: Percorso del run risultante
+    """
+    with open(file_output, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(
+            heapq.merge(*(leggi_run(run) for run in file_run))
+        )
+
+
+def riduci_run(file_run: list, directory: Path, max_run_aperti: int = MAX_RUN_APERTI) -> list:
+    """
+    Fonde i run a gruppi finché non sono al massimo max_run_aperti.
+
+    Args:
+        file_run: Percorsi dei run
+        directory: Directory dei file temporanei
+        max_run_aperti: Numero massimo di run fusi contemporaneamente
+
+    Returns:
+        Percorsi dei run rimasti
+    """
+    passata = 0
+    while len(file_run) > max_run_aperti:
+        passata += 1
+        nuovi = []
+        for i in range(0, len(file_run), max_run_aperti):
+            gruppo = file_run[i:i + max_run_aperti]
+            if len(gruppo) == 1:
+                nuovi.extend(gruppo)
+                continue
+            fuso = directory / f'fusione-{passata}-{len(nuovi):05d}.csv'
+            fondi_run(gruppo, fuso)
+            for run in gruppo:
+                run.unlink()
+            nuovi.append(fuso)
+        print(f"  → Passata di fusione {passata}: {len(file_run)} run → {len(nuovi)}")
+        file_run = nuovi
+    return file_run
+
+
+def unisci_esterno(file_excel: str = "Contabilita_consumi_Punto.xlsx", file_log=("Log.csv",),
+                   file_output: str = "Log_unificato.csv", df_conversione: pd.DataFrame = None,
+                   righe_per_run: int = RIGHE_PER_RUN, directory_temp: str = None,
+                   max_run_aperti: int = MAX_RUN_APERTI) -> int:
+    """
+    Unisce storico e Log di Fuelio con un ordinamento esterno e scrive il Log unificato.
+
+    Args:
+        file_excel: Percorso del file Excel storico (None per non usarlo)
+        file_log: Percorso o lista di percorsi dei Log di Fuelio
+        file_output: Percorso del Log unificato da scrivere
+        df_conversione: Tabella di conversione distributori (opzionale)
+        righe_per_run: Righe per run (determina la memoria massima usata)
+        directory_temp: Directory per i run temporanei (default: quella di sistema)
+        max_run_aperti: Numero massimo di run fusi contemporaneamente
+
+    Returns:
+        Numero di record scritti
+    """
+    if isinstance(file_log, (str, Path)):
+        file_log = [file_log]
+
+    file_output = Path(file_output)
+    max_uniqueid_fuelio = 0
+    righe_lette = 0
+
+    with tempfile.TemporaryDirectory(prefix='fuelio-run-', dir=directory_temp) as directory:
+        directory = Path(directory)
+        file_run = []
+
+        # 1. Creazione dei run ordinati
+        print(f"\nCreazione dei run ordinati ({righe_per_run:,} righe per run)...")
+        sorgenti = []
+        if file_excel is not None:
+            sorgenti.append((file_excel, False, blocchi_storico(file_excel, df_conversione, righe_per_run,
+                                                               directory_temp)))
+        for log in file_log:
+            sorgenti.append((log, True, blocchi_fuelio(log, df_conversione, righe_per_run)))
+
+        for nome, is_fuelio, blocchi in sorgenti:
+            righe_sorgente = 0
+            for df in blocchi:
+                if len(df) == 0:
+                    continue
+                if is_fuelio:
+                    max_uniqueid_fuelio = max(max_uniqueid_fuelio, int(df['UniqueId'].max()))
+                run = directory / f'run-{len(file_run):05d}.csv'
+                scrivi_run(df, righe_lette, run)
+                file_run.append(run)
+                righe_lette += len(df)
+                righe_sorgente += len(df)
+            print(f"  → {nome}: {righe_sorgente:,} record")
+
+        print(f"  → Run creati: {len(file_run)}")
+
+        # 2. Fusione a gruppi se i run sono troppi
+        file_run = riduci_run(file_run, directory, max_run_aperti)
+
+        # 3. Fusione finale con assegnazione di UniqueId e scrittura del Log
+        print(f"\nFusione finale e scrittura su {file_output}...")
+        temporaneo = file_output.with_name(f'.{file_output.name}.{os.getpid()}.tmp')
+        intestazione = io.StringIO()
+        csv.writer(intestazione, quoting=csv.QUOTE_ALL, lineterminator=os.linesep).writerow(COLONNE_LOG)
+
+        scritte = 0
+        with open(temporaneo, 'w', encoding='utf-8', newline='', buffering=1024 * 1024) as f:
+            f.write(intestazione.getvalue())
+            for scritte, (_, _, _, prima, dopo) in enumerate(
+                    heapq.merge(*(leggi_run(run) for run in file_run)), start=1):
+                f.write(f'{prima},"{scritte}",{dopo}{os.linesep}')
+        os.replace(temporaneo, file_output)
+
+    # Stato per le successive unioni incrementali
+    from unione_incrementale import salva_stato
+    salva_stato(file_output, max_uniqueid_fuelio, scritte)
+
+    print(f"  → Totale record: {scritte:,}")
+    return scritte
+
+
+def main(argv: list = None):
+    """
+    Funzione principale dello script.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(
+        description="Unisce storico Excel e Log di Fuelio con un ordinamento su disco")
+    parser.add_argument('--excel', default="Contabilita_consumi_Punto.xlsx",
+                        help="file Excel storico (default: Contabilita_consumi_Punto.xlsx)")
+    parser.add_argument('--senza-storico', action='store_true', help="non usa il file Excel storico")
+    parser.add_argument('--log', action='append', default=None,
+                        help="Log di Fuelio da unire (ripetibile, default: Log.csv)")
+    parser.add_argument('--conversione', default="Tabella_Conversione_Distro.xlsx",
+                        help="tabella di conversione distributori")
+    parser.add_argument('--output', default="Log_unificato.csv", help="file di output")
+    parser.add_argument('--righe-per-run', type=int, default=None,
+                        help=f"righe per run ordinato (default: {RIGHE_PER_RUN:,})")
+    parser.add_argument('--memoria-mb', type=float, default=None,
+                        help="memoria massima indicativa in MB (alternativa a --righe-per-run)")
+    parser.add_argument('--temp', default=None, help="directory per i file temporanei")
+    args = parser.parse_args(argv)
+
+    righe_per_run = args.righe_per_run or RIGHE_PER_RUN
+    if args.memoria_mb is not None and args.righe_per_run is None:
+        righe_per_run = righe_per_memoria(args.memoria_mb)
+
+    print("=" * 60)
+    print("UNIONE LOG CON ORDINAMENTO ESTERNO")
+    print("=" * 60)
+
+    inizio = time.perf_counter()
+    try:
+        try:
+            df_conversione = carica_tabella_conversione(args.conversione)
+        except FileNotFoundError:
+            print("  ⚠ Tabella conversione non trovata, i campi distributore non verranno popolati")
+            df_conversione = None
+
+        unisci_esterno(
+            file_excel=None if args.senza_storico else args.excel,
+            file_log=args.log or ["Log.csv"],
+            file_output=args.output,
+            df_conversione=df_conversione,
+            righe_per_run=righe_per_run,
+            directory_temp=args.temp,
+        )
+
+        print(f"\n✅ Processo completato in {time.perf_counter() - inizio:.1f} s")
+
+    except FileNotFoundError as e:
+        print(f"\n❌ ERRORE: File non trovato - {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERRORE imprevisto: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Pipeline in-process per creare il file CSV esteso per Fuelio.
+
+Le fasi (caricamento, conversione, unione, riunione tabelle, verifica) sono
+dichiarate come un grafo aciclico di dipendenze (DAG) ed eseguite nello stesso
+processo: i DataFrame passano da una fase all'altra in memoria, senza file
+intermedi e senza riavviare l'interprete per ogni script.
+
+Le fasi indipendenti (es. caricamento della tabella di conversione, del file
+Excel e di Log.csv) vengono eseguite in parallelo.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from strumentazione import conta_righe, misura_fase
+
+
+@dataclass
+class Fase:
+    """
+    Una fase della pipeline.
+
+    Attributes:
+        nome: Nome univoco della fase
+        funzione: Funzione da eseguire, riceve i risultati delle dipendenze nell'ordine dichiarato
+        dipendenze: Nomi delle fasi i cui risultati servono a questa fase
+    """
+    nome: str
+    funzione: Callable
+    dipendenze: tuple = ()
+
+
+def ordina_fasi(fasi: list) -> list:
+    """
+    Ordina le fasi in ordine topologico, verificando che il grafo sia aciclico.
+
+    Args:
+        fasi: Lista di Fase
+
+    Returns:
+        Lista di Fase in ordine di esecuzione
+    """
+    per_nome = {fase.nome: fase for fase in fasi}
+    if len(per_nome) != len(fasi):
+        raise ValueError("Nomi delle fasi duplicati nella pipeline")
+
+    for fase in fasi:
+        for dipendenza in fase.dipendenze:
+            if dipendenza not in per_nome:
+                raise ValueError(f"La fase '{fase.nome}' dipende da '{dipendenza}', che non esiste")
+
+    ordinate = []
+    stato = {}  # nome -> 'in_corso' | 'fatto'
+
+    def visita(fase):
+        if stato.get(fase.nome) == 'fatto':
+            return
+        if stato.get(fase.nome) == 'in_corso':
+            raise ValueError(f"Ciclo di dipendenze che coinvolge la fase '{fase.nome}'")
+        stato[fase.nome] = 'in_corso'
+        for dipendenza in fase.dipendenze:
+            visita(per_nome[dipendenza])
+        stato[fase.nome] = 'fatto'
+        ordinate.append(fase)
+
+    for fase in fasi:
+        visita(fase)
+
+    return ordinate
+
+
+def _esegui_fase(fase: Fase, argomenti: list) -> Any:
+    """
+    Esegue una fase, misurandola se la strumentazione è attiva.
+
+    Args:
+        fase: Fase da eseguire
+        argomenti: Risultati delle dipendenze
+
+    Returns:
+        Risultato della fase
+    """
+    with misura_fase(f"pipeline:{fase.nome}") as misura:
+        risultato = fase.funzione(*argomenti)
+        misura['righe_uscita'] = conta_righe(risultato)
+    return risultato
+
+
+def esegui_pipeline(fasi: list, max_workers: int = None) -> dict:
+    """
+    Esegue le fasi della pipeline rispettando le dipendenze.
+
+    Ogni fase parte appena tutte le sue dipendenze sono completate; le fasi
+    pronte nello stesso momento vengono eseguite in parallelo su un pool di thread.
+
+    Args:
+        fasi: Lista di Fase
+        max_workers: Numero massimo di fasi eseguite contemporaneamente
+
+    Returns:
+        Dizionario {nome_fase: risultato}
+    """
+    fasi = ordina_fasi(fasi)
+    risultati: dict[str, Any] = {}
+    in_attesa = list(fasi)
+    in_esecuzione = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while in_attesa or in_esecuzione:
+            # Avvia tutte le fasi con le dipendenze soddisfatte
+            pronte = [fase for fase in in_attesa if all(d in risultati for d in fase.dipendenze)]
+            for fase in pronte:
+                in_attesa.remove(fase)
+                argomenti = [risultati[d] for d in fase.dipendenze]
+                in_esecuzione[executor.submit(_esegui_fase, fase, argomenti)] = fase
+
+            completate, _ = wait(in_esecuzione, return_when=FIRST_COMPLETED)
+            for future in completate:
+                fase = in_esecuzione.pop(future)
+                try:
+                    risultati[fase.nome] = future.result()
+                except Exception as e:
+                    for altro in in_esecuzione:
+                        altro.cancel()
+                    raise RuntimeError(f"Fase '{fase.nome}' fallita: {e}") from e
+
+    return risultati
+
+
+def crea_pipeline_fuelio(directory: str = '.',
+                         file_output: str = "vehicle-1-sync-extended.csv",
+                         salva_intermedi: bool = False, usa_cache: bool = True,
+                         file_excel: str = None, file_conversione: str = None,
+                         usa_storico: bool = True, duplicati: str = None) -> list:
+    """
+    Dichiara le fasi per creare il file Fuelio esteso.
+
+    Args:
+        directory: Directory con i file di input (Excel, Log.csv e tabelle separate)
+        file_output: Nome del file CSV finale (relativo a directory)
+        salva_intermedi: Se True, scrive anche Log_unificato.csv su disco
+        usa_cache: Se True, riusa i risultati delle fasi con input invariati (vedi cache_fasi)
+        file_excel: File Excel storico (default: Contabilita_consumi_Punto.xlsx in directory)
+        file_conversione: Tabella di conversione (default: Tabella_Conversione_Distro.xlsx in directory)
+        usa_storico: Se False, il Log viene creato solo con i dati Fuelio (nessun file Excel)
+        duplicati: Record da tenere dei rifornimenti presenti sia nello storico sia in
+            Fuelio (vedi deduplicazione.POLITICHE, default: POLITICA_PREDEFINITA)
+
+    Returns:
+        Lista di Fase da passare a esegui_pipeline
+    """
+    # Import locali: pandas viene caricato solo quando la pipeline viene costruita
+    import unisci_log_storico as uls
+    from cache_fasi import con_cache
+    from deduplicazione import POLITICA_PREDEFINITA, rimuovi_duplicati
+    from riunisci_tabelle_fuelio import riunisci_tabelle_fuelio
+    from verifica_file_fuelio import verifica_file_fuelio
+
+    directory = Path(directory)
+    percorso_output = directory / file_output
+    if file_conversione is None:
+        file_conversione = directory / "Tabella_Conversione_Distro.xlsx"
+    if file_excel is None:
+        file_excel = directory / "Contabilita_consumi_Punto.xlsx"
+    duplicati = duplicati or POLITICA_PREDEFINITA
+
+    def carica_conversione():
+        try:
+            return con_cache(uls.carica_tabella_conversione, usa_cache)(file_conversione)
+        except FileNotFoundError:
+            print("  ⚠ Tabella conversione non trovata, i campi distributore non verranno popolati")
+            return None
+
+    def carica_excel():
+        if not usa_storico:
+            return None
+        return con_cache(uls.carica_dati_excel, usa_cache)(file_excel)
+
+    def converti_storico(df_excel, df_conversione):
+        if df_excel is None:
+            return None
+        df_storico = con_cache(uls.converti_dati_excel, usa_cache)(df_excel, df_conversione)
+        if df_conversione is not None:
+            df_storico = con_cache(uls.applica_conversione_distributori, usa_cache)(
+                df_storico, df_conversione, is_storico=True
+            )
+        return df_storico
+
+    def converti_fuelio(df_fuelio, df_conversione):
+        if df_conversione is not None:
+            df_fuelio = con_cache(uls.applica_conversione_distributori, usa_cache)(
+                df_fuelio, df_conversione, is_storico=False
+            )
+        return df_fuelio
+
+    def rimuovi(df_storico, df_fuelio):
+        # Come unisci_log_storico.main: le coppie vengono salvate accanto al Log
+        if df_storico is None:
+            return None, df_fuelio
+        df_storico, df_fuelio, _ = rimuovi_duplicati(df_storico, df_fuelio, duplicati,
+                                                     directory / uls.FILE_DUPLICATI)
+        return df_storico, df_fuelio
+
+    def unisci(senza_duplicati):
+        df_storico, df_fuelio = senza_duplicati
+        if df_storico is None:
+            # Nessun dato storico: unisce con un DataFrame vuoto dello stesso formato
+            df_storico = df_fuelio.iloc[0:0]
+        return con_cache(uls.unisci_e_ordina, usa_cache)(df_storico, df_fuelio)
+
+    def scrivi_log(df_unito, df_fuelio):
+        if salva_intermedi:
+            from unione_incrementale import salva_stato
+            uls.salva_log_unificato(df_unito, directory / "Log_unificato.csv")
+            salva_stato(directory / "Log_unificato.csv",
+                        df_fuelio['UniqueId'].max() if len(df_fuelio) else 0, len(df_unito))
+        return uls.log_unificato_csv(df_unito)
+
+    def verifica(file_fuelio, df_unito):
+        return verifica_file_fuelio(file_fuelio, record_attesi=len(df_unito))
+
+    def riunisci(log_csv):
+        return riunisci_tabelle_fuelio(percorso_output, input_dir=directory,
+                                       contenuti={'Log': log_csv})
+
+    return [
+        Fase('conversione', carica_conversione),
+        Fase('excel', carica_excel),
+        Fase('log_fuelio', lambda: uls.carica_log_fuelio(directory / "Log.csv")),
+        Fase('storico', converti_storico, ('excel', 'conversione')),
+        Fase('fuelio', converti_fuelio, ('log_fuelio', 'conversione')),
+        Fase('duplicati', rimuovi, ('storico', 'fuelio')),
+        Fase('unito', unisci, ('duplicati',)),
+        Fase('log_csv', scrivi_log, ('unito', 'log_fuelio')),
+        Fase('file_fuelio', riunisci, ('log_csv',)),
+        Fase('verifica', verifica, ('file_fuelio', 'unito')),
+    ]
+
+
+if __name__ == "__main__":
+    try:
+        risultati = esegui_pipeline(crea_pipeline_fuelio())
+        print(f"\n✅ Pipeline completata: {risultati['file_fuelio']}")
+    except Exception as e:
+        print(f"\n❌ ERRORE: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,42 @@
+"""
+Esecuzione di una funzione su una sequenza di blocchi con un pool di processi.
+
+Usato da validazione_fuelio e verifica_log_unificato: i blocchi vengono
+prodotti man mano (leggendo il file) e inviati al pool tenendone in corso al
+massimo IN_CORSO_PER_PROCESSO per processo, così la memoria occupata dai
+blocchi in attesa non dipende dalla dimensione del file.
+
+Il modulo usa solo la libreria standard.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# Blocchi inviati al pool e non ancora completati, per processo
+IN_CORSO_PER_PROCESSO = 2
+
+
+def mappa_in_processi(funzione, argomenti, processi: int = 1) -> list:
+    """
+    Applica una funzione a ogni tupla di argomenti, in parallelo se richiesto.
+
+    Args:
+        funzione: Funzione di modulo (deve poter essere inviata ai processi)
+        argomenti: Iterabile di tuple di argomenti, letto man mano
+        processi: Numero di processi (1 = nessun pool, nel processo corrente)
+
+    Returns:
+        Lista dei risultati, nell'ordine degli argomenti
+    """
+    if processi <= 1:
+        return [funzione(*valori) for valori in argomenti]
+
+    risultati, in_corso = [], set()
+    with ProcessPoolExecutor(max_workers=processi) as executor:
+        for valori in argomenti:
+            if len(in_corso) >= IN_CORSO_PER_PROCESSO * processi:
+                _, in_corso = wait(in_corso, return_when=FIRST_COMPLETED)
+            futuro = executor.submit(funzione, *valori)
+            risultati.append(futuro)
+            in_corso.add(futuro)
+        return [futuro.result() for futuro in risultati]
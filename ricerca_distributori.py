@@ -0,0 +1,377 @@
+"""
+Ricerca approssimata dei distributori nella tabella di conversione.
+
+Nei dati storici il distributore è indicato con un nome libero (colonna
+Distro) che viene cercato in modo esatto nella colonna Conversione: un
+errore di battitura o una variante del nome lasciano il record senza
+distributore. Questo modulo cerca i nomi per somiglianza su Conversione,
+NameBrand e Description (e su "NameBrand Description").
+
+I testi vengono normalizzati (maiuscole, senza accenti e punteggiatura) e
+scomposti in trigrammi. L'indice è invertito (trigramma → testi che lo
+contengono), quindi per ogni nome vengono confrontati solo i testi con
+almeno un trigramma in comune, senza confronti a coppie su tutta la tabella.
+La somiglianza è il coefficiente di Dice sui trigrammi (da 0 a 1, 1 se i
+nomi normalizzati coincidono); ogni nome distinto viene cercato una volta sola.
+"""
+
+import argparse
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from cache_fasi import con_cache
+
+
+# Colonne della tabella di conversione indicizzate
+CAMPI_INDICE = ['Conversione', 'NameBrand', 'Description']
+
+# Somiglianza minima predefinita per accettare un distributore
+SOGLIA_PREDEFINITA = 0.8
+
+# Candidati restituiti per ogni nome
+CANDIDATI_PREDEFINITI = 5
+
+# Nomi distinti confrontati per blocco (limita la memoria delle coppie candidate)
+NOMI_PER_BLOCCO = 20_000
+
+_NON_ALFANUMERICI = re.compile(r'[^0-9A-Z]+')
+
+
+def normalizza_nome(nome) -> str:
+    """
+    Normalizza un nome di distributore per il confronto.
+
+    Args:
+        nome: Nome da normalizzare (qualsiasi valore, NaN compreso)
+
+    Returns:
+        Nome in maiuscolo senza accenti né punteggiatura ('' se mancante)
+    """
+    if nome is None or (isinstance(nome, float) and np.isnan(nome)):
+        return ''
+    testo = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALFANUMERICI.sub(' ', testo.upper()).strip()
+
+
+def trigrammi(nome: str) -> set:
+    """
+    Scompone un nome normalizzato nei suoi trigrammi (con uno spazio ai bordi).
+
+    Args:
+        nome: Nome normalizzato
+
+    Returns:
+        Insieme dei trigrammi (vuoto se il nome è vuoto)
+    """
+    if not nome:
+        return set()
+    testo = f' {nome} '
+    return {testo[i:i + 3] for i in range(len(testo) - 2)}
+
+
+def costruisci_indice(df_conversione: pd.DataFrame, campi: list = CAMPI_INDICE) -> dict:
+    """
+    Costruisce l'indice invertito dei trigrammi della tabella di conversione.
+
+    Args:
+        df_conversione: Tabella di conversione distributori
+        campi: Colonne da indicizzare
+
+    Returns:
+        Dizionario con:
+        - 'trigrammi': {trigramma: id}
+        - 'inizi', 'testi_trigramma': liste dei testi per trigramma (formato CSR)
+        - 'chiavi': coppie (testo, trigramma) ordinate, come testo · trigrammi + trigramma
+        - 'lunghezze': numero di trigrammi di ogni testo
+        - 'righe': posizione nella tabella di ogni testo
+        - 'campi', 'testi': colonna e testo originale di ogni testo
+    """
+    campi = [c for c in campi if c in df_conversione.columns]
+    testi = []
+    for campo in campi:
+        testi += [(posizione, campo, valore) for posizione, valore in enumerate(df_conversione[campo])]
+    if 'NameBrand' in campi and 'Description' in campi:
+        testi += [(posizione, 'NameBrand Description', f'{brand} {descrizione}')
+                  for posizione, (brand, descrizione)
+                  in enumerate(zip(df_conversione['NameBrand'], df_conversione['Description']))
+                  if pd.notna(brand) and pd.notna(descrizione)]
+
+    # Un testo per ogni valore non vuoto (i doppioni della stessa riga sono inutili)
+    visti = set()
+    righe, nomi_campi, originali, insiemi = [], [], [], []
+    for posizione, campo, valore in testi:
+        normalizzato = normalizza_nome(valore)
+        if not normalizzato or (posizione, normalizzato) in visti:
+            continue
+        visti.add((posizione, normalizzato))
+        righe.append(posizione)
+        nomi_campi.append(campo)
+        originali.append(str(valore))
+        insiemi.append(trigrammi(normalizzato))
+
+    vocabolario = {}
+    coppie_trigramma, coppie_testo = [], []
+    for testo, insieme in enumerate(insiemi):
+        for trigramma in insieme:
+            coppie_trigramma.append(vocabolario.setdefault(trigramma, len(vocabolario)))
+            coppie_testo.append(testo)
+
+    coppie_trigramma = np.asarray(coppie_trigramma, dtype=np.int64)
+    ordine = np.argsort(coppie_trigramma, kind='stable')
+    inizi = np.zeros(len(vocabolario) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(coppie_trigramma, minlength=len(vocabolario)), out=inizi[1:])
+
+    coppie_testo = np.asarray(coppie_testo, dtype=np.int64)
+    return {
+        'trigrammi': vocabolario,
+        'inizi': inizi,
+        'testi_trigramma': coppie_testo[ordine],
+        'chiavi': np.sort(coppie_testo * len(vocabolario) + coppie_trigramma),
+        'lunghezze': np.array([len(s) for s in insiemi], dtype=np.int64),
+        'righe': np.asarray(righe, dtype=np.int64),
+        'campi': np.asarray(nomi_campi, dtype=object),
+        'testi': np.asarray(originali, dtype=object),
+    }
+
+
+def indice_distributori(df_conversione: pd.DataFrame, usa_cache: bool = True) -> dict:
+    """
+    Restituisce l'indice della tabella di conversione, riusando quello in cache se la tabella non è cambiata.
+
+    Args:
+        df_conversione: Tabella di conversione distributori
+        usa_cache: Se False, l'indice viene sempre ricostruito
+
+    Returns:
+        Indice dei trigrammi (vedi costruisci_indice)
+    """
+    return con_cache(costruisci_indice, usa_cache)(df_conversione)
+
+
+def _intervalli(inizi: np.ndarray, quanti: np.ndarray) -> np.ndarray:
+    """
+    Concatena gli intervalli di posizioni [inizio, inizio + quanti) senza cicli.
+
+    Args:
+        inizi: Inizio di ogni intervallo
+        quanti: Lunghezza di ogni intervallo
+
+    Returns:
+        Array delle posizioni di tutti gli intervalli, uno dopo l'altro
+    """
+    scostamenti = np.arange(quanti.sum()) - np.repeat(np.cumsum(quanti) - quanti, quanti)
+    return np.repeat(inizi, quanti) + scostamenti
+
+
+def _minimo_in_comune(lunghezze: np.ndarray, soglia: float) -> np.ndarray:
+    """
+    Numero minimo di trigrammi in comune perché un testo possa raggiungere la soglia.
+
+    Con il coefficiente di Dice 2c / (|nome| + |testo|) ≥ soglia e c ≤ |testo|,
+    serve c ≥ soglia · |nome| / (2 - soglia).
+
+    Args:
+        lunghezze: Numero di trigrammi di ogni nome
+        soglia: Somiglianza minima
+
+    Returns:
+        Minimo di trigrammi in comune per ogni nome (almeno 1)
+    """
+    return np.maximum(np.ceil(soglia * lunghezze / (2 - soglia) - 1e-9), 1).astype(np.int64)
+
+
+def _candidati_blocco(trigrammi_nome: list, lunghezze: np.ndarray, soglia: float, indice: dict):
+    """
+    Calcola la somiglianza tra un blocco di nomi e i testi dell'indice con cui possono raggiungere la soglia.
+
+    Solo i trigrammi più rari di ogni nome (il "prefisso", che deve contenere
+    almeno un trigramma in comune con ogni testo abbastanza simile) vengono
+    usati per trovare i candidati, così i trigrammi molto comuni non fanno
+    esplodere il numero di coppie; i trigrammi in comune vengono poi contati
+    esattamente sui soli candidati.
+
+    Args:
+        trigrammi_nome: Per ogni nome, array dei trigrammi noti dal più raro al più comune
+        lunghezze: Numero totale di trigrammi di ogni nome (anche quelli non indicizzati)
+        soglia: Somiglianza minima
+        indice: Indice dei trigrammi
+
+    Returns:
+        Tupla (nome, testo, punteggio) di array, una posizione per coppia candidata
+    """
+    noti = np.array([len(t) for t in trigrammi_nome], dtype=np.int64)
+    tutti = np.concatenate(trigrammi_nome) if len(trigrammi_nome) else np.empty(0, dtype=np.int64)
+    inizio_nome = np.cumsum(noti) - noti
+
+    # I trigrammi non indicizzati sono i più rari di tutti e occupano l'inizio del prefisso
+    prefisso = np.clip(lunghezze - _minimo_in_comune(lunghezze, soglia) + 1 - (lunghezze - noti), 0, noti)
+    trigrammi_prefisso = tutti[_intervalli(inizio_nome, prefisso)]
+    nome_prefisso = np.repeat(np.arange(len(noti)), prefisso)
+
+    # Candidati: testi che contengono almeno un trigramma del prefisso
+    inizi = indice['inizi'][trigrammi_prefisso]
+    quanti = indice['inizi'][trigrammi_prefisso + 1] - inizi
+    testi = indice['testi_trigramma'][_intervalli(inizi, quanti)]
+    numero_testi = len(indice['righe'])
+    coppie = np.unique(np.repeat(nome_prefisso, quanti) * numero_testi + testi)
+    nome, testo = np.divmod(coppie, numero_testi)
+
+    # Filtro sulla lunghezza: testi troppo corti o troppo lunghi non raggiungono la soglia
+    if soglia > 0:
+        lunghezza_testo = indice['lunghezze'][testo]
+        compatibili = ((lunghezza_testo * (2 - soglia) >= soglia * lunghezze[nome] - 1e-9)
+                       & (soglia * lunghezza_testo <= (2 - soglia) * lunghezze[nome] + 1e-9))
+        nome, testo = nome[compatibili], testo[compatibili]
+
+    # Trigrammi in comune: ogni trigramma del nome viene cercato tra quelli del testo
+    posizioni = _intervalli(inizio_nome[nome], noti[nome])
+    cercate = np.repeat(testo, noti[nome]) * len(indice['trigrammi']) + tutti[posizioni]
+    chiavi = indice['chiavi']
+    trovate = np.minimum(np.searchsorted(chiavi, cercate), len(chiavi) - 1)
+    in_comune = np.bincount(np.repeat(np.arange(len(nome)), noti[nome]),
+                            weights=chiavi[trovate] == cercate, minlength=len(nome))
+
+    punteggio = 2 * in_comune / (lunghezze[nome] + indice['lunghezze'][testo])
+    return nome, testo, punteggio
+
+
+def cerca_distributori(nomi, indice: dict, limite: int = CANDIDATI_PREDEFINITI,
+                       soglia: float = 0.0) -> pd.DataFrame:
+    """
+    Cerca i distributori più simili a ogni nome distinto.
+
+    Args:
+        nomi: Nomi da cercare (es. la colonna Distro dei dati storici)
+        indice: Indice dei trigrammi (vedi costruisci_indice)
+        limite: Numero massimo di candidati per nome
+        soglia: Somiglianza minima dei candidati
+
+    Returns:
+        DataFrame con una riga per candidato, ordinato per nome e per
+        somiglianza decrescente: nome (normalizzato), rango (da 1), riga
+        (posizione nella tabella di conversione), campo e testo che hanno dato
+        la somiglianza più alta, punteggio (da 0 a 1)
+    """
+    colonne = ['nome', 'rango', 'riga', 'campo', 'testo', 'punteggio']
+    normalizzati = pd.Series(list(nomi), dtype=object).map(normalizza_nome)
+    distinti = pd.unique(normalizzati[normalizzati != ''])
+    if len(distinti) == 0 or len(indice['righe']) == 0:
+        return pd.DataFrame(columns=colonne)
+
+    # Trigrammi noti di ogni nome, dal più raro al più comune nella tabella
+    vocabolario = indice['trigrammi']
+    frequenze = np.diff(indice['inizi']).tolist()
+    lunghezze = np.empty(len(distinti), dtype=np.int64)
+    trigrammi_nome = []
+    for numero, nome in enumerate(distinti):
+        insieme = trigrammi(nome)
+        lunghezze[numero] = len(insieme)
+        noti = sorted((vocabolario[t] for t in insieme if t in vocabolario), key=lambda t: (frequenze[t], t))
+        trigrammi_nome.append(np.asarray(noti, dtype=np.int64))
+
+    parti = []
+    for inizio in range(0, len(distinti), NOMI_PER_BLOCCO):
+        nome, testo, punteggio = _candidati_blocco(trigrammi_nome[inizio:inizio + NOMI_PER_BLOCCO],
+                                                   lunghezze[inizio:inizio + NOMI_PER_BLOCCO],
+                                                   soglia, indice)
+        parti.append(pd.DataFrame({'nome': nome + inizio, 'testo_indice': testo, 'punteggio': punteggio}))
+    risultato = pd.concat(parti, ignore_index=True)
+
+    # Miglior testo per ogni distributore, poi candidati in ordine di punteggio
+    risultato['riga'] = indice['righe'][risultato['testo_indice'].to_numpy()]
+    risultato = risultato[risultato['punteggio'] >= soglia]
+    risultato = risultato.sort_values(['nome', 'punteggio', 'riga'], ascending=[True, False, True],
+                                      kind='stable')
+    risultato = risultato.drop_duplicates(['nome', 'riga'])
+    risultato['rango'] = risultato.groupby('nome').cumcount() + 1
+    risultato = risultato[risultato['rango'] <= limite]
+
+    return pd.DataFrame({
+        'nome': distinti[risultato['nome'].to_numpy()],
+        'rango': risultato['rango'].to_numpy(),
+        'riga': risultato['riga'].to_numpy(),
+        'campo': indice['campi'][risultato['testo_indice'].to_numpy()],
+        'testo': indice['testi'][risultato['testo_indice'].to_numpy()],
+        'punteggio': risultato['punteggio'].round(3).to_numpy(),
+    }, columns=colonne)
+
+
+def migliori_distributori(nomi, indice: dict, soglia: float = SOGLIA_PREDEFINITA):
+    """
+    Associa a ogni nome il distributore più simile, se supera la soglia.
+
+    A parità di punteggio vince la riga che compare prima nella tabella.
+
+    Args:
+        nomi: Nomi da cercare
+        indice: Indice dei trigrammi (vedi costruisci_indice)
+        soglia: Somiglianza minima per accettare un distributore
+
+    Returns:
+        Tupla (righe, punteggi) di array allineati ai nomi: posizione nella
+        tabella di conversione (-1 se nessun distributore supera la soglia) e
+        somiglianza (NaN se non trovato)
+    """
+    normalizzati = pd.Series(list(nomi), dtype=object).map(normalizza_nome)
+    candidati = cerca_distributori(normalizzati, indice, limite=1, soglia=soglia)
+
+    posizioni = pd.Index(candidati['nome']).get_indexer(normalizzati)
+    trovati = posizioni >= 0
+    righe = np.full(len(normalizzati), -1, dtype=np.int64)
+    punteggi = np.full(len(normalizzati), np.nan)
+    righe[trovati] = candidati['riga'].to_numpy()[posizioni[trovati]]
+    punteggi[trovati] = candidati['punteggio'].to_numpy()[posizioni[trovati]]
+    return righe, punteggi
+
+
+def main(argv: list = None):
+    """
+    Mostra i candidati della tabella di conversione per i Distro storici senza corrispondenza esatta.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    # Import locale: unisci_log_storico usa questo modulo
+    from unisci_log_storico import carica_dati_excel, carica_tabella_conversione
+
+    parser = argparse.ArgumentParser(description="Cerca i distributori storici nella tabella di conversione")
+    parser.add_argument('--soglia', type=float, default=0.5,
+                        help="somiglianza minima dei candidati mostrati (default: 0.5)")
+    parser.add_argument('--candidati', type=int, default=3,
+                        help="candidati mostrati per ogni nome (default: 3)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("RICERCA DISTRIBUTORI NELLA TABELLA DI CONVERSIONE")
+    print("=" * 60)
+
+    df_excel = carica_dati_excel()
+    df_conversione = carica_tabella_conversione()
+
+    conversioni = set(df_conversione['Conversione'].dropna())
+    distro = df_excel['Distro'].dropna()
+    senza_match = distro[~distro.isin(conversioni)].value_counts()
+    print(f"\nDistro senza corrispondenza esatta: {len(senza_match)} ({senza_match.sum()} record)")
+
+    candidati = cerca_distributori(senza_match.index, indice_distributori(df_conversione),
+                                   limite=args.candidati, soglia=args.soglia)
+    per_nome = dict(tuple(candidati.groupby('nome', sort=False)))
+
+    for nome, record in senza_match.items():
+        trovati = per_nome.get(normalizza_nome(nome))
+        if trovati is None:
+            continue
+        print(f"\n  {nome} ({record} record)")
+        for candidato in trovati.itertuples():
+            stazione = df_conversione.iloc[candidato.riga]
+            print(f"    {candidato.rango}. {candidato.punteggio:.2f}  {candidato.testo} "
+                  f"[{candidato.campo}] → StationID {stazione.get('StationID')}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
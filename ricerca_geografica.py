@@ -0,0 +1,303 @@
+"""
+Associazione dei rifornimenti al distributore più vicino in base alle coordinate.
+
+I rifornimenti di Fuelio hanno latitudine e longitudine, ma a volte non hanno
+lo StationID (vuoto o 0). I distributori noti (FavStations.csv e la tabella
+di conversione) hanno StationID e coordinate: ogni rifornimento senza
+StationID viene associato al distributore più vicino entro un raggio.
+
+I distributori sono indicizzati con una griglia di celle larghe almeno quanto
+il raggio, ordinate per chiave di cella: per ogni rifornimento bastano le 9
+celle intorno alla sua, trovate con una ricerca binaria (O(log n)), invece
+di calcolare la distanza da tutti i distributori. Tutto il Log viene
+elaborato insieme, senza cicli sulle righe.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from schemi_fuelio import leggi_tabella_fuelio
+
+
+# Raggio predefinito entro cui cercare il distributore (km)
+RAGGIO_PREDEFINITO_KM = 0.5
+
+# Raggio medio della Terra (km)
+RAGGIO_TERRA_KM = 6371.0088
+
+# Latitudine massima usata per dimensionare le celle (vicino ai poli le celle diventerebbero infinite)
+LATITUDINE_MASSIMA = 89.0
+
+COLONNE_STAZIONI = ['StationID', 'Latitude', 'Longitude', 'NameBrand', 'Description']
+
+
+def coordinate_valide(latitudine, longitudine) -> np.ndarray:
+    """
+    Indica le coordinate utilizzabili: presenti, nell'intervallo e non (0, 0).
+
+    Fuelio scrive 0,0 quando la posizione non è disponibile.
+
+    Args:
+        latitudine: Latitudini in gradi
+        longitudine: Longitudini in gradi
+
+    Returns:
+        Maschera booleana
+    """
+    lat = pd.to_numeric(pd.Series(latitudine), errors='coerce').to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(pd.Series(longitudine), errors='coerce').to_numpy(dtype=np.float64)
+    return ((np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+            & ~((lat == 0) & (lon == 0)))
+
+
+def carica_stazioni(file_stazioni: str = "FavStations.csv", df_conversione: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Raccoglie i distributori noti con StationID e coordinate.
+
+    Se uno StationID compare in entrambe le sorgenti vale la tabella di conversione.
+
+    Args:
+        file_stazioni: Percorso di FavStations.csv (ignorato se non esiste)
+        df_conversione: Tabella di conversione distributori (opzionale)
+
+    Returns:
+        DataFrame con StationID, Latitude, Longitude, NameBrand, Description
+    """
+    sorgenti = []
+    if df_conversione is not None:
+        sorgenti.append(df_conversione)
+    try:
+        sorgenti.append(leggi_tabella_fuelio(file_stazioni, 'FavStations', uso='stazioni'))
+    except FileNotFoundError:
+        pass
+
+    sorgenti = [s.reindex(columns=COLONNE_STAZIONI) for s in sorgenti]
+    if not sorgenti:
+        return pd.DataFrame(columns=COLONNE_STAZIONI)
+
+    stazioni = pd.concat(sorgenti, ignore_index=True)
+    stazioni = stazioni[stazioni['StationID'].notna() & (stazioni['StationID'] != 0)
+                        & coordinate_valide(stazioni['Latitude'], stazioni['Longitude'])]
+    return stazioni.drop_duplicates('StationID', keep='first').reset_index(drop=True)
+
+
+def _celle(lat: np.ndarray, lon: np.ndarray, passo_lat: float, passo_lon: float, colonne: int):
+    """
+    Calcola riga e colonna della cella di ogni punto (la longitudine gira intorno a ±180°).
+
+    Args:
+        lat: Latitudini in gradi
+        lon: Longitudini in gradi
+        passo_lat: Altezza della cella in gradi
+        passo_lon: Larghezza della cella in gradi
+        colonne: Numero di colonne della griglia
+
+    Returns:
+        Tupla (righe, colonne) di array interi
+    """
+    riga = np.floor((lat + 90) / passo_lat).astype(np.int64)
+    colonna = np.floor((lon + 180) / passo_lon).astype(np.int64) % colonne
+    return riga, colonna
+
+
+def costruisci_indice_geografico(stazioni: pd.DataFrame, raggio_km: float = RAGGIO_PREDEFINITO_KM) -> dict:
+    """
+    Costruisce l'indice a griglia delle coordinate dei distributori.
+
+    Args:
+        stazioni: Distributori (vedi carica_stazioni)
+        raggio_km: Raggio di ricerca: le celle sono larghe almeno quanto il raggio
+
+    Returns:
+        Dizionario con le chiavi di cella ordinate, le coordinate dei
+        distributori nello stesso ordine, la loro posizione in stazioni e il
+        passo della griglia
+    """
+    lat = stazioni['Latitude'].to_numpy(dtype=np.float64)
+    lon = stazioni['Longitude'].to_numpy(dtype=np.float64)
+
+    # Un grado di latitudine è sempre ~111 km; uno di longitudine si accorcia verso i poli
+    km_per_grado = np.radians(RAGGIO_TERRA_KM)
+    passo_lat = raggio_km / km_per_grado
+    latitudine_limite = min(np.abs(lat).max(initial=0) + passo_lat, LATITUDINE_MASSIMA)
+    passo_lon = min(raggio_km / (km_per_grado * np.cos(np.radians(latitudine_limite))), 360.0)
+    colonne = int(np.ceil(360.0 / passo_lon))
+    passo_lon = 360.0 / colonne
+
+    riga, colonna = _celle(lat, lon, passo_lat, passo_lon, colonne)
+    chiavi = riga * colonne + colonna
+    ordine = np.argsort(chiavi, kind='stable')
+
+    return {
+        'chiavi': chiavi[ordine],
+        'posizioni': ordine,
+        'lat': lat[ordine],
+        'lon': lon[ordine],
+        'passo_lat': passo_lat,
+        'passo_lon': passo_lon,
+        'colonne': colonne,
+        'latitudine_limite': latitudine_limite,
+        'raggio_km': raggio_km,
+    }
+
+
+def distanza_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distanza sulla superficie terrestre (formula dell'emisenoverso).
+
+    Args:
+        lat1, lon1: Coordinate del primo punto in gradi
+        lat2, lon2: Coordinate del secondo punto in gradi
+
+    Returns:
+        Distanza in km
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RAGGIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def stazioni_piu_vicine(latitudine, longitudine, indice: dict):
+    """
+    Trova per ogni punto il distributore più vicino entro il raggio dell'indice.
+
+    Args:
+        latitudine: Latitudini in gradi
+        longitudine: Longitudini in gradi
+        indice: Indice a griglia (vedi costruisci_indice_geografico)
+
+    Returns:
+        Tupla (posizioni, distanze) di array allineati ai punti: posizione
+        del distributore in stazioni (-1 se nessuno è nel raggio) e distanza in km
+    """
+    lat = np.asarray(latitudine, dtype=np.float64)
+    lon = np.asarray(longitudine, dtype=np.float64)
+    posizioni = np.full(len(lat), -1, dtype=np.int64)
+    distanze = np.full(len(lat), np.nan)
+
+    # Oltre la latitudine usata per le celle la griglia non garantisce il raggio
+    punti = np.flatnonzero(coordinate_valide(lat, lon) & (np.abs(lat) <= indice['latitudine_limite']))
+    if len(punti) == 0 or len(indice['chiavi']) == 0:
+        return posizioni, distanze
+
+    # Le 9 celle intorno a ogni punto
+    colonne = indice['colonne']
+    riga, colonna = _celle(lat[punti], lon[punti], indice['passo_lat'], indice['passo_lon'], colonne)
+    spostamenti = np.array([-1, 0, 1])
+    righe_vicine = (riga[:, None, None] + spostamenti[None, :, None]).repeat(3, axis=2)
+    colonne_vicine = ((colonna[:, None, None] + spostamenti[None, None, :]) % colonne).repeat(3, axis=1)
+    cercate = (righe_vicine * colonne + colonne_vicine).reshape(len(punti), 9)
+
+    # Ricerca binaria delle celle e distanza dai soli distributori trovati
+    inizi = np.searchsorted(indice['chiavi'], cercate.ravel(), side='left')
+    fini = np.searchsorted(indice['chiavi'], cercate.ravel(), side='right')
+    quanti = fini - inizi
+    punto = np.repeat(np.repeat(np.arange(len(punti)), 9), quanti)
+    candidato = (np.repeat(inizi, quanti)
+                 + np.arange(quanti.sum()) - np.repeat(np.cumsum(quanti) - quanti, quanti))
+    if len(candidato) == 0:
+        return posizioni, distanze
+
+    distanza = distanza_km(lat[punti][punto], lon[punti][punto],
+                           indice['lat'][candidato], indice['lon'][candidato])
+    nel_raggio = distanza <= indice['raggio_km']
+    punto, candidato, distanza = punto[nel_raggio], candidato[nel_raggio], distanza[nel_raggio]
+
+    # Il più vicino per ogni punto (a parità di distanza, il primo distributore)
+    ordine = np.lexsort((indice['posizioni'][candidato], distanza, punto))
+    primi = ordine[np.r_[True, punto[ordine][1:] != punto[ordine][:-1]]]
+    posizioni[punti[punto[primi]]] = indice['posizioni'][candidato[primi]]
+    distanze[punti[punto[primi]]] = distanza[primi]
+    return posizioni, distanze
+
+
+def assegna_stazioni(df: pd.DataFrame, stazioni: pd.DataFrame,
+                     raggio_km: float = RAGGIO_PREDEFINITO_KM) -> pd.DataFrame:
+    """
+    Assegna lo StationID del distributore più vicino ai rifornimenti che non lo hanno.
+
+    Gli altri campi del distributore (City, coordinate) vengono poi popolati
+    da applica_conversione_distributori, come per ogni altro StationID.
+
+    Args:
+        df: DataFrame nel formato Log
+        stazioni: Distributori (vedi carica_stazioni)
+        raggio_km: Distanza massima dal distributore
+
+    Returns:
+        DataFrame con StationID (optional) assegnato dove possibile
+    """
+    print(f"\nAssociazione geografica dei distributori (raggio {raggio_km} km)...")
+
+    station_id = df['StationID (optional)']
+    senza_stazione = pd.to_numeric(station_id).fillna(0).eq(0).to_numpy(dtype=bool)
+    righe = np.flatnonzero(senza_stazione & coordinate_valide(df['latitude (optional)'],
+                                                            df['longitude (optional)']))
+    if len(righe) == 0 or len(stazioni) == 0:
+        print(f"  → Nessun rifornimento da associare")
+        return df
+
+    indice = costruisci_indice_geografico(stazioni, raggio_km)
+    posizioni, distanze = stazioni_piu_vicine(df['latitude (optional)'].to_numpy(dtype=np.float64)[righe],
+                                              df['longitude (optional)'].to_numpy(dtype=np.float64)[righe],
+                                              indice)
+    trovate = posizioni >= 0
+    if trovate.any():
+        df = df.copy()
+        df.iloc[righe[trovate], df.columns.get_loc('StationID (optional)')] = (
+            stazioni['StationID'].to_numpy(dtype='float64')[posizioni[trovate]]
+        )
+
+    print(f"  → Rifornimenti senza StationID con coordinate: {len(righe)}")
+    print(f"  → Associati: {trovate.sum()} (distanza media {np.nanmean(distanze) * 1000:.0f} m)"
+          if trovate.any() else "  → Associati: 0")
+    return df
+
+
+def main(argv: list = None):
+    """
+    Mostra il distributore più vicino ai rifornimenti di un Log senza StationID.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Associa i rifornimenti al distributore più vicino")
+    parser.add_argument('file_log', nargs='?', default='Log.csv',
+                        help="Log di Fuelio o Log unificato (default: Log.csv)")
+    parser.add_argument('--stazioni', default='FavStations.csv',
+                        help="file dei distributori preferiti (default: FavStations.csv)")
+    parser.add_argument('--raggio', type=float, default=RAGGIO_PREDEFINITO_KM,
+                        help=f"distanza massima in km (default: {RAGGIO_PREDEFINITO_KM})")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("ASSOCIAZIONE GEOGRAFICA DEI DISTRIBUTORI")
+    print("=" * 60)
+
+    # Import locale: unisci_log_storico usa questo modulo
+    from unisci_log_storico import carica_tabella_conversione
+    try:
+        df_conversione = carica_tabella_conversione()
+    except FileNotFoundError:
+        df_conversione = None
+
+    stazioni = carica_stazioni(args.stazioni, df_conversione)
+    print(f"\nDistributori con coordinate: {len(stazioni)}")
+
+    df = leggi_tabella_fuelio(args.file_log, 'Log')
+    associato = assegna_stazioni(df, stazioni, args.raggio)
+
+    nuovi = associato['StationID (optional)'].ne(df['StationID (optional)']) & associato['StationID (optional)'].notna()
+    per_stazione = stazioni.set_index('StationID')
+    for riga, station_id in associato.loc[nuovi, 'StationID (optional)'].items():
+        stazione = per_stazione.loc[station_id]
+        print(f"  {df.at[riga, 'Data']} → {int(station_id)} {stazione['NameBrand']} - {stazione['Description']}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,104 @@
 Script per riunire le tabelle CSV separate in un unico file CSV per Fuelio.
 
 Prende le tabelle separate e le riassembla nel formato originale di Fuelio,
-usando il Log esteso con i dati storici.
+usando il Log esteso con i dati storici. Se Log_unificato.csv è stato unito
+con --testo-originale, anche il file riassemblato viene segnato (vedi
+validazione_fuelio.segna_testo_originale).
 """
 
+import os
 from pathlib import Path
 
+from strumentazione import strumenta
+from validazione_fuelio import ha_testo_originale, segna_testo_originale
 
+
+# Dimensione dei blocchi copiati dalle tabelle al file di output (byte)
+DIMENSIONE_BLOCCO = 1024 * 1024
+
+
+def _copia_tabella(sorgente, f_out, buffer: bytearray) -> tuple:
+    """
+    Copia una tabella nel file di output a blocchi, contando i fine riga.
+
+    Args:
+        sorgente: Percorso del file CSV oppure testo CSV già in memoria
+        f_out: File di output aperto in modalità binaria
+        buffer: Buffer riutilizzato per i blocchi letti
+
+    Returns:
+        Tupla (numero di righe, True se l'ultimo byte è un fine riga)
+    """
+    if isinstance(sorgente, str):
+        dati = sorgente.encode('utf-8')
+        f_out.write(dati)
+        return dati.count(b'\n'), not dati or dati.endswith(b'\n')
+
+    righe = 0
+    ultimo = ord('\n')
+    vista = memoryview(buffer)
+    with open(sorgente, 'rb') as f_in:
+        while letti := f_in.readinto(buffer):
+            f_out.write(vista[:letti])
+            righe += buffer.count(b'\n', 0, letti)
+            ultimo = buffer[letti - 1]
+    return righe, ultimo == ord('\n')
+
+
+def assembla_tabelle(output_path: Path, sorgenti: list) -> dict:
+    """
+    Scrive le tabelle nel formato di Fuelio ("## Nome" seguito dal CSV) in un'unica passata.
+
+    Ogni tabella viene copiata così com'è, a blocchi, contando i fine riga
+    durante la copia. Il file viene scritto in un temporaneo nella stessa
+    directory e rinominato solo alla fine, così un'interruzione non lascia
+    un file Fuelio troncato.
+
+    Args:
+        output_path: File di output
+        sorgenti: Lista di (nome tabella, percorso del CSV o testo CSV), nell'ordine di scrittura
+
+    Returns:
+        Dizionario {nome tabella: numero di record} (intestazione esclusa)
+    """
+    output_path = Path(output_path)
+    temporaneo = output_path.with_name(f'.{output_path.name}.{os.getpid()}.tmp')
+    buffer = bytearray(DIMENSIONE_BLOCCO)
+    conteggi = {}
+
+    try:
+        with open(temporaneo, 'wb') as f_out:
+            for nome_tabella, sorgente in sorgenti:
+                # Marker della tabella (con spazio dopo ##)
+                f_out.write(f'"## {nome_tabella}"\n'.encode('utf-8'))
+                righe, termina_a_capo = _copia_tabella(sorgente, f_out, buffer)
+                if not termina_a_capo:
+                    # Ultima riga senza fine riga: il marker successivo non deve attaccarsi
+                    f_out.write(b'\n')
+                    righe += 1
+                conteggi[nome_tabella] = max(righe - 1, 0)
+        os.replace(temporaneo, output_path)
+    except BaseException:
+        temporaneo.unlink(missing_ok=True)
+        raise
+
+    return conteggi
+
+
+@strumenta(file_scritti=('output_file',))
 def riunisci_tabelle_fuelio(output_file: str = "vehicle-1-sync-extended.csv", 
-                            input_dir: str = None):
+                            input_dir: str = None, contenuti: dict = None):
     """
     Riunisce le tabelle CSV separate in un unico file CSV per Fuelio.
     
     Args:
         output_file: Nome del file CSV di output
         input_dir: Directory dove si trovano i file CSV separati (default: directory corrente)
+        contenuti: Tabelle già in memoria, come {nome_tabella: testo CSV}, usate al posto
+                   dei file corrispondenti (es. {'Log': ...} invece di Log_unificato.csv)
+    
+    Returns:
+        Percorso del file creato
     """
     # Se non specificata, usa la directory corrente
     if input_dir is None:
@@ -23,6 +107,9 @@ def riunisci_tabelle_fuelio(output_file: str = "vehicle-1-sync-extended.csv",
     else:
         input_dir = Path(input_dir)
     
+    if contenuti is None:
+        contenuti = {}
+    
     # Ordine delle tabelle (come nel file originale di Fuelio)
     tabelle = [
         'Vehicle',
@@ -38,63 +125,43 @@ def riunisci_tabelle_fuelio(output_file: str = "vehicle-1-sync-extended.csv",
     print("RIUNIONE TABELLE FUELIO")
     print("=" * 60)
     
-    # Apri il file di output
-    output_path = Path(output_file)
-    righe_totali = 0
-    
-    with open(output_path, 'w', encoding='utf-8', newline='') as f_out:
-        for nome_tabella in tabelle:
-            # Per la tabella Log, usa Log_unificato.csv
-            if nome_tabella == 'Log':
-                nome_file = input_dir / 'Log_unificato.csv'
-            else:
-                nome_file = input_dir / f'{nome_tabella}.csv'
-            
-            # Verifica che il file esista
-            if not nome_file.exists():
-                print(f"\n⚠ ATTENZIONE: File {nome_file.name} non trovato, salto questa tabella")
-                continue
-            
+    sorgenti = []
+    for nome_tabella in tabelle:
+        # Per la tabella Log, usa Log_unificato.csv
+        if nome_tabella == 'Log':
+            nome_file = input_dir / 'Log_unificato.csv'
+        else:
+            nome_file = input_dir / f'{nome_tabella}.csv'
+        
+        if nome_tabella in contenuti:
+            print(f"\nProcesso tabella: {nome_tabella}")
+            print(f"  Sorgente: dati in memoria")
+            sorgenti.append((nome_tabella, contenuti[nome_tabella]))
+        elif nome_file.exists():
             print(f"\nProcesso tabella: {nome_tabella}")
             print(f"  File sorgente: {nome_file.name}")
-            
-            # Legge il file CSV
-            with open(nome_file, 'r', encoding='utf-8') as f_in:
-                righe = f_in.readlines()
-            
-            # Scrive il marker della tabella (con spazio dopo ##)
-            f_out.write(f'"## {nome_tabella}"\n')
-            
-            # Scrive tutte le righe (intestazione + dati)
-            righe_dati = 0
-            for riga in righe:
-                f_out.write(riga)
-                # Conta le righe di dati (esclusa l'intestazione)
-                if riga.strip() and not riga.startswith('"Data"') and not riga.startswith('"NameBrand"'):
-                    righe_dati += 1
-            
-            righe_totali += righe_dati
-            print(f"  → Righe scritte: {righe_dati}")
+            sorgenti.append((nome_tabella, nome_file))
+        else:
+            print(f"\n⚠ ATTENZIONE: File {nome_file.name} non trovato, salto questa tabella")
+    
+    output_path = Path(output_file)
+    conteggi = assembla_tabelle(output_path, sorgenti)
+    # Il Log in memoria (pipeline) è scritto sempre con il formato dell'unione normale
+    testo_originale = 'Log' not in contenuti and ha_testo_originale(input_dir / 'Log_unificato.csv')
+    segna_testo_originale(output_path, testo_originale)
+    righe_totali = sum(conteggi.values())
     
     print("\n" + "=" * 60)
     print("COMPLETATO!")
     print("=" * 60)
     print(f"\n✅ File creato: {output_path.absolute()}")
-    print(f"   Tabelle incluse: {len(tabelle)}")
+    print(f"   Tabelle incluse: {len(conteggi)}")
     print(f"   Righe totali di dati: {righe_totali}")
     
-    # Statistiche dettagliate
+    # Statistiche dettagliate (contate durante la copia)
     print(f"\n📊 DETTAGLIO TABELLE:")
-    for nome_tabella in tabelle:
-        if nome_tabella == 'Log':
-            nome_file = input_dir / 'Log_unificato.csv'
-        else:
-            nome_file = input_dir / f'{nome_tabella}.csv'
-        
-        if nome_file.exists():
-            with open(nome_file, 'r', encoding='utf-8') as f:
-                righe = len(f.readlines()) - 1  # -1 per escludere l'intestazione
-            print(f"   - {nome_tabella}: {righe} record")
+    for nome_tabella, righe in conteggi.items():
+        print(f"   - {nome_tabella}: {righe} record")
     
     return output_path
 
@@ -0,0 +1,201 @@
+"""
+Schemi delle tabelle di Fuelio e dei file Excel storici.
+
+Per ogni tabella (Log, Vehicle, Costs, CostCategories, FavStations, Pictures,
+Category) registra i tipi delle colonne, in modo che pd.read_csv non debba
+inferirli (le date restano testo; DATE ne registra il formato):
+- interi compatti (int8/int16/int32) per flag, serbatoi e identificativi
+- float64 per Odo e StationID del Log: possono essere vuoti e gli script li
+  scrivono come '313901.0', che pandas converte in Int32 due volte più lentamente
+- category per le colonne di testo con pochi valori ripetuti (City, CountryCode);
+  FuelType resta numerico (int16) perché viene confrontato con i codici di Fuelio
+- float32 solo per le colonne che non vengono sommate (VolumePrice, consumi):
+  kg, prezzi e coordinate restano float64 per non perdere precisione nei totali
+
+USI elenca le colonne che ogni script usa davvero (usecols).
+
+Gli script che riscrivono il Log (unione, ordinamento esterno, unione
+incrementale) leggono con l'uso 'unione': i loro output devono restare
+identici byte per byte, quindi le colonne scritte con una rappresentazione
+che dipende dal tipo (float32, category, string) restano inferite da pandas
+(TIPI_INFERITI); interi e float64 usano il tipo dello schema.
+
+pandas viene importato solo da leggi_tabella_fuelio: validazione_fuelio usa
+gli schemi senza caricarlo.
+"""
+
+
+# Formati delle date nei file di Fuelio
+FORMATO_DATA_ORA = '%Y-%m-%d %H:%M'
+FORMATO_DATA = '%Y-%m-%d'
+
+SCHEMI = {
+    'Log': {
+        'Data': 'string',
+        'Odo (km)': 'float64',
+        'kg': 'float64',
+        'Full': 'int8',
+        'Price (optional)': 'float64',
+        'km/l (optional)': 'float32',
+        'latitude (optional)': 'float64',
+        'longitude (optional)': 'float64',
+        'City (optional)': 'category',
+        'Notes (optional)': 'string',
+        'Missed': 'int8',
+        'TankNumber': 'int8',
+        'FuelType': 'int16',
+        'VolumePrice': 'float32',
+        'StationID (optional)': 'float64',
+        'ExcludeDistance': 'float32',
+        'UniqueId': 'int32',
+        'TankCalc': 'float32',
+        'Weather': 'string',
+    },
+    'Vehicle': {
+        'Name': 'string',
+        'Description': 'string',
+        'DistUnit': 'int8',
+        'FuelUnit': 'int8',
+        'ConsumptionUnit': 'int8',
+        'ImportCSVDateFormat': 'string',
+        'VIN': 'string',
+        'Insurance': 'string',
+        'Plate': 'string',
+        'Make': 'string',
+        'Model': 'string',
+        'Year': 'Int16',
+        'TankCount': 'int8',
+        'Tank1Type': 'int16',
+        'Tank2Type': 'int16',
+        'Active': 'int8',
+        'Tank1Capacity': 'float32',
+        'Tank2Capacity': 'float32',
+        'FuelUnitTank2': 'int8',
+        'FuelConsumptionTank2': 'int8',
+    },
+    'Costs': {
+        'CostTitle': 'string',
+        'Date': 'string',
+        'Odo': 'int32',
+        'CostTypeID': 'int16',
+        'Notes': 'string',
+        'Cost': 'float64',
+        'flag': 'int8',
+        'idR': 'int32',
+        'read': 'int8',
+        'RemindOdo': 'int32',
+        'RemindDate': 'string',
+        'isTemplate': 'int8',
+        'RepeatOdo': 'int32',
+        'RepeatMonths': 'int16',
+        'isIncome': 'int8',
+        'UniqueId': 'int32',
+    },
+    'CostCategories': {
+        'CostTypeID': 'int16',
+        'Name': 'string',
+        'priority': 'int16',
+        'color': 'string',
+    },
+    'FavStations': {
+        'NameBrand': 'string',
+        'Latitude': 'float64',
+        'Longitude': 'float64',
+        'StationID': 'Int32',
+        'Description': 'string',
+        'CountryCode': 'category',
+    },
+    'Pictures': {
+        'Filename': 'string',
+        'Note': 'string',
+        'Type': 'int8',
+        'target_id': 'int32',
+    },
+    'Category': {
+        'IdCategory': 'int16',
+        'Name': 'string',
+    },
+}
+
+# Formato delle colonne con data e ora (controllato da validazione_fuelio).
+# leggi_tabella_fuelio le lascia come testo: chi ne ha bisogno le converte
+# con pd.to_datetime(..., format=FORMATO_DATA_ORA)
+DATE = {
+    'Log': {'Data': FORMATO_DATA_ORA},
+    'Costs': {'Date': FORMATO_DATA_ORA, 'RemindDate': FORMATO_DATA},
+}
+
+# Colonne lette da ogni script
+USI = {
+    'anomalie': ('Log', ['Data', 'Odo (km)', 'kg', 'Price (optional)', 'km/l (optional)',
+                         'TankNumber', 'VolumePrice', 'ExcludeDistance', 'UniqueId']),
+    'consumi': ('Log', ['Odo (km)', 'kg', 'Full', 'Missed', 'ExcludeDistance',
+                        'TankNumber', 'km/l (optional)', 'TankCalc']),
+    'statistiche': ('Log', ['Data', 'Odo (km)', 'kg', 'Price (optional)', 'TankNumber']),
+    'costi': ('Log', ['Data', 'Odo (km)', 'kg', 'Price (optional)', 'UniqueId']),
+    'stazioni': ('FavStations', ['StationID', 'Latitude', 'Longitude', 'NameBrand', 'Description']),
+    'capacita': ('Vehicle', ['TankCount', 'Tank1Capacity', 'Tank2Capacity']),
+    'verifica': ('Log', ['Data', 'Odo (km)', 'kg', 'latitude (optional)', 'longitude (optional)',
+                         'City (optional)', 'StationID (optional)', 'UniqueId', 'km/l (optional)',
+                         'TankNumber']),
+    'unione': ('Log', list(SCHEMI['Log'])),
+}
+
+# Colonne lette senza tipo esplicito per ogni uso: il tipo inferito da pandas
+# mantiene la rappresentazione con cui gli script di unione le riscrivono
+# (es. VolumePrice float32 verrebbe riscritto come 1.2790000438690186)
+TIPI_INFERITI = {
+    'unione': ['Data', 'km/l (optional)', 'City (optional)', 'Notes (optional)', 'VolumePrice',
+               'ExcludeDistance', 'TankCalc', 'Weather'],
+}
+
+# Tipi delle colonne del file Excel storico (Contabilita_consumi_Punto.xlsx).
+# Le colonne non elencate (es. Distro) vengono inferite.
+TIPI_STORICO = {
+    'Data': 'datetime64[ns]',
+    'Km': 'float64',
+    'Tot': 'float64',
+    'Kg': 'float64',
+    '€/Kg': 'float64',
+    'L': 'float64',
+    '€/L': 'float64',
+    'A benzina': 'float64',
+    'Serbatoio': 'Int64',  # intero con valori mancanti (celle vuote)
+}
+
+# Tipi delle colonne della tabella di conversione distributori
+TIPI_CONVERSIONE = {
+    'Latitude': 'float64',
+    'Longitude': 'float64',
+    'StationID': 'Int64',
+}
+
+
+def leggi_tabella_fuelio(sorgente, tabella: str, uso: str = None, usecols: list = None,
+                         **kwargs) -> 'pd.DataFrame':
+    """
+    Legge una tabella di Fuelio con i tipi dello schema.
+
+    Args:
+        sorgente: Percorso o file aperto (es. io.StringIO) con la tabella CSV
+        tabella: Nome della tabella in SCHEMI (es. 'Log')
+        uso: Nome di un uso in USI: legge solo le colonne di quell'uso (con
+            i tipi inferiti per quelle in TIPI_INFERITI)
+        usecols: Colonne da leggere (alternativa a uso; default: tutte)
+        **kwargs: Altri argomenti per pd.read_csv (es. header, names)
+
+    Returns:
+        DataFrame con i tipi dello schema
+    """
+    if uso is not None:
+        tabella_uso, usecols = USI[uso]
+        if tabella_uso != tabella:
+            raise ValueError(f"L'uso '{uso}' riguarda la tabella {tabella_uso}, non {tabella}")
+
+    schema = SCHEMI[tabella]
+    colonne = schema if usecols is None else usecols
+    inferite = TIPI_INFERITI.get(uso, ())
+    dtype = {colonna: tipo for colonna, tipo in schema.items() if colonna in colonne and colonna not in inferite}
+
+    import pandas as pd
+    return pd.read_csv(sorgente, usecols=usecols, dtype=dtype, **kwargs)
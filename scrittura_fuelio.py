@@ -0,0 +1,239 @@
+"""
+Scrittura veloce dei file CSV nel formato Fuelio.
+
+Fuelio usa un CSV con tutti i campi tra virgolette (QUOTE_ALL) e celle vuote
+("") per i valori mancanti. Invece di passare da df.to_csv, ogni colonna ha
+un formattatore scelto una sola volta in base al tipo (e all'eventuale
+formato richiesto, es. 2 decimali o intero): i valori distinti di ogni
+blocco vengono formattati una volta sola e poi distribuiti sulle righe.
+
+Il file viene scritto a blocchi di righe su uno stream bufferizzato, oppure
+compresso con gzip. Il risultato è identico byte per byte a quello di
+df.to_csv(index=False, quoting=csv.QUOTE_ALL).
+"""
+
+import csv
+import gzip
+import os
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+# Righe formattate e scritte per blocco
+RIGHE_PER_BLOCCO = 100_000
+
+# Dimensione del buffer di scrittura (1 MB)
+DIMENSIONE_BUFFER = 1024 * 1024
+
+# Campo vuoto (valore mancante)
+CAMPO_VUOTO = '""'
+
+# Separatore usato internamente per spezzare l'output di to_csv nel formattatore generico
+SEPARATORE_RIGHE = '\x1e'
+
+
+def _quota(valore) -> str:
+    """
+    Racchiude un valore tra virgolette, raddoppiando quelle interne.
+
+    Args:
+        valore: Valore da scrivere
+
+    Returns:
+        Campo CSV
+    """
+    return '"' + str(valore).replace('"', '""') + '"'
+
+
+def _distribuisci(serie: pd.Series, formatta: Callable) -> np.ndarray:
+    """
+    Formatta una volta sola ogni valore distinto della serie e lo distribuisce sulle righe.
+
+    Args:
+        serie: Valori della colonna
+        formatta: Funzione che formatta un valore (non mancante)
+
+    Returns:
+        Array di campi CSV, uno per riga
+    """
+    codici, distinti = pd.factorize(serie, use_na_sentinel=True)
+    # L'ultimo elemento della tabella è il campo vuoto (codice -1 dei valori mancanti)
+    tabella = np.array([formatta(v) for v in distinti.tolist()] + [CAMPO_VUOTO], dtype=object)
+    return tabella[codici]
+
+
+def _formatta_float(serie: pd.Series) -> np.ndarray:
+    """
+    Formatta una colonna float64 come to_csv (rappresentazione più breve, es. '313901.0').
+
+    Args:
+        serie: Valori della colonna
+
+    Returns:
+        Array di campi CSV
+    """
+    campi = _distribuisci(serie, lambda v: f'"{v!r}"')
+    # factorize non distingue -0.0 da 0.0, che to_csv scrive in modo diverso
+    valori = serie.to_numpy()
+    zeri_negativi = (valori == 0) & np.signbit(valori)
+    if zeri_negativi.any():
+        campi[valori == 0] = '"0.0"'
+        campi[zeri_negativi] = '"-0.0"'
+    return campi
+
+
+def _formatta_intero(serie: pd.Series) -> np.ndarray:
+    """
+    Formatta una colonna intera (anche nullable, es. Int64).
+
+    Args:
+        serie: Valori della colonna
+
+    Returns:
+        Array di campi CSV
+    """
+    return _distribuisci(serie, lambda v: f'"{v}"')
+
+
+def _formatta_testo(serie: pd.Series) -> np.ndarray:
+    """
+    Formatta una colonna di testo o di oggetti generici.
+
+    Args:
+        serie: Valori della colonna
+
+    Returns:
+        Array di campi CSV
+    """
+    try:
+        return _distribuisci(serie, _quota)
+    except TypeError:
+        # Valori non hashabili: formattazione riga per riga
+        mancanti = serie.isna().to_numpy()
+        return np.array([CAMPO_VUOTO if m else _quota(v)
+                         for v, m in zip(serie.tolist(), mancanti)], dtype=object)
+
+
+def _formatta_generico(serie: pd.Series) -> np.ndarray:
+    """
+    Formatta una colonna di tipo non gestito (date, categorie, ...) delegando a to_csv.
+
+    Args:
+        serie: Valori della colonna
+
+    Returns:
+        Array di campi CSV
+    """
+    testo = serie.to_frame().to_csv(index=False, header=False, quoting=csv.QUOTE_ALL,
+                                    lineterminator=SEPARATORE_RIGHE)
+    return np.array(testo.split(SEPARATORE_RIGHE)[:-1], dtype=object)
+
+
+def formattatore_colonna(dtype, formato: str = None) -> Callable[[pd.Series], np.ndarray]:
+    """
+    Sceglie il formattatore di una colonna in base al tipo e al formato richiesto.
+
+    Formati disponibili:
+    - 'decimali2': arrotonda a 2 decimali (come round(2))
+    - 'intero': scrive i numeri come interi (come astype('Int64')), vuoto se mancante
+
+    Args:
+        dtype: Tipo della colonna
+        formato: Formato richiesto (opzionale)
+
+    Returns:
+        Funzione che trasforma una serie nell'array dei suoi campi CSV
+    """
+    if formato == 'decimali2':
+        base = formattatore_colonna(dtype)
+        return lambda serie: base(serie.round(2))
+    if formato == 'intero':
+        return lambda serie: _formatta_intero(serie.astype('Int64'))
+    if formato is not None:
+        raise ValueError(f"Formato di colonna sconosciuto: {formato}")
+
+    if dtype == np.float64:
+        return _formatta_float
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return _formatta_intero
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        return _formatta_testo
+    return _formatta_generico
+
+
+def righe_csv_fuelio(df: pd.DataFrame, formati: dict = None) -> list:
+    """
+    Formatta le righe di un DataFrame nel formato Fuelio, una stringa per riga.
+
+    Args:
+        df: DataFrame da formattare
+        formati: Formati specifici per colonna {colonna: formato} (opzionale)
+
+    Returns:
+        Lista di righe CSV senza terminatore
+    """
+    formati = formati or {}
+    colonne = [formattatore_colonna(df[nome].dtype, formati.get(nome))(df[nome])
+               for nome in df.columns]
+    return list(map(','.join, zip(*colonne)))
+
+
+def _apri(destinazione, compressione: str):
+    """
+    Apre il file di destinazione in scrittura testo, bufferizzato o compresso.
+
+    Args:
+        destinazione: Percorso del file
+        compressione: 'gzip', None oppure 'infer' (gzip se il file termina con .gz)
+
+    Returns:
+        File aperto
+    """
+    destinazione = Path(destinazione)
+    if compressione == 'infer':
+        compressione = 'gzip' if destinazione.suffix == '.gz' else None
+
+    if compressione == 'gzip':
+        return gzip.open(destinazione, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    if compressione is not None:
+        raise ValueError(f"Compressione non supportata: {compressione}")
+    return open(destinazione, 'w', encoding='utf-8', newline='', buffering=DIMENSIONE_BUFFER)
+
+
+def scrivi_csv_fuelio(df: pd.DataFrame, destinazione, formati: dict = None,
+                      righe_per_blocco: int = RIGHE_PER_BLOCCO, compressione: str = 'infer',
+                      lineterminator: str = os.linesep, intestazione: bool = True) -> int:
+    """
+    Scrive un DataFrame nel formato CSV di Fuelio (tutti i campi tra virgolette).
+
+    Args:
+        df: DataFrame da scrivere
+        destinazione: Percorso del file oppure file di testo già aperto
+        formati: Formati specifici per colonna {colonna: formato} (vedi formattatore_colonna)
+        righe_per_blocco: Righe formattate e scritte per volta
+        compressione: 'infer' (gzip per i file .gz), 'gzip' oppure None
+        lineterminator: Terminatore di riga (default: come to_csv)
+        intestazione: Se True, scrive la riga con i nomi delle colonne
+
+    Returns:
+        Numero di righe di dati scritte
+    """
+    formati = formati or {}
+    formattatori = [formattatore_colonna(df[nome].dtype, formati.get(nome)) for nome in df.columns]
+
+    if isinstance(destinazione, (str, Path)):
+        with _apri(destinazione, compressione) as f:
+            return scrivi_csv_fuelio(df, f, formati, righe_per_blocco, None, lineterminator, intestazione)
+
+    if intestazione:
+        destinazione.write(','.join(_quota(nome) for nome in df.columns) + lineterminator)
+
+    for inizio in range(0, len(df), righe_per_blocco):
+        blocco = df.iloc[inizio:inizio + righe_per_blocco]
+        colonne = [formatta(blocco.iloc[:, i]) for i, formatta in enumerate(formattatori)]
+        destinazione.write(lineterminator.join(map(','.join, zip(*colonne))) + lineterminator)
+
+    return len(df)
@@ -3,19 +3,124 @@ Script per separare le tabelle del file CSV di Fuelio in file CSV individuali.
 
 Il file CSV di Fuelio contiene più tabelle separate dal marker '##'.
 Questo script identifica ogni tabella e crea un file CSV separato per ognuna.
+
+Il file viene letto in streaming, una riga alla volta: la memoria usata non
+dipende dalla dimensione del file. Il generatore `leggi_tabelle_fuelio` può
+essere usato anche dagli altri script come iteratore sulle righe delle tabelle.
 """
 
 import csv
 from pathlib import Path
+from typing import Iterable, Iterator
+
+from strumentazione import strumenta
+
+
+def nome_tabella_da_marker(riga: str) -> str | None:
+    """
+    Estrae il nome della tabella da una riga marker (formato: "##NomeTabella" o "## NomeTabella").
+    
+    Args:
+        riga: Riga del file CSV
+        
+    Returns:
+        Nome della tabella, oppure None se la riga non è un marker
+    """
+    riga = riga.strip()
+    if riga.startswith('"##') and riga.endswith('"'):
+        # Estrae il nome della tabella (rimuove "## e ")
+        return riga.replace('"##', '').replace('"', '').strip()
+    return None
+
+
+def _scorri_sezioni(righe: Iterable[str]) -> Iterator[tuple[str, str, str | None, int]]:
+    """
+    Scorre le righe del file e le associa alla tabella di appartenenza.
+    
+    Per ogni tabella viene emessa prima una tupla con riga=None, appena letta
+    l'intestazione, poi una tupla per ogni riga di dati non vuota.
+    Il numero di riga (1-based) è quello del marker per l'intestazione e quello
+    della riga stessa per i dati.
+    
+    Args:
+        righe: Iterabile di righe del file CSV
+        
+    Yields:
+        Tuple (nome_tabella, intestazione, riga, numero_riga)
+    """
+    tabella_corrente = None
+    intestazione_corrente = None
+    riga_marker = 0
+    
+    for i, riga in enumerate(righe):
+        # Rimuove spazi bianchi iniziali/finali
+        riga = riga.strip()
+        
+        # Controlla se è l'inizio di una nuova tabella
+        nome = nome_tabella_da_marker(riga)
+        if nome is not None:
+            tabella_corrente = nome
+            intestazione_corrente = None
+            riga_marker = i + 1
+            continue
+        
+        if not tabella_corrente:
+            continue
+        
+        # Se non abbiamo ancora l'intestazione, questa è l'intestazione
+        if intestazione_corrente is None:
+            intestazione_corrente = riga
+            if intestazione_corrente:
+                yield tabella_corrente, intestazione_corrente, None, riga_marker
+        elif riga and intestazione_corrente:
+            # Riga di dati della tabella (solo se non vuota)
+            yield tabella_corrente, intestazione_corrente, riga, i + 1
+
+
+def leggi_tabelle_fuelio(file_path: str = "vehicle-1-sync.csv", 
+                         tabelle: Iterable[str] = None) -> Iterator[tuple[str, str, str]]:
+    """
+    Legge in streaming le righe di dati di tutte le tabelle del file Fuelio.
+    
+    Usa memoria limitata a una riga alla volta, indipendentemente dalla
+    dimensione del file.
+    
+    Args:
+        file_path: Percorso del file CSV di Fuelio
+        tabelle: Nomi delle tabelle da leggere (default: tutte)
+        
+    Yields:
+        Tuple (nome_tabella, intestazione, riga) per ogni riga di dati
+    """
+    file_path = Path(file_path)
+    
+    if not file_path.exists():
+        raise FileNotFoundError(f"File non trovato: {file_path}")
+    
+    filtro = set(tabelle) if tabelle is not None else None
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for nome, intestazione, riga, _ in _scorri_sezioni(f):
+            if riga is None:
+                continue
+            if filtro is None or nome in filtro:
+                yield nome, intestazione, riga
 
 
+@strumenta(file_letti=('file_path',))
 def separa_tabelle_fuelio(file_path: str = "vehicle-1-sync.csv", output_dir: str = None):
     """
     Separa le tabelle del file CSV di Fuelio in file CSV individuali.
     
+    Ogni riga viene scritta nel file della sua tabella appena letta, senza
+    tenere in memoria il contenuto delle tabelle.
+    
     Args:
         file_path: Percorso del file CSV originale
         output_dir: Directory dove salvare i file separati (default: stessa directory del file originale)
+        
+    Returns:
+        Dizionario {nome_tabella: numero di righe di dati}
     """
     # Converte in Path object
     file_path = Path(file_path)
@@ -31,50 +136,37 @@ def separa_tabelle_fuelio(file_path: str = "vehicle-1-sync.csv", output_dir: str
     
     output_dir.mkdir(exist_ok=True)
     
-    # Legge il file e identifica le tabelle
-    with open(file_path, 'r', encoding='utf-8') as f:
-        righe = f.readlines()
-    
     # Variabili per tracciare lo stato
-    tabella_corrente = None
-    intestazione_corrente = None
-    righe_tabella = []
-    tabelle_trovate = []
+    tabelle_trovate = {}
+    tabella_aperta = None
+    f_out = None
     
     print(f"Analisi del file: {file_path}")
     print("-" * 50)
     
-    for i, riga in enumerate(righe):
-        # Rimuove spazi bianchi iniziali/finali
-        riga = riga.strip()
-        
-        # Controlla se è l'inizio di una nuova tabella
-        if riga.startswith('"##') and riga.endswith('"'):
-            # Salva la tabella precedente se esiste
-            if tabella_corrente and intestazione_corrente:
-                salva_tabella(tabella_corrente, intestazione_corrente, righe_tabella, output_dir)
-                tabelle_trovate.append(tabella_corrente)
-            
-            # Estrae il nome della tabella (rimuove "## e ")
-            tabella_corrente = riga.replace('"##', '').replace('"', '').strip()
-            intestazione_corrente = None
-            righe_tabella = []
-            
-            print(f"Trovata tabella: {tabella_corrente} (riga {i + 1})")
-        
-        elif tabella_corrente:
-            # Se non abbiamo ancora l'intestazione, questa è l'intestazione
-            if intestazione_corrente is None:
-                intestazione_corrente = riga
-            else:
-                # Aggiungi la riga ai dati della tabella (solo se non vuota)
-                if riga:
-                    righe_tabella.append(riga)
-    
-    # Salva l'ultima tabella
-    if tabella_corrente and intestazione_corrente:
-        salva_tabella(tabella_corrente, intestazione_corrente, righe_tabella, output_dir)
-        tabelle_trovate.append(tabella_corrente)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f_in:
+            for nome, intestazione, riga, numero_riga in _scorri_sezioni(f_in):
+                if riga is None:
+                    # Nuova tabella: chiude il file precedente e apre il nuovo
+                    if f_out is not None:
+                        f_out.close()
+                        _stampa_tabella_salvata(tabella_aperta, tabelle_trovate[tabella_aperta])
+                    
+                    print(f"Trovata tabella: {nome} (riga {numero_riga})")
+                    
+                    tabella_aperta = nome
+                    f_out = open(output_dir / f"{nome}.csv", 'w', encoding='utf-8', newline='')
+                    f_out.write(intestazione + '\n')
+                    tabelle_trovate[nome] = 0
+                else:
+                    f_out.write(riga + '\n')
+                    tabelle_trovate[nome] += 1
+    finally:
+        # Salva l'ultima tabella
+        if f_out is not None:
+            f_out.close()
+            _stampa_tabella_salvata(tabella_aperta, tabelle_trovate[tabella_aperta])
     
     print("-" * 50)
     print(f"\nProcesso completato!")
@@ -82,6 +174,19 @@ def separa_tabelle_fuelio(file_path: str = "vehicle-1-sync.csv", output_dir: str
     for nome in tabelle_trovate:
         print(f"  - {nome}.csv")
     print(f"\nFile salvati in: {output_dir.absolute()}")
+    
+    return tabelle_trovate
+
+
+def _stampa_tabella_salvata(nome_tabella: str, numero_righe: int):
+    """
+    Stampa il riepilogo di una tabella appena salvata.
+    
+    Args:
+        nome_tabella: Nome della tabella
+        numero_righe: Numero di righe di dati scritte
+    """
+    print(f"  → Salvata: {nome_tabella}.csv ({numero_righe} righe)")
 
 
 def salva_tabella(nome_tabella: str, intestazione: str, righe: list, output_dir: Path):
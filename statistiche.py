@@ -0,0 +1,387 @@
+"""
+Statistiche per periodo sul Log unificato con somme cumulative.
+
+L'indice contiene, per l'intero veicolo e per ogni serbatoio, le date dei
+rifornimenti (in ordine) e le somme cumulative di km, kg e prezzo: i totali
+di un periodo si ottengono con due ricerche binarie e una differenza, senza
+scorrere il Log.
+
+- km del veicolo: differenze di 'Odo (km)' tra rifornimenti consecutivi
+- km di un serbatoio: differenze di 'Odo (km)' tra rifornimenti consecutivi
+  dello stesso serbatoio (il primo rifornimento vale 0). Sono i km percorsi
+  tra un rifornimento e l'altro di quel serbatoio, non i km fatti con quel
+  carburante: su un veicolo bifuel i due serbatoi si usano alternandoli, quindi
+  i km di ciascun serbatoio possono superare quelli dell'intero veicolo
+
+L'indice è salvato accanto al file (es. 'Log_unificato.csv.statistiche.npz').
+Quando al Log vengono aggiunte righe in fondo l'indice viene esteso leggendo
+solo le righe nuove; se invece il file è stato riscritto (dimensione minore o
+uguale, oppure byte finali della parte indicizzata diversi, come dopo
+un'unione incrementale che inserisce record nel mezzo) viene ricostruito.
+"""
+
+import argparse
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schemi_fuelio import FORMATO_DATA_ORA, USI, leggi_tabella_fuelio
+from unisci_log_storico import COLONNE_LOG
+
+
+VERSIONE_INDICE = 1
+
+COLONNE_INDICE = USI['statistiche'][1]
+
+# Somme cumulative salvate per ogni gruppo (veicolo e serbatoi)
+GRANDEZZE = ['km', 'kg', 'euro']
+
+# Gruppo con tutti i rifornimenti del veicolo
+TUTTI = 'tutti'
+
+# Byte finali della parte indicizzata usati per verificare che non sia cambiata
+BYTE_CONTROLLO = 1024
+
+
+def file_indice_statistiche(file_unificato: str) -> Path:
+    """
+    Restituisce il percorso del file indice associato al Log unificato.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        Percorso del file indice
+    """
+    file_unificato = Path(file_unificato)
+    return file_unificato.with_name(file_unificato.name + '.statistiche.npz')
+
+
+def _minuti(date: pd.Series) -> np.ndarray:
+    """
+    Converte le date del Log ('YYYY-MM-DD HH:MM') in minuti dal 1970.
+
+    Args:
+        date: Colonna Data del Log
+
+    Returns:
+        Array di int64
+    """
+    date = pd.to_datetime(date, format=FORMATO_DATA_ORA)
+    return date.to_numpy(dtype='datetime64[ns]').astype('datetime64[m]').astype(np.int64)
+
+
+def _minuto(data) -> int:
+    """
+    Converte una data (stringa o datetime) in minuti dal 1970.
+
+    Args:
+        data: Data da convertire
+
+    Returns:
+        Minuti dal 1970
+    """
+    return int(np.datetime64(pd.Timestamp(data), 'm').astype(np.int64))
+
+
+def _ultimi_byte(file_unificato: Path, offset: int) -> bytes:
+    """
+    Legge i BYTE_CONTROLLO byte che precedono la posizione indicata.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+        offset: Posizione di fine lettura
+
+    Returns:
+        Byte letti
+    """
+    with open(file_unificato, 'rb') as f:
+        inizio = max(0, offset - BYTE_CONTROLLO)
+        f.seek(inizio)
+        return f.read(offset - inizio)
+
+
+def _segna_fine(indice: dict, file_unificato: Path):
+    """
+    Registra nell'indice dimensione, data di modifica e byte finali del file indicizzato.
+
+    Args:
+        indice: Indice (modificato sul posto)
+        file_unificato: Percorso del Log unificato
+    """
+    stat = file_unificato.stat()
+    indice['offset'] = stat.st_size
+    indice['mtime_ns'] = stat.st_mtime_ns
+    indice['controllo'] = _ultimi_byte(file_unificato, stat.st_size)
+
+
+def _aggiungi_righe(indice: dict, df: pd.DataFrame):
+    """
+    Aggiunge in fondo alle somme cumulative dell'indice le righe di un blocco.
+
+    Args:
+        indice: Indice da estendere (modificato sul posto)
+        df: Righe nuove con le colonne COLONNE_INDICE, in ordine di data
+    """
+    if len(df) == 0:
+        return
+
+    data = _minuti(df['Data'])
+    odo = pd.to_numeric(df['Odo (km)'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    kg = np.nan_to_num(pd.to_numeric(df['kg'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan))
+    euro = np.nan_to_num(pd.to_numeric(df['Price (optional)'], errors='coerce')
+                         .to_numpy(dtype=np.float64, na_value=np.nan))
+    serbatoio = pd.to_numeric(df['TankNumber'], errors='coerce').fillna(0).astype(np.int64).to_numpy()
+
+    gruppi = [(TUTTI, np.arange(len(df)))]
+    gruppi += [(str(numero), np.flatnonzero(serbatoio == numero)) for numero in np.unique(serbatoio)]
+
+    for nome, righe in gruppi:
+        gruppo = indice['gruppi'].setdefault(nome, {
+            'data': np.empty(0, dtype=np.int64),
+            'km': np.zeros(1), 'kg': np.zeros(1), 'euro': np.zeros(1),
+            'ultimo_odo': np.nan,
+        })
+        odo_gruppo = odo[righe]
+        # Il primo rifornimento del gruppo non ha un precedente: 0 km
+        precedente = odo_gruppo[0] if np.isnan(gruppo['ultimo_odo']) else gruppo['ultimo_odo']
+        km = np.nan_to_num(np.diff(odo_gruppo, prepend=precedente))
+
+        gruppo['data'] = np.concatenate([gruppo['data'], data[righe]])
+        for grandezza, valori in (('km', km), ('kg', kg[righe]), ('euro', euro[righe])):
+            cumulata = gruppo[grandezza]
+            gruppo[grandezza] = np.concatenate([cumulata, cumulata[-1] + np.cumsum(valori)])
+        if not np.isnan(odo_gruppo[-1]):
+            gruppo['ultimo_odo'] = odo_gruppo[-1]
+
+    indice['righe'] += len(df)
+
+
+def costruisci_indice_statistiche(file_unificato: str = "Log_unificato.csv") -> dict:
+    """
+    Legge il Log unificato e costruisce l'indice delle somme cumulative.
+
+    Args:
+        file_unificato: Percorso del Log unificato (ordinato per data)
+
+    Returns:
+        Dizionario con l'indice
+    """
+    file_unificato = Path(file_unificato)
+    indice = {'versione': VERSIONE_INDICE, 'righe': 0, 'gruppi': {}}
+
+    df = leggi_tabella_fuelio(file_unificato, 'Log', uso='statistiche')
+    _aggiungi_righe(indice, df)
+    _segna_fine(indice, file_unificato)
+    return indice
+
+
+def estendi_indice_statistiche(indice: dict, file_unificato: str) -> bool:
+    """
+    Aggiunge all'indice le righe scritte in fondo al Log dopo la sua creazione.
+
+    Args:
+        indice: Indice da estendere (modificato sul posto)
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        True se l'indice è aggiornato, False se la parte già indicizzata è
+        cambiata (o le righe nuove non sono in ordine) e va ricostruito
+    """
+    file_unificato = Path(file_unificato)
+    stat = file_unificato.stat()
+    if stat.st_size == indice['offset'] and stat.st_mtime_ns == indice['mtime_ns']:
+        return True
+    if stat.st_size <= indice['offset'] or _ultimi_byte(file_unificato, indice['offset']) != indice['controllo']:
+        return False
+
+    with open(file_unificato, 'rb') as f:
+        f.seek(indice['offset'])
+        nuove = f.read()
+    df = leggi_tabella_fuelio(io.BytesIO(nuove), 'Log', uso='statistiche', header=None, names=COLONNE_LOG)
+    if len(df) > 0:
+        date = _minuti(df['Data'])
+        ultima = indice['gruppi'][TUTTI]['data'][-1:] if TUTTI in indice['gruppi'] else date[:0]
+        if np.any(np.diff(np.concatenate([ultima, date])) < 0):
+            return False
+
+    _aggiungi_righe(indice, df)
+    _segna_fine(indice, file_unificato)
+    return True
+
+
+def salva_indice_statistiche(indice: dict, file_unificato: str):
+    """
+    Salva l'indice accanto al Log unificato.
+
+    Args:
+        indice: Indice da salvare
+        file_unificato: Percorso del Log unificato
+    """
+    metadati = {
+        'versione': indice['versione'],
+        'righe': indice['righe'],
+        'offset': indice['offset'],
+        'mtime_ns': indice['mtime_ns'],
+        'controllo': indice['controllo'].hex(),
+        'ultimo_odo': {nome: gruppo['ultimo_odo'] for nome, gruppo in indice['gruppi'].items()},
+    }
+    array = {'metadati': np.array(json.dumps(metadati))}
+    for nome, gruppo in indice['gruppi'].items():
+        for chiave in ['data'] + GRANDEZZE:
+            array[f'{chiave}_{nome}'] = gruppo[chiave]
+
+    with open(file_indice_statistiche(file_unificato), 'wb') as f:
+        np.savez(f, **array)
+
+
+def _leggi_indice_statistiche(file_unificato: str) -> dict | None:
+    """
+    Legge l'indice salvato, se presente e della versione corrente.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        Dizionario con l'indice, oppure None
+    """
+    percorso = file_indice_statistiche(file_unificato)
+    if not percorso.exists():
+        return None
+
+    try:
+        with np.load(percorso) as dati:
+            metadati = json.loads(str(dati['metadati']))
+            if metadati.get('versione') != VERSIONE_INDICE:
+                return None
+            gruppi = {
+                nome: {
+                    **{chiave: dati[f'{chiave}_{nome}'] for chiave in ['data'] + GRANDEZZE},
+                    'ultimo_odo': ultimo_odo,
+                }
+                for nome, ultimo_odo in metadati['ultimo_odo'].items()
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return {
+        'versione': metadati['versione'],
+        'righe': metadati['righe'],
+        'offset': metadati['offset'],
+        'mtime_ns': metadati['mtime_ns'],
+        'controllo': bytes.fromhex(metadati['controllo']),
+        'gruppi': gruppi,
+    }
+
+
+def carica_indice_statistiche(file_unificato: str = "Log_unificato.csv") -> dict:
+    """
+    Restituisce l'indice del Log unificato, estendendolo o ricostruendolo se serve.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        Dizionario con l'indice aggiornato
+    """
+    file_unificato = Path(file_unificato)
+    if not file_unificato.exists():
+        raise FileNotFoundError(f"File non trovato: {file_unificato}")
+
+    indice = _leggi_indice_statistiche(file_unificato)
+    firma = None if indice is None else (indice['offset'], indice['mtime_ns'])
+
+    if indice is None or not estendi_indice_statistiche(indice, file_unificato):
+        indice = costruisci_indice_statistiche(file_unificato)
+    elif (indice['offset'], indice['mtime_ns']) == firma:
+        return indice
+
+    salva_indice_statistiche(indice, file_unificato)
+    return indice
+
+
+def statistiche(veicolo, inizio=None, fine=None, serbatoio: int = None) -> dict:
+    """
+    Totali dei rifornimenti di un periodo (dal inizio compreso al fine escluso).
+
+    Args:
+        veicolo: Indice del veicolo (carica_indice_statistiche) o percorso
+            del suo Log unificato
+        inizio: Data di inizio (stringa o datetime, None = dal primo rifornimento)
+        fine: Data di fine esclusa (None = fino all'ultimo rifornimento)
+        serbatoio: Numero del serbatoio (None = tutto il veicolo)
+
+    Returns:
+        Dizionario con 'rifornimenti', 'km', 'kg' ed 'euro' del periodo; con
+        serbatoio 'km' sono i km tra i rifornimenti di quel serbatoio, non i km
+        percorsi con il suo carburante
+    """
+    if not isinstance(veicolo, dict):
+        veicolo = carica_indice_statistiche(veicolo)
+
+    gruppo = veicolo['gruppi'].get(TUTTI if serbatoio is None else str(serbatoio))
+    if gruppo is None:
+        return {'rifornimenti': 0, 'km': 0.0, 'kg': 0.0, 'euro': 0.0}
+
+    date = gruppo['data']
+    da = 0 if inizio is None else int(np.searchsorted(date, _minuto(inizio)))
+    a = len(date) if fine is None else int(np.searchsorted(date, _minuto(fine)))
+    a = max(a, da)
+
+    risultato = {'rifornimenti': a - da}
+    for grandezza in GRANDEZZE:
+        risultato[grandezza] = round(float(gruppo[grandezza][a] - gruppo[grandezza][da]), 2)
+    return risultato
+
+
+def main(argv: list = None):
+    """
+    Mostra i totali di un periodo e il riepilogo per anno del Log unificato.
+
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Statistiche per periodo sul Log unificato")
+    parser.add_argument('file_unificato', nargs='?', default='Log_unificato.csv',
+                        help="Log unificato (default: Log_unificato.csv)")
+    parser.add_argument('--da', default=None, help="data di inizio (es. 2020-01-01)")
+    parser.add_argument('--a', default=None, help="data di fine esclusa (es. 2021-01-01)")
+    parser.add_argument('--serbatoio', type=int, default=None, help="numero del serbatoio (default: tutti)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("STATISTICHE LOG UNIFICATO")
+    print("=" * 60)
+
+    indice = carica_indice_statistiche(args.file_unificato)
+    print(f"\n✓ Indice: {indice['righe']} rifornimenti ({file_indice_statistiche(args.file_unificato)})")
+
+    totali = statistiche(indice, args.da, args.a, args.serbatoio)
+    descrizione = 'tutti i serbatoi' if args.serbatoio is None else f"serbatoio {args.serbatoio}"
+    print(f"\nPeriodo {args.da or 'inizio'} → {args.a or 'fine'} ({descrizione}):")
+    print(f"  Rifornimenti: {totali['rifornimenti']}")
+    etichetta_km = 'Km' if args.serbatoio is None else 'Km tra rifornimenti del serbatoio'
+    print(f"  {etichetta_km}: {totali['km']:.0f}")
+    print(f"  Carburante: {totali['kg']:.2f}")
+    print(f"  Spesa: {totali['euro']:.2f} €")
+
+    date = indice['gruppi'][TUTTI]['data'] if TUTTI in indice['gruppi'] else []
+    if len(date) > 0:
+        if args.serbatoio is not None:
+            print(f"\n(Km = km tra i rifornimenti del serbatoio {args.serbatoio}, "
+                  "non km percorsi con il suo carburante)")
+        primo, ultimo = pd.to_datetime(date[[0, -1]], unit='m').year
+        print(f"\n{'Anno':<6} {'Rif.':>6} {'Km':>9} {'Carburante':>11} {'Spesa €':>10}")
+        for anno in range(primo, ultimo + 1):
+            totali = statistiche(indice, f"{anno}-01-01", f"{anno + 1}-01-01", args.serbatoio)
+            print(f"{anno:<6} {totali['rifornimenti']:>6} {totali['km']:>9.0f} "
+                  f"{totali['kg']:>11.2f} {totali['euro']:>10.2f}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Strumentazione delle fasi di elaborazione: tempi, memoria, righe e byte.
+
+Le funzioni di caricamento, trasformazione e scrittura sono decorate con
+@strumenta. Quando la strumentazione è attiva, per ogni chiamata vengono
+registrati:
+- tempo reale e tempo CPU (del thread)
+- picco di memoria allocata (tracemalloc), se richiesto
+- righe in ingresso (DataFrame passati) e in uscita (DataFrame o conteggi restituiti)
+- byte letti e scritti (dimensione dei file indicati nel decoratore)
+
+Le misure vengono raccolte in un rapporto, stampato a fine esecuzione e
+salvabile in JSON o CSV. Una fase può anche essere profilata con cProfile.
+
+Quando la strumentazione non è attiva (predefinito) il decoratore si limita
+a controllare un flag e chiamare la funzione: il costo è trascurabile.
+
+Il picco di memoria è quello di tutto il processo durante la fase: con fasi
+eseguite in parallelo (pipeline_fuelio) include anche la memoria allocata
+dalle altre fasi in corso.
+
+Attivazione:
+- da codice: attiva_strumentazione(...), poi salva_rapporto('rapporto.json')
+- da riga di comando: variabile d'ambiente FUELIO_STRUMENTAZIONE con il
+  percorso del rapporto (es. FUELIO_STRUMENTAZIONE=rapporto.json), e
+  opzionalmente FUELIO_PROFILA con il nome della fase da profilare
+"""
+
+import atexit
+import cProfile
+import csv
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+
+# Colonne del rapporto, nell'ordine in cui vengono salvate in CSV
+COLONNE_RAPPORTO = [
+    'id', 'padre', 'fase', 'livello', 'inizio', 'secondi', 'secondi_cpu', 'picco_memoria_mb',
+    'righe_ingresso', 'righe_uscita', 'righe_al_secondo', 'byte_letti', 'byte_scritti', 'esito',
+]
+
+# Righe del profilo cProfile mostrate a video
+RIGHE_PROFILO = 25
+
+
+class _Stato:
+    """Stato globale della strumentazione."""
+    attiva = False
+    memoria = False
+    profila = None
+    file_profilo = None
+    inizio = 0.0
+    misure = []
+    contatore = 0
+    lock = threading.Lock()
+    # Pila delle fasi in corso, per thread (per gestire le fasi annidate)
+    locale = threading.local()
+
+
+def attiva_strumentazione(memoria: bool = True, profila: str = None, file_profilo: str = None):
+    """
+    Attiva la raccolta delle misure e azzera il rapporto.
+
+    Args:
+        memoria: Se True, misura il picco di memoria con tracemalloc (rallenta l'esecuzione)
+        profila: Nome della fase da profilare con cProfile (opzionale)
+        file_profilo: File in cui salvare il profilo (default: '<fase>.prof')
+    """
+    _Stato.attiva = True
+    _Stato.memoria = memoria
+    _Stato.profila = profila
+    _Stato.file_profilo = file_profilo or (f"{profila}.prof" if profila else None)
+    _Stato.inizio = time.perf_counter()
+    _Stato.misure = []
+    _Stato.contatore = 0
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disattiva_strumentazione():
+    """
+    Disattiva la raccolta delle misure (il rapporto raccolto resta disponibile).
+    """
+    _Stato.attiva = False
+    if _Stato.memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _Stato.memoria = False
+
+
+def strumentazione_attiva() -> bool:
+    """
+    Indica se la strumentazione è attiva.
+
+    Returns:
+        True se le misure vengono raccolte
+    """
+    return _Stato.attiva
+
+
+def conta_righe(valore) -> int | None:
+    """
+    Conta le righe di un valore (DataFrame, Series o dizionario di conteggi).
+
+    Args:
+        valore: Valore restituito o passato a una fase
+
+    Returns:
+        Numero di righe, oppure None se non applicabile
+    """
+    # pandas non viene importato qui (gli script senza pandas partono più veloci):
+    # se non è già caricato, il valore non può essere un DataFrame
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(valore, (pd.DataFrame, pd.Series)):
+        return len(valore)
+    if isinstance(valore, dict) and valore and all(isinstance(v, int) for v in valore.values()):
+        # Es. separa_tabelle_fuelio: {nome tabella: numero di record}
+        return sum(valore.values())
+    return None
+
+
+def _dimensione_file(percorso) -> int | None:
+    """
+    Restituisce la dimensione di un file, se esiste.
+
+    Args:
+        percorso: Percorso del file (o altro valore, ignorato)
+
+    Returns:
+        Dimensione in byte, oppure None
+    """
+    if isinstance(percorso, (str, Path)):
+        try:
+            return Path(percorso).stat().st_size
+        except OSError:
+            return None
+    return None
+
+
+def _pila() -> list:
+    """Restituisce la pila delle fasi in corso nel thread corrente."""
+    if not hasattr(_Stato.locale, 'pila'):
+        _Stato.locale.pila = []
+    return _Stato.locale.pila
+
+
+@contextmanager
+def misura_fase(nome: str, righe_ingresso: int = None, byte_letti: int = None):
+    """
+    Misura un blocco di codice come fase (se la strumentazione è attiva).
+
+    Esempio:
+        with misura_fase('unione') as misura:
+            df = ...
+            misura['righe_uscita'] = len(df)
+
+    Args:
+        nome: Nome della fase
+        righe_ingresso: Righe in ingresso (opzionale)
+        byte_letti: Byte letti (opzionale)
+
+    Yields:
+        Dizionario della misura, in cui si possono impostare 'righe_uscita' e 'byte_scritti'
+    """
+    if not _Stato.attiva:
+        yield {}
+        return
+
+    pila = _pila()
+    with _Stato.lock:
+        _Stato.contatore += 1
+        identificativo = _Stato.contatore
+    misura = {
+        'id': identificativo,
+        'padre': pila[-1]['id'] if pila else None,
+        'fase': nome,
+        'livello': len(pila),
+        'inizio': round(time.perf_counter() - _Stato.inizio, 4),
+        'righe_ingresso': righe_ingresso,
+        'righe_uscita': None,
+        'byte_letti': byte_letti,
+        'byte_scritti': None,
+        'esito': 'ok',
+    }
+
+    # Memoria: il picco viene azzerato all'ingresso di ogni fase; quello della
+    # fase esterna viene conservato nella pila e aggiornato all'uscita della fase interna
+    memoria = _Stato.memoria and tracemalloc.is_tracing()
+    if memoria:
+        corrente, picco = tracemalloc.get_traced_memory()
+        if pila:
+            pila[-1]['picco'] = max(pila[-1]['picco'], picco)
+        tracemalloc.reset_peak()
+    else:
+        corrente = 0
+    voce = {'id': identificativo, 'base': corrente, 'picco': corrente}
+    pila.append(voce)
+
+    profilo = cProfile.Profile() if nome == _Stato.profila else None
+    inizio, inizio_cpu = time.perf_counter(), time.thread_time()
+    if profilo is not None:
+        profilo.enable()
+
+    try:
+        yield misura
+    except BaseException:
+        misura['esito'] = 'errore'
+        raise
+    finally:
+        if profilo is not None:
+            profilo.disable()
+        secondi = time.perf_counter() - inizio
+        misura['secondi'] = round(secondi, 4)
+        misura['secondi_cpu'] = round(time.thread_time() - inizio_cpu, 4)
+
+        pila.pop()
+        misura['picco_memoria_mb'] = None
+        if memoria:
+            voce['picco'] = max(voce['picco'], tracemalloc.get_traced_memory()[1])
+            misura['picco_memoria_mb'] = round((voce['picco'] - voce['base']) / 1024 / 1024, 2)
+            if pila:
+                pila[-1]['picco'] = max(pila[-1]['picco'], voce['picco'])
+            tracemalloc.reset_peak()
+
+        righe = misura['righe_uscita'] if misura['righe_uscita'] is not None else misura['righe_ingresso']
+        misura['righe_al_secondo'] = round(righe / secondi) if righe and secondi > 0 else None
+
+        with _Stato.lock:
+            _Stato.misure.append(misura)
+
+        if profilo is not None:
+            _salva_profilo(profilo, nome)
+
+
+def _salva_profilo(profilo: cProfile.Profile, nome: str):
+    """
+    Salva il profilo cProfile di una fase e ne stampa le funzioni più costose.
+
+    Args:
+        profilo: Profilo raccolto
+        nome: Nome della fase
+    """
+    profilo.dump_stats(_Stato.file_profilo)
+    testo = io.StringIO()
+    pstats.Stats(profilo, stream=testo).sort_stats('cumulative').print_stats(RIGHE_PROFILO)
+    print(f"\n📊 Profilo della fase '{nome}' salvato in {_Stato.file_profilo}")
+    print(testo.getvalue())
+
+
+def strumenta(funzione: Callable = None, *, nome: str = None, file_letti: tuple = (),
+              file_scritti: tuple = ()) -> Callable:
+    """
+    Decoratore che misura ogni chiamata della funzione come fase.
+
+    Esempio:
+        @strumenta(file_letti=('file_excel',))
+        def carica_dati_excel(file_excel: str = "...") -> pd.DataFrame:
+
+    Args:
+        funzione: Funzione da decorare (se usato senza parentesi)
+        nome: Nome della fase (default: nome della funzione)
+        file_letti: Nomi dei parametri con i file letti (per i byte letti)
+        file_scritti: Nomi dei parametri con i file scritti (per i byte scritti)
+
+    Returns:
+        Funzione decorata, con la stessa firma dell'originale
+    """
+    if funzione is None:
+        return lambda f: strumenta(f, nome=nome, file_letti=file_letti, file_scritti=file_scritti)
+
+    nome_fase = nome or funzione.__name__
+    firma = inspect.signature(funzione)
+
+    @functools.wraps(funzione)
+    def wrapper(*args, **kwargs):
+        if not _Stato.attiva:
+            return funzione(*args, **kwargs)
+
+        argomenti = firma.bind(*args, **kwargs)
+        argomenti.apply_defaults()
+        valori = argomenti.arguments
+
+        righe = [conta_righe(v) for v in valori.values()]
+        righe = [r for r in righe if r is not None]
+        letti = [_dimensione_file(valori.get(p)) for p in file_letti]
+        letti = [b for b in letti if b is not None]
+
+        with misura_fase(nome_fase, sum(righe) if righe else None,
+                         sum(letti) if letti else None) as misura:
+            risultato = funzione(*args, **kwargs)
+            misura['righe_uscita'] = conta_righe(risultato)
+            scritti = [_dimensione_file(valori.get(p)) for p in file_scritti]
+            scritti = [b for b in scritti if b is not None]
+            if scritti:
+                misura['byte_scritti'] = sum(scritti)
+        return risultato
+
+    return wrapper
+
+
+def rapporto() -> list:
+    """
+    Restituisce le misure raccolte, in ordine di inizio.
+
+    Returns:
+        Lista di dizionari (uno per chiamata), con le chiavi di COLONNE_RAPPORTO
+    """
+    with _Stato.lock:
+        misure = list(_Stato.misure)
+    return sorted(misure, key=lambda m: m['inizio'])
+
+
+def stampa_rapporto():
+    """
+    Stampa il rapporto delle fasi misurate.
+    """
+    misure = rapporto()
+    if not misure:
+        return
+
+    print("\n" + "=" * 60)
+    print("RAPPORTO FASI")
+    print("=" * 60)
+    print(f"{'Fase':<40} {'Tempo':>9} {'CPU':>9} {'Memoria':>10} {'Righe':>10}")
+
+    # Ogni fase è seguita dalle fasi annidate (anche se eseguite in parallelo ad altre)
+    figli = {}
+    for m in misure:
+        figli.setdefault(m['padre'], []).append(m)
+
+    def in_ordine(padre):
+        for m in figli.get(padre, []):
+            yield m
+            yield from in_ordine(m['id'])
+
+    for m in in_ordine(None):
+        nome = ('  ' * m['livello'] + m['fase'])[:40]
+        memoria = '' if m['picco_memoria_mb'] is None else f"{m['picco_memoria_mb']:,.1f} MB"
+        righe = m['righe_uscita'] if m['righe_uscita'] is not None else m['righe_ingresso']
+        righe = '' if righe is None else f"{righe:,}"
+        simbolo = '' if m['esito'] == 'ok' else ' ❌'
+        print(f"{nome:<40} {m['secondi']:8.3f}s {m['secondi_cpu']:8.3f}s {memoria:>10} {righe:>10}{simbolo}")
+
+
+def salva_rapporto(file_output: str):
+    """
+    Salva il rapporto delle fasi in JSON o CSV (in base all'estensione del file).
+
+    Args:
+        file_output: Percorso del file (.json o .csv)
+    """
+    file_output = Path(file_output)
+    misure = rapporto()
+
+    if file_output.suffix.lower() == '.csv':
+        with open(file_output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLONNE_RAPPORTO, quoting=csv.QUOTE_ALL)
+            writer.writeheader()
+            writer.writerows(misure)
+    else:
+        documento = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'memoria': _Stato.memoria,
+            'fasi': misure,
+        }
+        with open(file_output, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+
+    print(f"\n📊 Rapporto delle fasi salvato in: {file_output.absolute()}")
+
+
+def _attiva_da_ambiente():
+    """
+    Attiva la strumentazione se è impostata la variabile d'ambiente FUELIO_STRUMENTAZIONE.
+
+    Il rapporto viene stampato e salvato all'uscita del programma.
+    FUELIO_MEMORIA=0 disattiva la misura della memoria.
+    """
+    file_rapporto = os.environ.get('FUELIO_STRUMENTAZIONE')
+    if not file_rapporto or _Stato.attiva:
+        return
+
+    attiva_strumentazione(memoria=os.environ.get('FUELIO_MEMORIA', '1') != '0',
+                          profila=os.environ.get('FUELIO_PROFILA'))
+
+    def al_termine():
+        stampa_rapporto()
+        salva_rapporto(file_rapporto)
+
+    atexit.register(al_termine)
+
+
+_attiva_da_ambiente()
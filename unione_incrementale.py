@@ -0,0 +1,354 @@
+"""
+Unione incrementale dei nuovi rifornimenti Fuelio nel Log unificato.
+
+Invece di ricostruire tutto Log_unificato.csv (15 anni di storico + Log Fuelio),
+legge solo lo stato dell'ultima esecuzione e aggiunge i rifornimenti nuovi di
+Log.csv. I nuovi record vengono inseriti con un merge ordinato per data (e
+chilometraggio, come nell'unione completa): viene
+riscritta solo la parte finale del file a partire dal punto di inserimento,
+rinumerando UniqueId solo per le righe coinvolte.
+
+Lo stato è salvato accanto al file (es. 'Log_unificato.csv.stato.json') e
+contiene il massimo UniqueId Fuelio già unito. Se lo stato manca o non
+corrisponde al file, i nuovi record vengono individuati confrontando Data e
+Odo (km) con l'ultima riga del Log unificato.
+
+Le righe vengono riscritte cambiando solo il campo UniqueId. Se il Log
+unificato era stato scritto con --testo-originale (vedi
+validazione_fuelio.ha_testo_originale) anche i nuovi record mantengono il testo
+di Log.csv (letto con unione_testuale.carica_log_fuelio_testo, senza
+conversione dei distributori) e il segno viene rinnovato dopo la riscrittura.
+
+I nuovi record non vengono confrontati con lo storico per rimuovere i
+duplicati (vedi deduplicazione.py): per un Log di Fuelio che si sovrappone
+allo storico serve l'unione completa.
+"""
+
+import csv
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from schemi_fuelio import FORMATO_DATA_ORA
+from scrittura_fuelio import righe_csv_fuelio
+from unisci_log_storico import (
+    COLONNE_LOG,
+    FORMATI_LOG,
+    applica_conversione_distributori,
+    carica_log_fuelio,
+)
+from unione_testuale import RECORD, TESTO_DOPO, TESTO_PRIMA, carica_log_fuelio_testo
+from validazione_fuelio import ha_testo_originale, segna_testo_originale
+
+
+VERSIONE_STATO = 1
+
+# Posizione delle colonne Data, Odo (km) e UniqueId nel Log
+INDICE_DATA = COLONNE_LOG.index('Data')
+INDICE_ODO = COLONNE_LOG.index('Odo (km)')
+INDICE_UNIQUEID = COLONNE_LOG.index('UniqueId')
+
+# Chilometraggio usato nelle chiavi per i valori mancanti
+ODO_MANCANTE = float('inf')
+
+# Dimensione dei blocchi letti a ritroso dalla fine del file
+DIMENSIONE_BLOCCO = 64 * 1024
+
+
+def file_stato(file_unificato: str) -> Path:
+    """
+    Restituisce il percorso del file di stato associato al Log unificato.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        Percorso del file di stato
+    """
+    file_unificato = Path(file_unificato)
+    return file_unificato.with_name(file_unificato.name + '.stato.json')
+
+
+def salva_stato(file_unificato: str, max_uniqueid_fuelio: int, righe: int):
+    """
+    Salva lo stato del Log unificato dopo un'unione.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+        max_uniqueid_fuelio: Massimo UniqueId (originale di Fuelio) già unito
+        righe: Numero di righe di dati nel Log unificato
+    """
+    stat = Path(file_unificato).stat()
+    stato = {
+        'versione': VERSIONE_STATO,
+        'dimensione': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'righe': int(righe),
+        'max_uniqueid_fuelio': int(max_uniqueid_fuelio),
+    }
+    with open(file_stato(file_unificato), 'w', encoding='utf-8') as f:
+        json.dump(stato, f, indent=2)
+
+
+def leggi_stato(file_unificato: str) -> dict | None:
+    """
+    Legge lo stato del Log unificato, se presente e coerente con il file.
+
+    Args:
+        file_unificato: Percorso del Log unificato
+
+    Returns:
+        Dizionario con lo stato, oppure None se mancante o non aggiornato
+    """
+    percorso = file_stato(file_unificato)
+    if not percorso.exists() or not Path(file_unificato).exists():
+        return None
+
+    try:
+        with open(percorso, 'r', encoding='utf-8') as f:
+            stato = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = Path(file_unificato).stat()
+    if (stato.get('versione') != VERSIONE_STATO
+            or stato.get('dimensione') != stat.st_size
+            or stato.get('mtime_ns') != stat.st_mtime_ns):
+        return None
+
+    return stato
+
+
+def _righe_a_ritroso(f):
+    """
+    Legge le righe di un file binario dalla fine verso l'inizio.
+
+    Args:
+        f: File aperto in modalità binaria
+
+    Yields:
+        Tuple (offset di inizio riga, riga in byte senza terminatore)
+    """
+    f.seek(0, os.SEEK_END)
+    fine = f.tell()
+    resto = b''
+
+    while fine > 0:
+        inizio = max(0, fine - DIMENSIONE_BLOCCO)
+        f.seek(inizio)
+        blocco = f.read(fine - inizio) + resto
+        righe = blocco.split(b'\n')
+        # La prima riga può essere incompleta: viene completata con il blocco precedente
+        resto = righe[0]
+        offset = inizio + len(resto) + 1
+        posizioni = []
+        for riga in righe[1:]:
+            posizioni.append((offset, riga))
+            offset += len(riga) + 1
+        for posizione in reversed(posizioni):
+            if posizione[1]:
+                yield posizione
+        fine = inizio
+
+    if resto:
+        yield 0, resto
+
+
+def _chiave_riga(riga: bytes) -> tuple:
+    """
+    Estrae la chiave di ordinamento (Data, Odo) da una riga del Log unificato.
+
+    Args:
+        riga: Riga CSV in byte
+
+    Returns:
+        Tupla (data nel formato 'YYYY-MM-DD HH:MM', chilometraggio); i
+        chilometraggi mancanti valgono infinito, come NaN in fondo a sort_values
+    """
+    campi = next(csv.reader([riga.decode('utf-8')]))
+    odo = campi[INDICE_ODO]
+    return campi[INDICE_DATA], float(odo) if odo else ODO_MANCANTE
+
+
+def _parti_riga(riga: str) -> tuple:
+    """
+    Divide una riga del Log unificato attorno a UniqueId, senza riscriverne i campi.
+
+    Args:
+        riga: Riga CSV (eventuale terminatore escluso dalle parti)
+
+    Returns:
+        Tupla (testo prima di UniqueId, testo dopo UniqueId)
+
+    Raises:
+        ValueError: Se la riga non ha le colonne del Log
+    """
+    record = RECORD.match(riga)
+    if record is None or record.end() != len(riga):
+        raise ValueError(f"Riga del Log unificato non leggibile: {riga[:80]!r}")
+    return record['prima'], record['dopo']
+
+
+def _chiave_data(date: pd.Series) -> pd.Series:
+    """
+    Normalizza le date nel formato del Log unificato, per il confronto come stringhe.
+
+    Args:
+        date: Serie di date
+
+    Returns:
+        Serie di stringhe 'YYYY-MM-DD HH:MM'
+    """
+    return pd.to_datetime(date, format=FORMATO_DATA_ORA).dt.strftime(FORMATO_DATA_ORA)
+
+
+def trova_nuovi_rifornimenti(df_fuelio: pd.DataFrame, file_unificato: str,
+                             stato: dict | None) -> pd.DataFrame:
+    """
+    Individua i rifornimenti di Log.csv non ancora presenti nel Log unificato.
+
+    Con lo stato vengono considerati nuovi i record con UniqueId maggiore del
+    massimo già unito (compresi quelli inseriti in Fuelio con data passata).
+    Senza stato, vengono considerati nuovi i record successivi all'ultima riga
+    del Log unificato (per Data, poi per Odo).
+
+    Args:
+        df_fuelio: Log di Fuelio
+        file_unificato: Percorso del Log unificato
+        stato: Stato letto con leggi_stato (o None)
+
+    Returns:
+        DataFrame con i soli rifornimenti nuovi
+    """
+    if stato is not None:
+        return df_fuelio[df_fuelio['UniqueId'] > stato['max_uniqueid_fuelio']]
+
+    with open(file_unificato, 'rb') as f:
+        ultima = next(_righe_a_ritroso(f), None)
+
+    if ultima is None or ultima[0] == 0:
+        # Solo intestazione: tutti i record sono nuovi
+        return df_fuelio
+
+    campi = next(csv.reader([ultima[1].decode('utf-8')]))
+    ultima_data = campi[COLONNE_LOG.index('Data')]
+    ultimo_odo = float(campi[COLONNE_LOG.index('Odo (km)')])
+
+    date = _chiave_data(df_fuelio['Data'])
+    nuovi = (date > ultima_data) | ((date == ultima_data) & (df_fuelio['Odo (km)'] > ultimo_odo))
+    return df_fuelio[nuovi]
+
+
+def unisci_incrementale(file_log: str = "Log.csv", file_unificato: str = "Log_unificato.csv",
+                        df_conversione: pd.DataFrame = None) -> int | None:
+    """
+    Aggiunge al Log unificato solo i nuovi rifornimenti di Log.csv.
+
+    Il file viene troncato al primo punto in cui cade un nuovo record (in
+    ordine di data) e solo la parte successiva viene riscritta, con UniqueId
+    rinumerati a partire da quel punto. Se il file è segnato come testo
+    originale di Fuelio, i nuovi record vengono copiati da Log.csv così come
+    sono e df_conversione non viene applicata.
+
+    Args:
+        file_log: Percorso del Log di Fuelio
+        file_unificato: Percorso del Log unificato esistente
+        df_conversione: Tabella di conversione distributori (opzionale)
+
+    Returns:
+        Numero di record aggiunti, oppure None se il Log unificato non esiste
+        (serve una ricostruzione completa)
+    """
+    file_unificato = Path(file_unificato)
+    if not file_unificato.exists():
+        return None
+
+    print(f"\nUnione incrementale in {file_unificato}...")
+
+    stato = leggi_stato(file_unificato)
+    if stato is None:
+        print("  ⚠ Stato dell'ultima unione non disponibile, confronto con l'ultima riga")
+
+    testo_originale = ha_testo_originale(file_unificato)
+    if testo_originale:
+        df_fuelio = carica_log_fuelio_testo(file_log)
+    else:
+        df_fuelio = carica_log_fuelio(file_log)
+    nuovi = trova_nuovi_rifornimenti(df_fuelio, file_unificato, stato)
+
+    if len(nuovi) == 0:
+        print("  → Nessun nuovo rifornimento da aggiungere")
+        return 0
+
+    print(f"  → Nuovi rifornimenti: {len(nuovi)}")
+
+    nuovi = nuovi.copy()
+    if df_conversione is not None and not testo_originale:
+        nuovi = applica_conversione_distributori(nuovi, df_conversione, is_storico=False)
+
+    # Stesso ordine dell'unione completa: per Data e, a parità di data, per Odo
+    nuovi['Data_temp'] = _chiave_data(nuovi['Data'])
+    nuovi = nuovi.sort_values(['Data_temp', 'Odo (km)'], kind='stable')
+    chiavi_nuove = list(zip(nuovi['Data_temp'], nuovi['Odo (km)'].fillna(ODO_MANCANTE)))
+    prima_chiave = chiavi_nuove[0]
+
+    # Righe nuove divise attorno a UniqueId (assegnato dopo)
+    if testo_originale:
+        parti_nuove = zip(nuovi[TESTO_PRIMA], nuovi[TESTO_DOPO])
+    else:
+        parti_nuove = zip(righe_csv_fuelio(nuovi[COLONNE_LOG[:INDICE_UNIQUEID]], FORMATI_LOG),
+                          righe_csv_fuelio(nuovi[COLONNE_LOG[INDICE_UNIQUEID + 1:]], FORMATI_LOG))
+    righe_nuove = list(zip(chiavi_nuove, parti_nuove))
+
+    with open(file_unificato, 'r+b') as f:
+        # Cerca a ritroso l'ultima riga con chiave <= prima chiave nuova: tutto ciò che segue è la coda
+        coda = []
+        punto_taglio = None
+        ultimo_uniqueid = 0
+        for offset, riga in _righe_a_ritroso(f):
+            if offset == 0:
+                # Intestazione
+                punto_taglio = len(riga) + 1
+                break
+            chiave = _chiave_riga(riga)
+            if chiave <= prima_chiave:
+                punto_taglio = offset + len(riga) + 1
+                campi = next(csv.reader([riga.decode('utf-8')]))
+                ultimo_uniqueid = int(campi[INDICE_UNIQUEID])
+                break
+            coda.append((chiave, _parti_riga(riga.decode('utf-8'))))
+        coda.reverse()
+
+        # Merge ordinato della coda esistente con i nuovi record (a parità di chiave, prima gli esistenti)
+        unite = []
+        i = j = 0
+        while i < len(coda) or j < len(righe_nuove):
+            if j == len(righe_nuove) or (i < len(coda) and coda[i][0] <= righe_nuove[j][0]):
+                unite.append(coda[i][1])
+                i += 1
+            else:
+                unite.append(righe_nuove[j][1])
+                j += 1
+
+        # Rinumera UniqueId e riscrive la coda (come unione_testuale.salva_log_unificato_testo)
+        testo = ''.join(f'{prima},"{numero}",{dopo}{os.linesep}'
+                        for numero, (prima, dopo) in enumerate(unite, start=ultimo_uniqueid + 1))
+
+        f.seek(punto_taglio)
+        f.truncate()
+        f.write(testo.encode('utf-8'))
+
+    righe_totali = ultimo_uniqueid + len(unite)
+    max_uniqueid = int(df_fuelio['UniqueId'].max())
+    if stato is not None:
+        max_uniqueid = max(max_uniqueid, stato['max_uniqueid_fuelio'])
+    salva_stato(file_unificato, max_uniqueid, righe_totali)
+    if testo_originale:
+        segna_testo_originale(file_unificato)
+
+    print(f"  → Righe riscritte: {len(unite)} (di cui {len(coda)} esistenti)")
+    print(f"  → Totale record: {righe_totali}")
+
+    return len(nuovi)
@@ -0,0 +1,199 @@
+"""
+Unione con il testo originale delle righe di Log.csv (--testo-originale).
+
+Nell'unione normale ogni valore di Log.csv viene letto con pandas e poi
+riscritto: oltre al costo, la riscrittura può cambiare la rappresentazione
+dei valori (kg arrotondati a 2 decimali, Weather vuoto scritto come "").
+Qui le righe di Fuelio vengono invece copiate così come sono: di ogni record
+vengono estratti solo i campi che servono per l'ordinamento e la
+rinumerazione (Data e UniqueId) e per il riconoscimento dei duplicati
+(Odo, kg e TankNumber), e nel testo viene riscritto solo UniqueId.
+
+Ogni riga è divisa in due parti attorno a UniqueId, come nei run di
+ordinamento_esterno.py; anche le righe dello storico vengono formattate una
+sola volta e unite nello stesso modo. Il terminatore di riga è quello degli
+altri file scritti dal progetto (os.linesep).
+
+I record Fuelio non passano dalla tabella di conversione distributori:
+City, coordinate e StationID restano quelli scritti dall'app.
+
+Il file scritto viene segnato con validazione_fuelio.segna_testo_originale:
+kg, Price e VolumePrice delle righe Fuelio hanno la precisione dell'app
+(es. 3 decimali) e la verifica non controlla il formato a 2 decimali.
+"""
+
+import io
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from consumi import riempi_consumi
+from ordinamento_esterno import COLONNE_FLOAT, INDICE_UNIQUEID
+from schemi_fuelio import FORMATO_DATA_ORA
+from scrittura_fuelio import righe_csv_fuelio
+from strumentazione import strumenta
+from unisci_log_storico import COLONNE_LOG, FORMATI_LOG, stampa_statistiche_finali
+from validazione_fuelio import segna_testo_originale
+
+
+# Campo CSV: tra virgolette (con "" per le virgolette interne, anche su più righe) o senza
+CAMPO = r'(?:"[^"]*+(?:""[^"]*+)*+"|[^,"\r\n]*+)'
+
+# Colonne estratte dal testo di ogni record (nome del gruppo nell'espressione regolare)
+COLONNE_ESTRATTE = {
+    'Data': 'data',
+    'Odo (km)': 'odo',
+    'kg': 'kg',
+    'TankNumber': 'serbatoio',
+    'UniqueId': 'uniqueid',
+}
+
+# Campo estratto (data o numero, senza virgolette interne): il gruppo esclude le virgolette
+CAMPO_ESTRATTO = r'"?+(?P<{}>[^,"\r\n]*+)"?+'
+
+# Record completo del Log: campi prima di UniqueId, UniqueId, campi successivi e terminatore
+RECORD = re.compile(
+    '(?P<prima>'
+    + ','.join(CAMPO_ESTRATTO.format(COLONNE_ESTRATTE[nome]) if nome in COLONNE_ESTRATTE else CAMPO
+               for nome in COLONNE_LOG[:INDICE_UNIQUEID])
+    + f'),(?P<campo_uniqueid>{CAMPO_ESTRATTO.format("uniqueid")}),'
+    + rf'(?P<dopo>{CAMPO}(?:,{CAMPO})*+)(?P<fine>\r\n|\n|\r|\Z)'
+)
+
+# Colonne con le due parti del testo di ogni riga
+TESTO_PRIMA = 'testo_prima'
+TESTO_DOPO = 'testo_dopo'
+
+
+@strumenta(file_letti=('file_log',))
+def carica_log_fuelio_testo(file_log: str = "Log.csv") -> pd.DataFrame:
+    """
+    Carica Log.csv tenendo il testo originale di ogni riga.
+
+    Args:
+        file_log: Percorso del file Log.csv
+
+    Returns:
+        DataFrame con Data (testo), Odo (km), kg, TankNumber, UniqueId e le due
+        parti del testo della riga prima e dopo UniqueId
+
+    Raises:
+        ValueError: Se le colonne non sono quelle del Log o un record non è leggibile
+    """
+    print(f"\nCaricamento dati da {file_log} (testo originale)...")
+
+    with open(file_log, 'r', encoding='utf-8', newline='') as f:
+        testo = f.read()
+
+    fine = re.search(r'\r\n|\n|\r', testo)
+    fine_intestazione, inizio = (fine.start(), fine.end()) if fine else (len(testo), len(testo))
+    intestazione = [nome.strip('"') for nome in testo[:fine_intestazione].split(',')]
+    if intestazione != COLONNE_LOG:
+        raise ValueError(f"{file_log} non ha le colonne del Log nell'ordine atteso, "
+                         "usare l'unione senza --testo-originale")
+
+    # findall scorre i record in C; i record non leggibili verrebbero saltati,
+    # quindi la lunghezza totale dei record trovati deve coprire tutto il testo
+    record = RECORD.findall(testo, inizio)
+    colonne = dict(zip(RECORD.groupindex, zip(*record) if record else [()] * RECORD.groups))
+    letti = sum(sum(map(len, colonne[nome])) for nome in ('prima', 'campo_uniqueid', 'dopo', 'fine'))
+    if inizio + letti + 2 * len(record) != len(testo):
+        raise ValueError(f"{file_log}: record non leggibili, usare l'unione senza --testo-originale")
+
+    # I campi estratti vengono convertiti con il parser C di read_csv, come nell'unione normale
+    chiavi = '\n'.join(map(','.join, zip(*(colonne[gruppo] for gruppo in COLONNE_ESTRATTE.values()))))
+    df = pd.read_csv(io.StringIO(chiavi), names=list(COLONNE_ESTRATTE))
+    df[TESTO_PRIMA] = pd.Series(colonne['prima'], dtype=object)
+    df[TESTO_DOPO] = pd.Series(colonne['dopo'], dtype=object)
+
+    print(f"  → Caricati {len(df)} record da Fuelio")
+
+    return df
+
+
+def _testo_storico(df_storico: pd.DataFrame) -> pd.DataFrame:
+    """
+    Formatta i record storici come le righe del Log unificato, divise attorno a UniqueId.
+
+    Args:
+        df_storico: Dati storici convertiti nel formato Log
+
+    Returns:
+        DataFrame con Data, Odo (km) e le due parti del testo della riga
+    """
+    df = df_storico.copy()
+    # Nell'unione normale pd.concat con i dati Fuelio porta queste colonne a float64
+    for col in COLONNE_FLOAT:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype('float64')
+
+    return pd.DataFrame({
+        'Data': df['Data'].to_numpy(),
+        'Odo (km)': df['Odo (km)'].to_numpy(dtype='float64'),
+        TESTO_PRIMA: righe_csv_fuelio(df[COLONNE_LOG[:INDICE_UNIQUEID]], FORMATI_LOG),
+        TESTO_DOPO: righe_csv_fuelio(df[COLONNE_LOG[INDICE_UNIQUEID + 1:]], FORMATI_LOG),
+    })
+
+
+@strumenta
+def unisci_e_ordina_testo(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unisce i dati storici con le righe originali di Fuelio e ordina per data.
+
+    L'ordine è quello di unisci_e_ordina (ordinamento stabile per Data e Odo,
+    prima lo storico).
+
+    Args:
+        df_storico: DataFrame con i dati storici convertiti
+        df_fuelio: Righe di Fuelio lette con carica_log_fuelio_testo
+
+    Returns:
+        DataFrame ordinato con Data, Odo (km), UniqueId e le due parti del testo della riga
+    """
+    print("\nUnione e ordinamento dati (testo originale di Fuelio)...")
+
+    # Calcola il consumo dei dati storici (precedono sempre quelli di Fuelio)
+    df_storico = riempi_consumi(df_storico)
+
+    colonne = ['Data', 'Odo (km)', TESTO_PRIMA, TESTO_DOPO]
+    df_unito = pd.concat([_testo_storico(df_storico), df_fuelio[colonne]], ignore_index=True)
+
+    df_unito['Data_temp'] = pd.to_datetime(df_unito['Data'], format=FORMATO_DATA_ORA)
+    df_unito = df_unito.sort_values(['Data_temp', 'Odo (km)'], kind='stable')
+    df_unito = df_unito.drop('Data_temp', axis=1).reset_index(drop=True)
+    df_unito['UniqueId'] = range(1, len(df_unito) + 1)
+
+    print(f"  → Totale record: {len(df_unito)}")
+    print(f"  → Record storici: {len(df_storico)}")
+    print(f"  → Record Fuelio: {len(df_fuelio)}")
+
+    return df_unito
+
+
+@strumenta(file_scritti=('file_output',))
+def salva_log_unificato_testo(df: pd.DataFrame, file_output: str = "Log_unificato.csv"):
+    """
+    Salva il Log unificato scrivendo le righe con il solo UniqueId riscritto.
+
+    Il file viene segnato come contenente il testo originale di Fuelio.
+
+    Args:
+        df: DataFrame restituito da unisci_e_ordina_testo
+        file_output: Nome del file di output
+    """
+    print(f"\nSalvataggio su {file_output}...")
+
+    with open(file_output, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(f'"{nome}"' for nome in COLONNE_LOG) + os.linesep)
+        f.writelines(
+            f'{prima},"{uniqueid}",{dopo}{os.linesep}'
+            for prima, uniqueid, dopo in zip(df[TESTO_PRIMA], df['UniqueId'].tolist(), df[TESTO_DOPO])
+        )
+    segna_testo_originale(file_output)
+
+    print(f"  → File salvato con successo!")
+    print(f"  → Percorso completo: {Path(file_output).absolute()}")
+
+    stampa_statistiche_finali(df)
@@ -7,11 +7,24 @@ al file Log.csv di Fuelio, ricostruendo la colonna UniqueId in ordine cronologic
 
 import pandas as pd
 import numpy as np
-import csv
+import argparse
+import io
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from cache_fasi import con_cache
+from consumi import riempi_consumi
+from deduplicazione import POLITICA_PREDEFINITA, POLITICHE, rimuovi_duplicati
+from lettura_excel import TIPI_CONVERSIONE, TIPI_STORICO, leggi_foglio_excel
+from ricerca_distributori import SOGLIA_PREDEFINITA, indice_distributori, migliori_distributori
+from ricerca_geografica import RAGGIO_PREDEFINITO_KM, assegna_stazioni, carica_stazioni
+from schemi_fuelio import FORMATO_DATA_ORA, leggi_tabella_fuelio
+from scrittura_fuelio import scrivi_csv_fuelio
+import strumentazione
+from strumentazione import strumenta
 
+
+@strumenta(file_letti=('file_excel',))
 def carica_dati_excel(file_excel: str = "Contabilita_consumi_Punto.xlsx") -> pd.DataFrame:
     """
     Carica i dati storici dal file Excel.
@@ -25,7 +38,7 @@ def carica_dati_excel(file_excel: str = "Contabilita_consumi_Punto.xlsx") -> pd.
     print(f"Caricamento dati da {file_excel}...")
     
     # Legge il file Excel con header alla riga 2 (indice 2, quindi terza riga)
-    df = pd.read_excel(file_excel, header=[2])
+    df = leggi_foglio_excel(file_excel, header=2, dtype=TIPI_STORICO)
     
     print(f"  → Caricati {len(df)} record storici")
     print(f"  → Colonne: {df.columns.tolist()}")
@@ -33,6 +46,7 @@ def carica_dati_excel(file_excel: str = "Contabilita_consumi_Punto.xlsx") -> pd.
     return df
 
 
+@strumenta(file_letti=('file_conversione',))
 def carica_tabella_conversione(file_conversione: str = "Tabella_Conversione_Distro.xlsx") -> pd.DataFrame:
     """
     Carica la tabella di conversione distributori.
@@ -45,7 +59,7 @@ def carica_tabella_conversione(file_conversione: str = "Tabella_Conversione_Dist
     """
     print(f"\nCaricamento tabella conversione da {file_conversione}...")
     
-    df = pd.read_excel(file_conversione)
+    df = leggi_foglio_excel(file_conversione, dtype=TIPI_CONVERSIONE)
     
     print(f"  → Caricati {len(df)} distributori")
     print(f"  → Colonne: {df.columns.tolist()}")
@@ -53,6 +67,7 @@ def carica_tabella_conversione(file_conversione: str = "Tabella_Conversione_Dist
     return df
 
 
+@strumenta(file_letti=('file_log',))
 def carica_log_fuelio(file_log: str = "Log.csv") -> pd.DataFrame:
     """
     Carica il file Log.csv di Fuelio.
@@ -65,13 +80,14 @@ def carica_log_fuelio(file_log: str = "Log.csv") -> pd.DataFrame:
     """
     print(f"\nCaricamento dati da {file_log}...")
     
-    df = pd.read_csv(file_log)
+    df = leggi_tabella_fuelio(file_log, 'Log', uso='unione')
     
     print(f"  → Caricati {len(df)} record da Fuelio")
     
     return df
 
 
+@strumenta
 def converti_dati_excel(df_excel: pd.DataFrame, df_conversione: pd.DataFrame = None) -> pd.DataFrame:
     """
     Converte i dati dal formato Excel al formato Log di Fuelio.
@@ -104,14 +120,13 @@ def converti_dati_excel(df_excel: pd.DataFrame, df_conversione: pd.DataFrame = N
     df_convertito['ExcludeDistance'] = df_excel.get('A benzina', 0)
     df_convertito['ExcludeDistance'] = df_convertito['ExcludeDistance'].fillna(0)
     
-    # Gestione Full: 1 se Serbatoio==1 (metano), 0 altrimenti
-    df_convertito['Full'] = (df_excel['Serbatoio'] == 1).astype(int)
+    # Gestione Full: 1 se Serbatoio==1 (metano), 0 altrimenti (anche se il serbatoio manca)
+    metano = df_excel['Serbatoio'].eq(1).fillna(False).to_numpy(dtype=bool)
+    df_convertito['Full'] = metano.astype(int)
     
     # Gestione FuelType in base al serbatoio
     # Serbatoio 1 = Metano (FuelType 501), Serbatoio 2 = GPL/Benzina (FuelType 110)
-    df_convertito['FuelType'] = df_excel['Serbatoio'].apply(
-        lambda x: 501 if x == 1 else 110
-    )
+    df_convertito['FuelType'] = np.where(metano, 501, 110)
     
     # Colonne senza informazioni dai dati storici (verranno popolate dopo se c'è la tabella conversione)
     df_convertito['km/l (optional)'] = ''
@@ -136,8 +151,9 @@ def converti_dati_excel(df_excel: pd.DataFrame, df_conversione: pd.DataFrame = N
     return df_convertito
 
 
+@strumenta
 def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFrame, 
-                                      is_storico: bool = False) -> pd.DataFrame:
+                                      is_storico: bool = False, soglia_fuzzy: float = None) -> pd.DataFrame:
     """
     Applica la conversione dei distributori usando la tabella di conversione.
     
@@ -145,6 +161,9 @@ def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFr
         df: DataFrame da processare
         df_conversione: DataFrame con la tabella di conversione
         is_storico: True se sono dati storici (usa colonna Distro), False se sono dati Fuelio (usa StationID)
+        soglia_fuzzy: Solo per i dati storici: se indicata, i Distro senza corrispondenza
+            esatta vengono cercati per somiglianza (vedi ricerca_distributori) e
+            associati al distributore più simile se la somiglianza è almeno questa
         
     Returns:
         DataFrame con i campi distributore popolati
@@ -155,7 +174,7 @@ def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFr
     
     print(f"\nApplicazione conversione distributori ({'dati storici' if is_storico else 'dati Fuelio'})...")
     
-    # Prepara il dizionario di conversione
+    # Prepara la tabella di conversione
     if is_storico:
         # Per dati storici: usa la colonna 'Conversione' come chiave
         if 'Conversione' not in df_conversione.columns:
@@ -174,7 +193,6 @@ def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFr
             print(f"  ⚠ Trovati {duplicati_prima} duplicati in 'Conversione', uso solo il primo match")
             df_conv_clean = df_conv_clean.drop_duplicates(subset=['Conversione'], keep='first')
         
-        conversione_dict = df_conv_clean.set_index('Conversione').to_dict('index')
         chiave_match = 'Distro_temp'
     else:
         # Per dati Fuelio: usa 'StationID' come chiave
@@ -194,48 +212,60 @@ def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFr
             print(f"  ⚠ Trovati {duplicati_prima} duplicati in 'StationID', uso solo il primo match")
             df_conv_clean = df_conv_clean.drop_duplicates(subset=['StationID'], keep='first')
         
-        conversione_dict = df_conv_clean.set_index('StationID').to_dict('index')
         chiave_match = 'StationID (optional)'
     
-    # Conta i match trovati
-    match_trovati = 0
-    
-    # Applica la conversione riga per riga
-    for idx, row in df.iterrows():
-        chiave = row.get(chiave_match)
-        
-        if pd.isna(chiave) or chiave == 0 or chiave == '':
+    # Associa ogni riga alla posizione del distributore nella tabella (join vettoriale)
+    chiave_tabella = 'Conversione' if is_storico else 'StationID'
+    indice_tabella = pd.Index(df_conv_clean[chiave_tabella])
+    chiavi = df[chiave_match] if chiave_match in df.columns else pd.Series(np.nan, index=df.index)
+    
+    # Le chiavi nulle, 0 o vuote non vengono cercate
+    valide = (chiavi.notna() & ~chiavi.isin([0, ''])).to_numpy()
+    posizioni = indice_tabella.get_indexer(chiavi)
+    
+    # Distro con errori di battitura o varianti del nome: ricerca per somiglianza
+    if is_storico and soglia_fuzzy is not None:
+        senza_match = np.flatnonzero(valide & (posizioni < 0))
+        if len(senza_match) > 0:
+            indice = indice_distributori(df_conv_clean)
+            righe_fuzzy, punteggi = migliori_distributori(chiavi.iloc[senza_match], indice, soglia_fuzzy)
+            trovati = righe_fuzzy >= 0
+            posizioni[senza_match[trovati]] = righe_fuzzy[trovati]
+            print(f"  → Match approssimati (somiglianza ≥ {soglia_fuzzy}): {trovati.sum()}/{len(senza_match)}")
+            associazioni = pd.DataFrame({
+                'Distro': chiavi.iloc[senza_match[trovati]].to_numpy(),
+                'Conversione': df_conv_clean['Conversione'].to_numpy()[righe_fuzzy[trovati]],
+                'punteggio': punteggi[trovati],
+            }).drop_duplicates('Distro')
+            for associazione in associazioni.itertuples():
+                print(f"     {associazione.Distro} → {associazione.Conversione} ({associazione.punteggio:.2f})")
+    
+    righe = np.flatnonzero(valide & (posizioni >= 0))
+    match_trovati = len(righe)
+    
+    info_distro = df_conv_clean.iloc[posizioni[righe]].reset_index(drop=True)
+    
+    # City: costruita come "NameBrand - Description", o solo uno dei due se l'altro manca
+    city = _componi_city(info_distro)
+    da_impostare = city.notna().to_numpy()
+    if da_impostare.any():
+        if pd.api.types.is_numeric_dtype(df['City (optional)']):
+            # Colonna letta come numerica perché completamente vuota
+            df['City (optional)'] = df['City (optional)'].astype(object)
+        df.iloc[righe[da_impostare], df.columns.get_loc('City (optional)')] = city[da_impostare].to_numpy()
+    
+    # Coordinate e StationID: copiati solo se presenti nella tabella
+    for col_tabella, col_log in [('Latitude', 'latitude (optional)'),
+                                 ('Longitude', 'longitude (optional)'),
+                                 ('StationID', 'StationID (optional)')]:
+        if col_tabella not in info_distro.columns:
             continue
-        
-        # Cerca nella tabella di conversione
-        if chiave in conversione_dict:
-            info_distro = conversione_dict[chiave]
-            match_trovati += 1
-            
-            # Popola i campi del distributore
-            
-            # City: costruita come "NameBrand - Description"
-            name_brand = info_distro.get('NameBrand', '')
-            description = info_distro.get('Description', '')
-            
-            if pd.notna(name_brand) and pd.notna(description) and name_brand and description:
-                city_value = f"{name_brand} - {description}"
-                df.at[idx, 'City (optional)'] = city_value
-            elif pd.notna(name_brand) and name_brand:
-                # Se c'è solo NameBrand
-                df.at[idx, 'City (optional)'] = name_brand
-            elif pd.notna(description) and description:
-                # Se c'è solo Description
-                df.at[idx, 'City (optional)'] = description
-            
-            if 'Latitude' in info_distro and pd.notna(info_distro['Latitude']):
-                df.at[idx, 'latitude (optional)'] = info_distro['Latitude']
-            
-            if 'Longitude' in info_distro and pd.notna(info_distro['Longitude']):
-                df.at[idx, 'longitude (optional)'] = info_distro['Longitude']
-            
-            if 'StationID' in info_distro and pd.notna(info_distro['StationID']):
-                df.at[idx, 'StationID (optional)'] = info_distro['StationID']
+        valori = info_distro[col_tabella]
+        da_impostare = valori.notna().to_numpy()
+        if da_impostare.any():
+            df.iloc[righe[da_impostare], df.columns.get_loc(col_log)] = (
+                valori[da_impostare].to_numpy(dtype='float64')
+            )
     
     print(f"  → Match trovati: {match_trovati}/{len(df)}")
     
@@ -246,10 +276,42 @@ def applica_conversione_distributori(df: pd.DataFrame, df_conversione: pd.DataFr
     return df
 
 
+def _componi_city(info_distro: pd.DataFrame) -> pd.Series:
+    """
+    Costruisce il valore di City per ogni distributore trovato.
+    
+    Args:
+        info_distro: Righe della tabella di conversione corrispondenti ai match
+        
+    Returns:
+        Serie con "NameBrand - Description", solo NameBrand o solo Description
+        (NaN se entrambi mancano)
+    """
+    vuota = pd.Series(np.nan, index=info_distro.index, dtype=object)
+    name_brand = info_distro['NameBrand'] if 'NameBrand' in info_distro.columns else vuota
+    description = info_distro['Description'] if 'Description' in info_distro.columns else vuota
+    
+    ha_name_brand = name_brand.notna() & ~name_brand.isin([''])
+    ha_description = description.notna() & ~description.isin([''])
+    
+    city = pd.Series(np.nan, index=info_distro.index, dtype=object)
+    city[ha_description] = description[ha_description]
+    city[ha_name_brand] = name_brand[ha_name_brand]
+    entrambi = ha_name_brand & ha_description
+    city[entrambi] = name_brand[entrambi].astype(str) + ' - ' + description[entrambi].astype(str)
+    
+    return city
+
+
+@strumenta
 def unisci_e_ordina(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame) -> pd.DataFrame:
     """
     Unisce i dati storici con quelli di Fuelio e ordina per data.
     
+    Il consumo (km/l) dei dati storici, che nel file Excel non c'è, viene
+    calcolato da pieno a pieno per ogni serbatoio (vedi consumi.py); quello
+    dei record Fuelio resta quello scritto dall'app.
+    
     Args:
         df_storico: DataFrame con i dati storici convertiti
         df_fuelio: DataFrame con i dati di Fuelio
@@ -259,14 +321,22 @@ def unisci_e_ordina(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame) -> pd.Dat
     """
     print("\nUnione e ordinamento dati...")
     
+    # Calcola il consumo dei dati storici (precedono sempre quelli di Fuelio)
+    df_storico = riempi_consumi(df_storico)
+    
     # Unisce i due DataFrame
     df_unito = pd.concat([df_storico, df_fuelio], ignore_index=True)
     
     # Converte la colonna Data in datetime per l'ordinamento
-    df_unito['Data_temp'] = pd.to_datetime(df_unito['Data'])
+    df_unito['Data_temp'] = pd.to_datetime(df_unito['Data'], format=FORMATO_DATA_ORA)
     
-    # Ordina per data (dal più vecchio al più recente)
-    df_unito = df_unito.sort_values('Data_temp')
+    # Ordina per data (dal più vecchio al più recente) e, a parità di data, per
+    # chilometraggio: i rifornimenti dello stesso giorno dello storico (tutti alle
+    # 12:00) restano in ordine di Odo. L'ordinamento stabile mantiene l'ordine
+    # originale dei record con stessa data e stesso Odo, così il risultato è
+    # deterministico e coincide con quello delle unioni incrementale, su disco
+    # e con il testo originale.
+    df_unito = df_unito.sort_values(['Data_temp', 'Odo (km)'], kind='stable')
     
     # Ricostruisce UniqueId in ordine crescente
     df_unito['UniqueId'] = range(1, len(df_unito) + 1)
@@ -284,29 +354,40 @@ def unisci_e_ordina(df_storico: pd.DataFrame, df_fuelio: pd.DataFrame) -> pd.Dat
     return df_unito
 
 
-def salva_log_unificato(df: pd.DataFrame, file_output: str = "Log_unificato.csv"):
+# Ordine delle colonne del Log di Fuelio
+COLONNE_LOG = [
+    'Data', 'Odo (km)', 'kg', 'Full', 'Price (optional)', 
+    'km/l (optional)', 'latitude (optional)', 'longitude (optional)', 
+    'City (optional)', 'Notes (optional)', 'Missed', 'TankNumber', 
+    'FuelType', 'VolumePrice', 'StationID (optional)', 'ExcludeDistance', 
+    'UniqueId', 'TankCalc', 'Weather'
+]
+
+# Rapporto dei rifornimenti duplicati tra storico e Fuelio
+FILE_DUPLICATI = "Log_unificato.duplicati.csv"
+
+# Formati delle colonne del Log unificato in scrittura (vedi scrittura_fuelio):
+# kg, Price (optional) e VolumePrice a 2 decimali, StationID intero
+FORMATI_LOG = {
+    'kg': 'decimali2',
+    'Price (optional)': 'decimali2',
+    'VolumePrice': 'decimali2',
+    'StationID (optional)': 'intero',
+}
+
+
+def formatta_log_unificato(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Salva il Log unificato su file CSV.
+    Prepara il Log unificato per la scrittura nel formato Fuelio.
     
     Args:
         df: DataFrame con i dati unificati
-        file_output: Nome del file di output
+        
+    Returns:
+        DataFrame con le colonne riordinate e formattate
     """
-    print(f"\nSalvataggio su {file_output}...")
-    
     # Riordina le colonne per corrispondere al formato Log originale
-    colonne_log = [
-        'Data', 'Odo (km)', 'kg', 'Full', 'Price (optional)', 
-        'km/l (optional)', 'latitude (optional)', 'longitude (optional)', 
-        'City (optional)', 'Notes (optional)', 'Missed', 'TankNumber', 
-        'FuelType', 'VolumePrice', 'StationID (optional)', 'ExcludeDistance', 
-        'UniqueId', 'TankCalc', 'Weather'
-    ]
-    
-    df = df[colonne_log]
-    
-    # Formattazione colonne numeriche
-    print(f"  → Formattazione colonne numeriche...")
+    df = df[COLONNE_LOG].copy()
     
     # Arrotonda a 2 decimali: kg, Price (optional), VolumePrice
     colonne_2_decimali = ['kg', 'Price (optional)', 'VolumePrice']
@@ -319,14 +400,55 @@ def salva_log_unificato(df: pd.DataFrame, file_output: str = "Log_unificato.csv"
         # Usa Int64 (nullable integer) per mantenere i NaN
         df['StationID (optional)'] = df['StationID (optional)'].astype('Int64')
     
-    # Salva su CSV con tutte le virgolette (formato Fuelio)
+    return df
+
+
+@strumenta
+def log_unificato_csv(df: pd.DataFrame) -> str:
+    """
+    Restituisce il Log unificato come testo CSV nel formato Fuelio, senza scriverlo su disco.
+    
+    Args:
+        df: DataFrame con i dati unificati
+        
+    Returns:
+        Contenuto CSV (intestazione inclusa)
+    """
+    buffer = io.StringIO()
+    scrivi_csv_fuelio(df[COLONNE_LOG], buffer, formati=FORMATI_LOG)
+    return buffer.getvalue()
+
+
+@strumenta(file_scritti=('file_output',))
+def salva_log_unificato(df: pd.DataFrame, file_output: str = "Log_unificato.csv"):
+    """
+    Salva il Log unificato su file CSV.
+    
+    Args:
+        df: DataFrame con i dati unificati
+        file_output: Nome del file di output
+    """
+    print(f"\nSalvataggio su {file_output}...")
+    
+    # Salva su CSV con tutte le virgolette (formato Fuelio), formattando le colonne
+    # numeriche in scrittura (2 decimali, StationID intero)
     # Nota: i valori NaN (latitude, longitude, StationID nulli) vengono scritti come celle vuote nel CSV
-    df.to_csv(file_output, index=False, quoting=csv.QUOTE_ALL)
+    df = df[COLONNE_LOG]
+    scrivi_csv_fuelio(df, file_output, formati=FORMATI_LOG)
     
     print(f"  → File salvato con successo!")
     print(f"  → Percorso completo: {Path(file_output).absolute()}")
     
-    # Mostra statistiche finali
+    stampa_statistiche_finali(df)
+
+
+def stampa_statistiche_finali(df: pd.DataFrame):
+    """
+    Stampa il riepilogo del Log unificato salvato.
+    
+    Args:
+        df: DataFrame con almeno le colonne Data e Odo (km)
+    """
     print(f"\n{'='*60}")
     print("STATISTICHE FINALI")
     print(f"{'='*60}")
@@ -336,10 +458,48 @@ def salva_log_unificato(df: pd.DataFrame, file_output: str = "Log_unificato.csv"
     print(f"{'='*60}")
 
 
-def main():
+def main(argv: list = None):
     """
     Funzione principale dello script.
+    
+    I risultati delle fasi vengono salvati nella cache (.cache_fuelio) e riusati
+    quando gli input non cambiano; --no-cache forza il ricalcolo di tutto.
+    
+    Args:
+        argv: Argomenti da riga di comando (default: sys.argv)
     """
+    parser = argparse.ArgumentParser(description="Unisce i dati storici Excel con il Log di Fuelio")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ricalcola tutte le fasi senza usare la cache")
+    parser.add_argument('--incrementale', action='store_true',
+                        help="aggiunge solo i nuovi rifornimenti di Log.csv al Log unificato esistente")
+    parser.add_argument('--fuzzy', nargs='?', type=float, const=SOGLIA_PREDEFINITA, default=None,
+                        metavar='SOGLIA',
+                        help="associa i Distro storici senza corrispondenza esatta al distributore "
+                             f"più simile (somiglianza minima, default: {SOGLIA_PREDEFINITA})")
+    parser.add_argument('--geo', nargs='?', type=float, const=RAGGIO_PREDEFINITO_KM, default=None,
+                        metavar='RAGGIO_KM',
+                        help="assegna ai rifornimenti Fuelio senza StationID il distributore più vicino "
+                             f"(FavStations.csv e tabella di conversione) entro il raggio (default: {RAGGIO_PREDEFINITO_KM} km)")
+    parser.add_argument('--duplicati', choices=list(POLITICHE), default=POLITICA_PREDEFINITA,
+                        help="record da tenere se un rifornimento è sia nello storico sia in Fuelio "
+                             f"(default: {POLITICA_PREDEFINITA}); le coppie vengono salvate in "
+                             f"{FILE_DUPLICATI}")
+    parser.add_argument('--testo-originale', action='store_true',
+                        help="copia le righe di Log.csv senza rileggerne i valori (viene riscritto solo "
+                             "UniqueId); City, coordinate e StationID dei record Fuelio restano quelli dell'app")
+    parser.add_argument('--rapporto', default=None, metavar='FILE',
+                        help="misura tempi, memoria e righe di ogni fase e salva il rapporto (.json o .csv)")
+    parser.add_argument('--profila', default=None, metavar='FASE',
+                        help="profila con cProfile la fase indicata (es. unisci_e_ordina)")
+    args = parser.parse_args(argv)
+    usa_cache = not args.no_cache
+    if args.testo_originale and (args.incrementale or args.geo is not None):
+        parser.error("--testo-originale non si può usare con --incrementale o --geo")
+    
+    if args.rapporto or args.profila:
+        strumentazione.attiva_strumentazione(profila=args.profila)
+    
     print("="*60)
     print("UNIONE LOG STORICO CON LOG FUELIO")
     print("="*60)
@@ -347,33 +507,64 @@ def main():
     try:
         # 1. Carica la tabella di conversione distributori
         try:
-            df_conversione = carica_tabella_conversione()
+            df_conversione = con_cache(carica_tabella_conversione, usa_cache)()
         except FileNotFoundError:
             print("  ⚠ Tabella conversione non trovata, i campi distributore non verranno popolati")
             df_conversione = None
         
+        if args.incrementale:
+            # Import locale: unione_incrementale dipende da questo modulo
+            from unione_incrementale import unisci_incrementale
+            
+            if unisci_incrementale(df_conversione=df_conversione) is not None:
+                print("\n✅ Processo completato con successo!")
+                return
+            print("  ⚠ Log_unificato.csv non trovato, eseguo l'unione completa")
+        
         # 2. Carica i dati Excel
-        df_excel = carica_dati_excel()
+        df_excel = con_cache(carica_dati_excel, usa_cache)()
         
-        # 3. Carica il Log di Fuelio
-        df_fuelio = carica_log_fuelio()
+        # 3. Carica il Log di Fuelio (con --testo-originale solo i campi per ordinamento e duplicati)
+        if args.testo_originale:
+            # Import locale: unione_testuale dipende da questo modulo
+            from unione_testuale import carica_log_fuelio_testo, salva_log_unificato_testo, unisci_e_ordina_testo
+            df_fuelio = carica_log_fuelio_testo()
+        else:
+            df_fuelio = carica_log_fuelio()
         
         # 4. Converti i dati Excel nel formato Fuelio
-        df_storico = converti_dati_excel(df_excel, df_conversione)
+        df_storico = con_cache(converti_dati_excel, usa_cache)(df_excel, df_conversione)
         
         # 5. Applica conversione distributori ai dati storici
         if df_conversione is not None:
-            df_storico = applica_conversione_distributori(df_storico, df_conversione, is_storico=True)
+            df_storico = con_cache(applica_conversione_distributori, usa_cache)(
+                df_storico, df_conversione, is_storico=True, soglia_fuzzy=args.fuzzy
+            )
         
-        # 6. Applica conversione distributori ai dati Fuelio
-        if df_conversione is not None:
-            df_fuelio = applica_conversione_distributori(df_fuelio, df_conversione, is_storico=False)
+        # 6. Assegna il distributore più vicino ai rifornimenti Fuelio senza StationID
+        if args.geo is not None:
+            df_fuelio = assegna_stazioni(df_fuelio, carica_stazioni(df_conversione=df_conversione), args.geo)
+        
+        # 7. Applica conversione distributori ai dati Fuelio
+        if df_conversione is not None and not args.testo_originale:
+            df_fuelio = con_cache(applica_conversione_distributori, usa_cache)(
+                df_fuelio, df_conversione, is_storico=False
+            )
+        
+        # 8. Rimuovi i rifornimenti presenti sia nello storico sia in Fuelio
+        max_uniqueid_fuelio = df_fuelio['UniqueId'].max() if len(df_fuelio) else 0
+        df_storico, df_fuelio, _ = rimuovi_duplicati(df_storico, df_fuelio, args.duplicati, FILE_DUPLICATI)
         
-        # 7. Unisci e ordina i dati
-        df_unito = unisci_e_ordina(df_storico, df_fuelio)
+        # 9-10. Unisci e ordina i dati, salva il risultato e lo stato per le successive unioni incrementali
+        if args.testo_originale:
+            df_unito = unisci_e_ordina_testo(df_storico, df_fuelio)
+            salva_log_unificato_testo(df_unito)
+        else:
+            df_unito = con_cache(unisci_e_ordina, usa_cache)(df_storico, df_fuelio)
+            salva_log_unificato(df_unito)
         
-        # 8. Salva il risultato
-        salva_log_unificato(df_unito)
+        from unione_incrementale import salva_stato
+        salva_stato("Log_unificato.csv", max_uniqueid_fuelio, len(df_unito))
         
         print("\n✅ Processo completato con successo!")
         
@@ -384,6 +575,10 @@ def main():
         print(f"\n❌ ERRORE imprevisto: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if args.rapporto:
+            strumentazione.stampa_rapporto()
+            strumentazione.salva_rapporto(args.rapporto)
 
 
 if __name__ == "__main__":
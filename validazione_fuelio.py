@@ -0,0 +1,596 @@
+"""
+Validazione dei file di sincronizzazione di Fuelio con gli schemi delle tabelle.
+
+Legge il file una sola volta, a righe, e lo divide in blocchi di record
+per tabella (senza spezzare i campi tra virgolette su più righe). Ogni
+blocco viene controllato, anche in parallelo su un pool di processi:
+- numero di colonne di ogni riga uguale all'intestazione
+- intestazione uguale alle colonne dello schema (schemi_fuelio.SCHEMI)
+- formato dei valori secondo il tipo dello schema: interi, decimali e date
+  (schemi_fuelio.DATE); i file esportati da Fuelio rispettano questi formati
+- con formato_unione (--formato-unione) anche il formato più stretto con cui
+  unisci_log_storico scrive il Log: kg, Price e VolumePrice con al massimo
+  2 decimali, StationID intero senza .0
+
+Un Log unito con --testo-originale contiene le righe di Fuelio con i valori
+scritti dall'app (es. kg a 3 decimali): salva_log_unificato_testo lo segna con
+un file accanto ('Log_unificato.csv.testo_originale.json', vedi
+segna_testo_originale), riunisci_tabelle_fuelio riporta il segno sul file
+riassemblato e verifica_file_fuelio e test_formattazione non controllano il
+formato più stretto sui file segnati.
+Alla fine controlla ordine e presenza delle tabelle, gli identificativi
+duplicati e i riferimenti tra tabelle:
+- Costs.CostTypeID → CostCategories.CostTypeID
+- Pictures.target_id → Log.UniqueId (Type 1) o Costs.UniqueId (Type 2)
+
+Ogni errore riporta il numero di riga nel file.
+
+Il modulo usa solo la libreria standard (csv, re, liste): verifica_file_fuelio
+e `fuelio verify` non caricano pandas.
+"""
+
+import argparse
+import csv
+import functools
+import io
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from pool_processi import mappa_in_processi
+from schemi_fuelio import DATE, FORMATO_DATA, FORMATO_DATA_ORA, SCHEMI
+
+
+# Ordine delle tabelle nel file di sincronizzazione di Fuelio
+ORDINE_TABELLE = ['Vehicle', 'Log', 'CostCategories', 'Costs', 'FavStations', 'Pictures', 'Category']
+
+# Righe per blocco inviato ai processi
+RIGHE_BLOCCO = 200_000
+
+# Sotto questa dimensione (byte) il file viene validato senza pool di processi
+SOGLIA_PARALLELO = 16 * 1024 * 1024
+
+# Errori di esempio conservati per ogni (tabella, colonna, controllo) di un blocco
+MASSIMO_ESEMPI = 100
+
+COLONNE_ERRORI = ['riga', 'tabella', 'colonna', 'controllo', 'messaggio', 'valore']
+
+# Errore trovato (riga e colonna None per gli errori dell'intero file o della tabella)
+Errore = namedtuple('Errore', COLONNE_ERRORI)
+
+# Formati dei valori (espressioni regolari sul testo del campo, senza virgolette).
+# I quantificatori possessivi evitano il backtracking: su una colonna intera
+# (valori uniti da '\n') il controllo è molte volte più veloce.
+INTERO = r'-?+\d++'
+INTERO_FACOLTATIVO = r'(?:-?+\d++)?+'
+DECIMALE = r'(?:-?+\d++(?:\.\d++)?+(?:[eE][-+]?+\d++)?+)?+'
+DUE_DECIMALI = r'(?:-?+\d++(?:\.\d{1,2}+)?+)?+'
+FORMATI_DATA = {
+    FORMATO_DATA_ORA: r'\d{4}+-(?>0[1-9]|1[0-2])-(?>0[1-9]|[12]\d|3[01]) (?>[01]\d|2[0-3]):[0-5]\d',
+    FORMATO_DATA: r'\d{4}+-(?>0[1-9]|1[0-2])-(?>0[1-9]|[12]\d|3[01])',
+}
+FORMATI_TIPO = {
+    'int8': INTERO, 'int16': INTERO, 'int32': INTERO, 'int64': INTERO,
+    'Int16': INTERO_FACOLTATIVO, 'Int32': INTERO_FACOLTATIVO, 'Int64': INTERO_FACOLTATIVO,
+    'float32': DECIMALE, 'float64': DECIMALE,
+}
+
+# Colonne con un formato più stretto di quello del tipo (come le scrive unisci_log_storico),
+# controllate solo con formato_unione: Fuelio scrive ad esempio kg con 3 decimali
+FORMATI_SPECIALI = {
+    ('Log', 'kg'): DUE_DECIMALI,
+    ('Log', 'Price (optional)'): DUE_DECIMALI,
+    ('Log', 'VolumePrice'): DUE_DECIMALI,
+    ('Log', 'StationID (optional)'): INTERO_FACOLTATIVO,
+}
+
+# Identificativi che non possono ripetersi in una tabella
+UNIVOCHE = [('Log', 'UniqueId'), ('Costs', 'UniqueId'), ('CostCategories', 'CostTypeID')]
+
+# Riferimenti tra tabelle: (tabella, colonna, filtro (colonna, valore) o None, tabella riferita, colonna riferita)
+RIFERIMENTI = [
+    ('Costs', 'CostTypeID', None, 'CostCategories', 'CostTypeID'),
+    ('Pictures', 'target_id', ('Type', 1), 'Log', 'UniqueId'),
+    ('Pictures', 'target_id', ('Type', 2), 'Costs', 'UniqueId'),
+]
+
+
+def _formati() -> dict:
+    """
+    Costruisce il formato atteso di ogni colonna dagli schemi.
+
+    Returns:
+        Dizionario {(tabella, colonna): espressione regolare}
+    """
+    formati = {}
+    for tabella, schema in SCHEMI.items():
+        for colonna, tipo in schema.items():
+            if tipo in FORMATI_TIPO:
+                formati[(tabella, colonna)] = FORMATI_TIPO[tipo]
+        for colonna, formato in DATE.get(tabella, {}).items():
+            formati[(tabella, colonna)] = FORMATI_DATA[formato]
+    return formati
+
+
+# Formati dei tipi dello schema e, in più, quelli dei file scritti da unisci_log_storico
+FORMATI = _formati()
+FORMATI_UNIONE = {**FORMATI, **FORMATI_SPECIALI}
+
+# Colonne di cui servono i valori numerici per duplicati e riferimenti
+COLONNE_CHIAVE = {}
+for _tabella, _colonna in UNIVOCHE:
+    COLONNE_CHIAVE.setdefault(_tabella, set()).add(_colonna)
+for _tabella, _colonna, _filtro, _tabella_rif, _colonna_rif in RIFERIMENTI:
+    COLONNE_CHIAVE.setdefault(_tabella, set()).add(_colonna)
+    COLONNE_CHIAVE.setdefault(_tabella_rif, set()).add(_colonna_rif)
+    if _filtro:
+        COLONNE_CHIAVE[_tabella].add(_filtro[0])
+
+
+@functools.lru_cache(maxsize=None)
+def _compila(formato: str) -> tuple:
+    """
+    Compila un formato per un singolo valore e per una colonna intera.
+
+    La seconda espressione controlla in una sola chiamata tutti i valori
+    di una colonna uniti da '\\n'; solo se fallisce si cercano i valori errati.
+
+    Returns:
+        Tupla (regex del valore, regex della colonna)
+    """
+    return re.compile(formato), re.compile(f'(?:{formato})(?:\\n(?:{formato}))*+')
+
+
+def file_testo_originale(file_csv) -> Path:
+    """
+    Restituisce il percorso del segno di testo originale associato a un CSV.
+
+    Args:
+        file_csv: Percorso del Log unificato o del file riassemblato
+
+    Returns:
+        Percorso del segno
+    """
+    file_csv = Path(file_csv)
+    return file_csv.with_name(file_csv.name + '.testo_originale.json')
+
+
+def segna_testo_originale(file_csv, attivo: bool = True):
+    """
+    Segna (o smette di segnare) un CSV come contenente le righe originali di Fuelio.
+
+    Il segno registra dimensione e data di modifica del file, come lo stato
+    di unione_incrementale: se il file viene riscritto da un altro script il
+    segno non vale più.
+
+    Args:
+        file_csv: Percorso del file appena scritto
+        attivo: Se False rimuove il segno
+    """
+    segno = file_testo_originale(file_csv)
+    if not attivo:
+        segno.unlink(missing_ok=True)
+        return
+    stat = Path(file_csv).stat()
+    with open(segno, 'w', encoding='utf-8') as f:
+        json.dump({'dimensione': stat.st_size, 'mtime_ns': stat.st_mtime_ns}, f, indent=2)
+
+
+def ha_testo_originale(file_csv) -> bool:
+    """
+    Indica se un CSV contiene le righe originali di Fuelio (unione con --testo-originale).
+
+    Args:
+        file_csv: Percorso del Log unificato o del file riassemblato
+
+    Returns:
+        True se il segno esiste e corrisponde al file
+    """
+    try:
+        with open(file_testo_originale(file_csv), 'r', encoding='utf-8') as f:
+            segno = json.load(f)
+        stat = Path(file_csv).stat()
+    except (OSError, ValueError):
+        return False
+    return segno.get('dimensione') == stat.st_size and segno.get('mtime_ns') == stat.st_mtime_ns
+
+
+def _errore(riga, tabella, colonna, controllo, messaggio, valore=None) -> Errore:
+    """
+    Crea un errore (tupla con i campi di COLONNE_ERRORI).
+    """
+    return Errore(riga, tabella, colonna, controllo, messaggio, valore)
+
+
+def _numero(testo: str):
+    """
+    Converte il testo di un campo in numero.
+
+    Returns:
+        float, o None se il campo è vuoto o non numerico
+    """
+    try:
+        valore = float(testo)
+    except ValueError:
+        return None
+    return valore if valore == valore else None
+
+
+def _valida_blocco(tabella: str, intestazione: list, dati: bytes, prima_riga: int,
+                   formati: dict = FORMATI) -> dict:
+    """
+    Valida un blocco di record di una tabella.
+
+    Args:
+        tabella: Nome della tabella
+        intestazione: Colonne della tabella
+        dati: Righe del blocco (byte del file, con i fine riga)
+        prima_riga: Numero di riga nel file della prima riga del blocco
+        formati: Formati delle colonne (FORMATI o FORMATI_UNIONE)
+
+    Returns:
+        Dizionario con 'tabella', 'record', 'errori' (esempi), 'conteggi'
+        {(colonna, controllo): numero} e 'chiavi' {colonna: (righe, valori)}
+        (valori float, None se mancanti)
+    """
+    errori = []
+    conteggi = {}
+
+    def segnala(righe, colonna, controllo, messaggio, valori):
+        conteggi[(colonna, controllo)] = conteggi.get((colonna, controllo), 0) + len(righe)
+        for riga, valore in list(zip(righe, valori))[:MASSIMO_ESEMPI]:
+            errori.append(_errore(riga, tabella, colonna, controllo, messaggio, valore))
+
+    try:
+        testo = dati.decode('utf-8')
+    except UnicodeDecodeError as e:
+        segnala([prima_riga + dati.count(b'\n', 0, e.start)], None, 'codifica', "testo non UTF-8", [None])
+        testo = dati.decode('utf-8', errors='replace')
+
+    lettore = csv.reader(io.StringIO(testo))
+    righe = list(lettore)
+    if lettore.line_num == len(righe):
+        numeri = list(range(prima_riga, prima_riga + len(righe)))
+    else:
+        # Campi su più righe: ricava il numero di riga di inizio di ogni record
+        lettore = csv.reader(io.StringIO(testo))
+        numeri, righe, riga_corrente = [], [], prima_riga
+        for record in lettore:
+            numeri.append(riga_corrente)
+            righe.append(record)
+            riga_corrente = prima_riga + lettore.line_num
+
+    attese = len(intestazione)
+    # Le righe vuote non sono record
+    errate = [(numero, len(r)) for numero, r in zip(numeri, righe) if r and len(r) != attese]
+    if errate:
+        segnala([numero for numero, _ in errate], None, 'colonne', f"numero di colonne diverso da {attese}",
+                [f"{n} colonne" for _, n in errate])
+    if any(len(r) != attese for r in righe):
+        numeri = [numero for numero, r in zip(numeri, righe) if len(r) == attese]
+        righe = [r for r in righe if len(r) == attese]
+    record = len(righe) + len(errate)
+
+    colonne = dict(zip(intestazione, zip(*righe))) if righe else {}
+    for colonna, valori in colonne.items():
+        formato = formati.get((tabella, colonna))
+        if formato is None:
+            continue
+        regex_valore, regex_colonna = _compila(formato)
+        unite = '\n'.join(valori)
+        if unite.count('\n') == len(valori) - 1 and regex_colonna.fullmatch(unite):
+            continue
+        posizioni = [i for i, v in enumerate(valori) if not regex_valore.fullmatch(v)]
+        segnala([numeri[i] for i in posizioni], colonna, 'formato', "valore non nel formato atteso",
+                [valori[i] for i in posizioni])
+
+    chiavi = {}
+    for colonna in COLONNE_CHIAVE.get(tabella, ()):
+        if colonna in colonne:
+            chiavi[colonna] = (numeri, [_numero(valore) for valore in colonne[colonna]])
+
+    return {'tabella': tabella, 'record': record, 'errori': errori, 'conteggi': conteggi, 'chiavi': chiavi}
+
+
+def _controlla_intestazione(tabella: str, intestazione: list, riga: int) -> list:
+    """
+    Confronta l'intestazione di una tabella con le colonne dello schema.
+
+    Returns:
+        Lista di errori (vuota se l'intestazione è corretta)
+    """
+    if tabella not in SCHEMI:
+        return [_errore(riga, tabella, None, 'tabella', "tabella sconosciuta", tabella)]
+    attese = list(SCHEMI[tabella])
+    if intestazione == attese:
+        return []
+    mancanti = [c for c in attese if c not in intestazione]
+    extra = [c for c in intestazione if c not in attese]
+    dettagli = []
+    if mancanti:
+        dettagli.append(f"mancanti: {', '.join(mancanti)}")
+    if extra:
+        dettagli.append(f"non previste: {', '.join(extra)}")
+    messaggio = "; ".join(dettagli) or "colonne in ordine diverso dallo schema"
+    return [_errore(riga, tabella, None, 'intestazione', messaggio, ','.join(intestazione))]
+
+
+def _blocchi(file_path: Path, righe_blocco: int, tabella_unica: str = None):
+    """
+    Legge il file una volta e produce i blocchi di record di ogni tabella.
+
+    Yields:
+        ('blocco', (tabella, intestazione, dati, prima_riga)) per i record,
+        ('tabella', (nome, riga del marker)) per ogni tabella trovata,
+        ('errore', errore) per gli errori di struttura
+    """
+    tabella, intestazione = tabella_unica, None
+    attende_intestazione = tabella_unica is not None
+    buffer, prima_riga = [], 0
+    tra_virgolette = False
+
+    if tabella_unica is not None:
+        yield 'tabella', (tabella_unica, 0)
+
+    with open(file_path, 'rb', buffering=1024 * 1024) as f:
+        for numero, riga in enumerate(f, start=1):
+            if not tra_virgolette and tabella_unica is None and riga.startswith(b'"##'):
+                if buffer:
+                    yield 'blocco', (tabella, intestazione, b''.join(buffer), prima_riga)
+                    buffer = []
+                tabella = riga.strip().strip(b'"')[2:].strip().decode('utf-8', errors='replace')
+                intestazione, attende_intestazione = None, True
+                yield 'tabella', (tabella, numero)
+                continue
+
+            if attende_intestazione and not tra_virgolette:
+                if not riga.strip():
+                    continue
+                intestazione = next(csv.reader([riga.decode('utf-8', errors='replace')]))
+                attende_intestazione = False
+                for errore in _controlla_intestazione(tabella, intestazione, numero):
+                    yield 'errore', errore
+                continue
+
+            if tabella is None:
+                if riga.strip():
+                    yield 'errore', _errore(numero, None, None, 'struttura', "riga fuori da una tabella")
+                continue
+
+            if not buffer:
+                prima_riga = numero
+            buffer.append(riga)
+            tra_virgolette ^= riga.count(b'"') & 1
+            if len(buffer) >= righe_blocco and not tra_virgolette:
+                yield 'blocco', (tabella, intestazione, b''.join(buffer), prima_riga)
+                buffer = []
+
+    if buffer:
+        yield 'blocco', (tabella, intestazione, b''.join(buffer), prima_riga)
+
+
+def _controlla_tabelle(trovate: list) -> list:
+    """
+    Controlla presenza, ordine e ripetizioni delle tabelle.
+
+    Args:
+        trovate: Lista di (nome tabella, riga del marker), nell'ordine del file
+
+    Returns:
+        Lista di errori
+    """
+    errori = []
+    nomi = [nome for nome, _ in trovate]
+    for tabella in ORDINE_TABELLE:
+        if tabella not in nomi:
+            errori.append(_errore(None, tabella, None, 'tabella', "tabella mancante"))
+
+    visti = set()
+    ultima = -1
+    for nome, riga in trovate:
+        if nome in visti:
+            errori.append(_errore(riga, nome, None, 'tabella', "tabella ripetuta"))
+        elif nome in ORDINE_TABELLE:
+            posizione = ORDINE_TABELLE.index(nome)
+            if posizione < ultima:
+                errori.append(_errore(riga, nome, None, 'tabella',
+                                      f"tabella fuori ordine (atteso: {', '.join(ORDINE_TABELLE)})"))
+            ultima = max(ultima, posizione)
+        visti.add(nome)
+    return errori
+
+
+def _controlla_chiavi(chiavi: dict) -> tuple:
+    """
+    Controlla identificativi duplicati e riferimenti tra tabelle.
+
+    Args:
+        chiavi: Dizionario {(tabella, colonna): (righe, valori)}, valori None se mancanti
+
+    Returns:
+        Tupla (lista di errori di esempio, dizionario dei conteggi)
+    """
+    errori, conteggi = [], {}
+
+    def segnala(righe, valori, tabella, colonna, controllo, messaggio):
+        conteggi[(tabella, colonna, controllo)] = conteggi.get((tabella, colonna, controllo), 0) + len(righe)
+        for riga, valore in list(zip(righe, valori))[:MASSIMO_ESEMPI]:
+            errori.append(_errore(riga, tabella, colonna, controllo, messaggio, f'{valore:g}'))
+
+    for tabella, colonna in UNIVOCHE:
+        if (tabella, colonna) not in chiavi:
+            continue
+        # Ogni ripetizione dopo la prima è un errore
+        visti, ripetuti = set(), []
+        for riga, valore in zip(*chiavi[(tabella, colonna)]):
+            if valore is None:
+                continue
+            if valore in visti:
+                ripetuti.append((riga, valore))
+            visti.add(valore)
+        if ripetuti:
+            segnala(*zip(*ripetuti), tabella, colonna, 'duplicato', "identificativo ripetuto")
+
+    for tabella, colonna, filtro, tabella_rif, colonna_rif in RIFERIMENTI:
+        if (tabella, colonna) not in chiavi or (tabella_rif, colonna_rif) not in chiavi:
+            continue
+        righe, valori = chiavi[(tabella, colonna)]
+        if filtro:
+            if (tabella, filtro[0]) not in chiavi:
+                continue
+            selezione = [valore == filtro[1] for valore in chiavi[(tabella, filtro[0])][1]]
+        else:
+            selezione = [True] * len(valori)
+        riferiti = set(chiavi[(tabella_rif, colonna_rif)][1])
+        mancanti = [(riga, valore) for riga, valore, scelto in zip(righe, valori, selezione)
+                    if scelto and valore is not None and valore not in riferiti]
+        if mancanti:
+            segnala(*zip(*mancanti), tabella, colonna, 'riferimento',
+                    f"valore non presente in {tabella_rif}.{colonna_rif}")
+
+    return errori, conteggi
+
+
+def valida_file_fuelio(file_path: str, processi: int = None, righe_blocco: int = RIGHE_BLOCCO,
+                       tabella: str = None, formato_unione: bool = False) -> dict:
+    """
+    Valida un file di sincronizzazione di Fuelio (o una singola tabella CSV).
+
+    Args:
+        file_path: File da validare
+        processi: Numero massimo di processi (default: numero di core; 1 = nessun pool)
+        righe_blocco: Righe per blocco validato da un processo
+        tabella: Se indicata, il file è un CSV della sola tabella (es. 'Log' per
+                 Log_unificato.csv) invece di un file con i marker "## Nome"
+        formato_unione: Se True controlla anche il formato con cui
+                 unisci_log_storico scrive kg, Price, VolumePrice e StationID
+                 (FORMATI_SPECIALI); i file esportati da Fuelio non lo rispettano
+
+    Returns:
+        Dizionario con:
+        - 'tabelle': {nome tabella: numero di record}, nell'ordine del file
+        - 'errori': lista di Errore (esempi, ordinati per riga; prima quelli senza riga)
+        - 'conteggi': {(tabella, colonna, controllo): numero di errori}
+        - 'valido': True se non ci sono errori
+    """
+    file_path = Path(file_path)
+    processi = processi or os.cpu_count() or 1
+    if file_path.stat().st_size <= SOGLIA_PARALLELO:
+        processi = 1
+
+    formati = FORMATI_UNIONE if formato_unione else FORMATI
+    trovate, errori = [], []
+
+    def da_validare():
+        for tipo, valore in _blocchi(file_path, righe_blocco, tabella):
+            if tipo == 'tabella':
+                trovate.append(valore)
+            elif tipo == 'errore':
+                errori.append(valore)
+            else:
+                yield (*valore, formati)
+
+    risultati = mappa_in_processi(_valida_blocco, da_validare(), processi)
+
+    conteggi = {}
+    record = {nome: 0 for nome, _ in trovate}
+    chiavi = {}
+    for risultato in risultati:
+        nome = risultato['tabella']
+        record[nome] += risultato['record']
+        errori.extend(risultato['errori'])
+        for (colonna, controllo), numero in risultato['conteggi'].items():
+            conteggi[(nome, colonna, controllo)] = conteggi.get((nome, colonna, controllo), 0) + numero
+        for colonna, (righe, valori) in risultato['chiavi'].items():
+            righe_chiave, valori_chiave = chiavi.setdefault((nome, colonna), ([], []))
+            righe_chiave.extend(righe)
+            valori_chiave.extend(valori)
+
+    errori_chiavi, conteggi_chiavi = _controlla_chiavi(chiavi)
+    errori.extend(errori_chiavi)
+    conteggi.update(conteggi_chiavi)
+
+    if tabella is None:
+        errori.extend(_controlla_tabelle(trovate))
+    for errore in errori:
+        if errore[3] in ('tabella', 'intestazione', 'struttura'):
+            chiave = (errore[1], errore[2], errore[3])
+            conteggi[chiave] = conteggi.get(chiave, 0) + 1
+
+    errori.sort(key=lambda errore: (errore.riga is not None, errore.riga or 0))
+
+    return {'tabelle': record, 'errori': errori, 'conteggi': conteggi, 'valido': not conteggi}
+
+
+def stampa_validazione(risultato: dict, massimo_errori: int = 20, mostra_tabelle: bool = True):
+    """
+    Stampa il riepilogo di una validazione.
+
+    Args:
+        risultato: Valore restituito da valida_file_fuelio
+        massimo_errori: Numero massimo di errori di esempio da mostrare
+        mostra_tabelle: Se True stampa anche i record di ogni tabella
+    """
+    if mostra_tabelle:
+        print("\nTabelle:")
+        for nome, record in risultato['tabelle'].items():
+            print(f"  - {nome}: {record:,} record")
+
+    if risultato['valido']:
+        print("\n✅ Nessun errore: tutte le righe rispettano gli schemi")
+        return
+
+    print(f"\n❌ Errori trovati: {sum(risultato['conteggi'].values()):,}")
+    for (tabella, colonna, controllo), numero in sorted(risultato['conteggi'].items(), key=str):
+        dove = f"{tabella}.{colonna}" if colonna else f"{tabella}"
+        print(f"  - {dove} ({controllo}): {numero:,}")
+
+    errori = risultato['errori']
+    print(f"\nPrimi {min(massimo_errori, len(errori))} errori:")
+    for errore in errori[:massimo_errori]:
+        riga = f"riga {errore.riga}" if errore.riga is not None else "file"
+        colonna = f" [{errore.colonna}]" if errore.colonna is not None else ""
+        valore = f": {errore.valore!r}" if errore.valore is not None else ""
+        print(f"  {riga} {errore.tabella}{colonna} {errore.messaggio}{valore}")
+
+
+def main(argv: list = None):
+    """
+    Valida un file di Fuelio da riga di comando.
+
+    Returns:
+        True se il file è valido
+    """
+    parser = argparse.ArgumentParser(description="Valida un file di sincronizzazione di Fuelio")
+    parser.add_argument('file', nargs='?', default='vehicle-1-sync-extended.csv',
+                        help="file da validare (default: vehicle-1-sync-extended.csv)")
+    parser.add_argument('--tabella', choices=list(SCHEMI), default=None,
+                        help="il file è un CSV di una sola tabella (es. --tabella Log per Log_unificato.csv)")
+    parser.add_argument('--formato-unione', action='store_true',
+                        help="controlla anche i 2 decimali di kg, Price e VolumePrice e StationID "
+                             "intero, come li scrive unisci_log_storico (non per i file di Fuelio)")
+    parser.add_argument('--processi', type=int, default=None,
+                        help="numero massimo di processi (default: numero di core)")
+    parser.add_argument('--errori', type=int, default=20,
+                        help="numero di errori di esempio da mostrare (default: 20)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("VALIDAZIONE FILE FUELIO")
+    print("=" * 60)
+    print(f"\nFile: {args.file}")
+
+    risultato = valida_file_fuelio(args.file, processi=args.processi, tabella=args.tabella,
+                                   formato_unione=args.formato_unione)
+    stampa_validazione(risultato, args.errori)
+
+    print("\n" + "=" * 60)
+    return risultato['valido']
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -1,21 +1,35 @@
 """
 Script per verificare la correttezza del file CSV riassemblato per Fuelio.
 
-Controlla:
+Controlla (con validazione_fuelio, in una sola lettura del file):
 - Presenza e ordine delle tabelle
-- Struttura del file
+- Struttura del file e intestazioni delle tabelle
+- Formato dei valori di ogni riga e riferimenti tra tabelle
 - Numero di record per tabella
 """
 
 from pathlib import Path
 
+from strumentazione import strumenta
+from validazione_fuelio import ORDINE_TABELLE, ha_testo_originale, stampa_validazione, valida_file_fuelio
 
-def verifica_file_fuelio(file_path: str = "vehicle-1-sync-extended.csv"):
+
+@strumenta(file_letti=('file_path',))
+def verifica_file_fuelio(file_path: str = "vehicle-1-sync-extended.csv", record_attesi: int = None,
+                         processi: int = None, formato_unione: bool = None):
     """
     Verifica la correttezza del file CSV per Fuelio.
     
     Args:
         file_path: Percorso del file da verificare
+        record_attesi: Numero di record atteso nella tabella Log (default: nessun controllo)
+        processi: Numero massimo di processi per la validazione (default: numero di core)
+        formato_unione: Se True controlla anche il formato con cui unisci_log_storico
+            scrive kg, Price, VolumePrice e StationID (vedi validazione_fuelio);
+            default: sì, tranne per i file uniti con --testo-originale
+    
+    Returns:
+        True se il file è corretto
     """
     print("=" * 60)
     print("VERIFICA FILE FUELIO")
@@ -30,73 +44,38 @@ def verifica_file_fuelio(file_path: str = "vehicle-1-sync-extended.csv"):
     print(f"\n✅ File trovato: {file_path.name}")
     print(f"   Dimensione: {file_path.stat().st_size:,} bytes")
     
-    # Legge il file
-    with open(file_path, 'r', encoding='utf-8') as f:
-        righe = f.readlines()
-    
-    print(f"   Righe totali: {len(righe):,}")
+    if formato_unione is None:
+        formato_unione = not ha_testo_originale(file_path)
+        if not formato_unione:
+            print("   Log unito con --testo-originale: kg, Price e VolumePrice di Fuelio "
+                  "non vengono controllati a 2 decimali")
     
-    # Tabelle attese nell'ordine corretto
-    tabelle_attese = [
-        'Vehicle',
-        'Log',
-        'CostCategories',
-        'Costs',
-        'FavStations',
-        'Pictures',
-        'Category'
-    ]
+    risultato = valida_file_fuelio(file_path, processi=processi, formato_unione=formato_unione)
+    record = risultato['tabelle']
+    tutto_ok = risultato['valido']
     
-    # Analizza la struttura del file
+    # Struttura del file
     print("\n" + "=" * 60)
     print("STRUTTURA FILE")
     print("=" * 60)
     
-    tabelle_trovate = []
-    tabella_corrente = None
-    righe_per_tabella = {}
-    
-    for i, riga in enumerate(righe):
-        riga_stripped = riga.strip()
-        
-        # Controlla se è un marker di tabella (formato: "## NomeTabella")
-        if riga_stripped.startswith('"##') and riga_stripped.endswith('"'):
-            # Salva il conteggio della tabella precedente
-            if tabella_corrente:
-                righe_per_tabella[tabella_corrente] = righe_per_tabella.get(tabella_corrente, 0)
-            
-            # Estrae il nome della tabella (rimuove "## e le virgolette)
-            nome_tabella = riga_stripped.replace('"## ', '').replace('"##', '').replace('"', '').strip()
-            tabelle_trovate.append(nome_tabella)
-            tabella_corrente = nome_tabella
-            righe_per_tabella[nome_tabella] = -1  # -1 perché escludiamo l'intestazione
-        
-        elif tabella_corrente and riga_stripped:
-            # Conta le righe di questa tabella
-            righe_per_tabella[tabella_corrente] = righe_per_tabella.get(tabella_corrente, -1) + 1
-    
-    # Verifica ordine e presenza delle tabelle
     print("\nTabelle trovate:")
-    
-    tutto_ok = True
-    for i, tabella_attesa in enumerate(tabelle_attese):
+    tabelle_trovate = list(record)
+    for i, tabella_attesa in enumerate(ORDINE_TABELLE):
         if i < len(tabelle_trovate):
             tabella_trovata = tabelle_trovate[i]
-            record = righe_per_tabella.get(tabella_trovata, 0)
-            
             if tabella_trovata == tabella_attesa:
-                print(f"  {i+1}. ✅ {tabella_trovata} ({record} record)")
+                print(f"  {i+1}. ✅ {tabella_trovata} ({record[tabella_trovata]} record)")
             else:
-                print(f"  {i+1}. ❌ Trovata '{tabella_trovata}' invece di '{tabella_attesa}' ({record} record)")
-                tutto_ok = False
+                print(f"  {i+1}. ❌ Trovata '{tabella_trovata}' invece di '{tabella_attesa}' "
+                      f"({record[tabella_trovata]} record)")
         else:
             print(f"  {i+1}. ❌ {tabella_attesa} - MANCANTE!")
-            tutto_ok = False
     
     # Tabelle extra non previste
-    if len(tabelle_trovate) > len(tabelle_attese):
-        print(f"\n⚠ Trovate {len(tabelle_trovate) - len(tabelle_attese)} tabelle extra:")
-        for tabella in tabelle_trovate[len(tabelle_attese):]:
+    if len(tabelle_trovate) > len(ORDINE_TABELLE):
+        print(f"\n⚠ Trovate {len(tabelle_trovate) - len(ORDINE_TABELLE)} tabelle extra:")
+        for tabella in tabelle_trovate[len(ORDINE_TABELLE):]:
             print(f"  - {tabella}")
     
     # Verifica specifiche per la tabella Log
@@ -104,25 +83,26 @@ def verifica_file_fuelio(file_path: str = "vehicle-1-sync-extended.csv"):
     print("VERIFICA TABELLA LOG")
     print("=" * 60)
     
-    if 'Log' in righe_per_tabella:
-        record_log = righe_per_tabella['Log']
+    if 'Log' in record:
+        record_log = record['Log']
         print(f"\nRecord nel Log: {record_log}")
         
-        if record_log == 1069:
-            print(f"  ✅ Numero corretto! (672 storici + 397 recenti)")
-        elif record_log == 397:
-            print(f"  ⚠ ATTENZIONE: Sembra il Log originale, non quello esteso!")
-            print(f"     Assicurati di aver usato Log_unificato.csv")
-            tutto_ok = False
-        elif record_log == 672:
-            print(f"  ⚠ ATTENZIONE: Sembra contenere solo i dati storici!")
-            tutto_ok = False
-        else:
-            print(f"  ⚠ Numero inaspettato di record")
+        if record_attesi is not None:
+            if record_log == record_attesi:
+                print(f"  ✅ Numero corretto! ({record_attesi} attesi)")
+            else:
+                print(f"  ❌ Attesi {record_attesi} record, trovati {record_log}")
+                tutto_ok = False
     else:
         print("\n❌ Tabella Log non trovata!")
         tutto_ok = False
     
+    # Validazione delle righe con gli schemi
+    print("\n" + "=" * 60)
+    print("VALIDAZIONE RIGHE")
+    print("=" * 60)
+    stampa_validazione(risultato, mostra_tabelle=False)
+    
     # Riepilogo finale
     print("\n" + "=" * 60)
     print("RIEPILOGO")
@@ -132,13 +112,13 @@ def verifica_file_fuelio(file_path: str = "vehicle-1-sync-extended.csv"):
         print("\n✅ TUTTO OK!")
         print(f"   Il file '{file_path.name}' è pronto per essere importato in Fuelio")
         print(f"\n   Statistiche:")
-        print(f"   - Tabelle: {len(tabelle_trovate)}/{len(tabelle_attese)}")
-        print(f"   - Record totali: {sum(righe_per_tabella.values()):,}")
-        print(f"   - Record nel Log: {righe_per_tabella.get('Log', 0):,}")
+        print(f"   - Tabelle: {len(tabelle_trovate)}/{len(ORDINE_TABELLE)}")
+        print(f"   - Record totali: {sum(record.values()):,}")
+        print(f"   - Record nel Log: {record.get('Log', 0):,}")
         
         print(f"\n   ⚠ RICORDA:")
         print(f"   - Fai un BACKUP del tuo database Fuelio prima di importare")
-        print(f"   - Il file contiene {righe_per_tabella.get('Log', 0)} rifornimenti (15 anni di dati)")
+        print(f"   - Il file contiene {record.get('Log', 0)} rifornimenti")
     else:
         print("\n❌ PROBLEMI RILEVATI!")
         print(f"   Controlla i messaggi sopra per i dettagli")
@@ -4,97 +4,371 @@ Script per verificare il Log unificato creato.
 Controlla:
 - Presenza di NaN nei campi del distributore
 - Statistiche sui distributori trovati/non trovati
+- Periodo, chilometraggio e consumo medio per serbatoio
+- UniqueId sequenziali
+
+Il Log viene letto a blocchi di byte (allineati all'inizio di un record),
+elaborati anche in parallelo su un pool di processi. Ogni blocco produce
+statistiche combinabili (conteggi, min/max, media e varianza con la formula
+di Welford/Chan), quindi la memoria usata non dipende dalla dimensione del Log.
 """
 
-import pandas as pd
+import argparse
+import csv
+import io
+import os
+import re
+from functools import reduce
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+
+from consumi import COLONNA_CONSUMO
+from pool_processi import mappa_in_processi
+from schemi_fuelio import leggi_tabella_fuelio
+from strumentazione import strumenta
+
+
+# Dimensione massima di un blocco letto da un processo (byte)
+DIMENSIONE_BLOCCO = 32 * 1024 * 1024
+
+# Righe di esempio senza distributore e salti di UniqueId da conservare
+RIGHE_ESEMPIO = 5
+MASSIMO_SALTI = 10
+
+COLONNE_ESEMPIO = ['Data', 'Odo (km)', 'kg', 'StationID (optional)',
+                   'latitude (optional)', 'longitude (optional)', 'City (optional)']
+
+# Byte letti alla volta per cercare l'inizio di un blocco
+FINESTRA_RICERCA = 1024 * 1024
+
+# Inizio di un record del Log (fine riga seguito dalla data del rifornimento):
+# un fine riga dentro le note tra virgolette non è seguito da una data
+INIZIO_RECORD = re.compile(rb'\n"?\d{4}-\d{2}-\d{2} \d{2}:\d{2}"?,')
+
+
+def statistiche_vuote() -> dict:
+    """
+    Statistiche di un Log senza righe (elemento neutro di unisci_statistiche).
+
+    Returns:
+        Dizionario delle statistiche
+    """
+    return {
+        'righe': 0,
+        'con_station': 0,
+        'con_coordinate': 0,
+        'con_city': 0,
+        'data_min': None,
+        'data_max': None,
+        'odo_min': np.nan,
+        'odo_max': np.nan,
+        'senza_distro': pd.DataFrame(columns=COLONNE_ESEMPIO),
+        'uid_primo': None,
+        'uid_ultimo': 0,
+        'salti': [],
+        'numero_salti': 0,
+        'consumi': {},
+    }
+
+
+def statistiche_blocco(df: pd.DataFrame) -> dict:
+    """
+    Calcola le statistiche combinabili di un blocco del Log.
+
+    Args:
+        df: Righe consecutive del Log (indice = posizione nel blocco)
+
+    Returns:
+        Dizionario delle statistiche (vedi statistiche_vuote)
+    """
+    statistiche = statistiche_vuote()
+    if df.empty:
+        return statistiche
+
+    df = df.reset_index(drop=True)
+    city = df['City (optional)']
+    date = df['Data'].dropna()
+    odo = df['Odo (km)'].to_numpy(dtype=np.float64, na_value=np.nan)
+    uid = df['UniqueId'].to_numpy(dtype=np.int64)
+
+    # Salti di UniqueId dentro il blocco (quelli tra blocchi li trova unisci_statistiche)
+    salti = np.flatnonzero(np.diff(uid) != 1) + 1
+
+    consumi = {}
+    consumo = pd.to_numeric(df[COLONNA_CONSUMO], errors='coerce')
+    validi = consumo > 0
+    for serbatoio, valori in consumo[validi].groupby(df['TankNumber'][validi]):
+        valori = valori.to_numpy(dtype=np.float64)
+        media = valori.mean()
+        consumi[int(serbatoio)] = (len(valori), media, ((valori - media) ** 2).sum())
+
+    statistiche.update({
+        'righe': len(df),
+        'con_station': int(df['StationID (optional)'].notna().sum()),
+        'con_coordinate': int(df['latitude (optional)'].notna().sum()),
+        'con_city': int((city.notna() & (city != '')).sum()),
+        'data_min': date.min() if len(date) else None,
+        'data_max': date.max() if len(date) else None,
+        'odo_min': np.nanmin(odo) if np.isfinite(odo).any() else np.nan,
+        'odo_max': np.nanmax(odo) if np.isfinite(odo).any() else np.nan,
+        'senza_distro': df.loc[df['StationID (optional)'].isna(), COLONNE_ESEMPIO].head(RIGHE_ESEMPIO),
+        'uid_primo': int(uid[0]),
+        'uid_ultimo': int(uid[-1]),
+        'salti': [(int(i), int(uid[i - 1]) + 1, int(uid[i])) for i in salti[:MASSIMO_SALTI]],
+        'numero_salti': len(salti),
+        'consumi': consumi,
+    })
+    return statistiche
+
+
+def _unisci_varianza(a: tuple, b: tuple) -> tuple:
+    """
+    Combina due accumulatori (n, media, M2) di Welford (formula di Chan).
+    """
+    n_a, media_a, m2_a = a
+    n_b, media_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = media_b - media_a
+    return n, media_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+
+
+def _primo(funzione, a, b):
+    """
+    Applica min/max ignorando i valori mancanti (None).
+    """
+    valori = [v for v in (a, b) if v is not None]
+    return funzione(valori) if valori else None
+
+
+def unisci_statistiche(a: dict, b: dict) -> dict:
+    """
+    Combina le statistiche di due parti consecutive del Log (a prima di b).
+
+    Args:
+        a: Statistiche della prima parte
+        b: Statistiche della parte successiva
+
+    Returns:
+        Statistiche dell'unione delle due parti
+    """
+    scostamento = a['righe']
+
+    salti = list(a['salti'])
+    numero_salti = a['numero_salti'] + b['numero_salti']
+    if b['righe'] and b['uid_primo'] != a['uid_ultimo'] + 1:
+        # Salto al confine tra le due parti (o primo UniqueId diverso da 1)
+        salti.append((scostamento, a['uid_ultimo'] + 1, b['uid_primo']))
+        numero_salti += 1
+    salti += [(scostamento + i, atteso, trovato) for i, atteso, trovato in b['salti']]
+
+    # Prime righe senza distributore, con la posizione nell'unione come indice
+    senza_distro = a['senza_distro']
+    if len(senza_distro) < RIGHE_ESEMPIO and not b['senza_distro'].empty:
+        esempi_b = b['senza_distro'].set_axis(b['senza_distro'].index + scostamento)
+        senza_distro = pd.concat([senza_distro, esempi_b]) if not senza_distro.empty else esempi_b
+
+    consumi = dict(a['consumi'])
+    for serbatoio, accumulatore in b['consumi'].items():
+        consumi[serbatoio] = _unisci_varianza(consumi.get(serbatoio, (0, 0.0, 0.0)), accumulatore)
 
-print("=" * 60)
-print("VERIFICA LOG UNIFICATO")
-print("=" * 60)
+    return {
+        'righe': a['righe'] + b['righe'],
+        'con_station': a['con_station'] + b['con_station'],
+        'con_coordinate': a['con_coordinate'] + b['con_coordinate'],
+        'con_city': a['con_city'] + b['con_city'],
+        'data_min': _primo(min, a['data_min'], b['data_min']),
+        'data_max': _primo(max, a['data_max'], b['data_max']),
+        'odo_min': np.fmin(a['odo_min'], b['odo_min']),
+        'odo_max': np.fmax(a['odo_max'], b['odo_max']),
+        'senza_distro': senza_distro.head(RIGHE_ESEMPIO),
+        'uid_primo': a['uid_primo'] if a['righe'] else b['uid_primo'],
+        'uid_ultimo': b['uid_ultimo'] if b['righe'] else a['uid_ultimo'],
+        'salti': salti[:MASSIMO_SALTI],
+        'numero_salti': numero_salti,
+        'consumi': consumi,
+    }
 
-try:
-    df = pd.read_csv('Log_unificato.csv')
-    
+
+def confini_blocchi(file_log: Path, dimensione_blocco: int = DIMENSIONE_BLOCCO) -> tuple:
+    """
+    Divide il Log in blocchi di byte che iniziano all'inizio di un record.
+
+    Args:
+        file_log: Log unificato
+        dimensione_blocco: Dimensione indicativa di un blocco (byte)
+
+    Returns:
+        Tupla (colonne dell'intestazione, lista di (inizio, fine) in byte)
+    """
+    dimensione = file_log.stat().st_size
+    with open(file_log, 'rb') as f:
+        intestazione = f.readline()
+        confini = [len(intestazione)]
+        posizione = confini[0] + dimensione_blocco
+        while posizione < dimensione:
+            # Cerca il primo inizio di record dopo la posizione indicativa
+            f.seek(posizione - 1)
+            trovato = None
+            while True:
+                finestra = f.read(FINESTRA_RICERCA)
+                corrispondenza = INIZIO_RECORD.search(finestra)
+                if corrispondenza:
+                    trovato = f.tell() - len(finestra) + corrispondenza.start() + 1
+                    break
+                if len(finestra) < FINESTRA_RICERCA:
+                    break
+                # Riparte poco prima della fine: un inizio di record può essere a cavallo
+                f.seek(-32, os.SEEK_CUR)
+            if trovato is None:
+                break
+            confini.append(trovato)
+            posizione = trovato + dimensione_blocco
+        confini.append(dimensione)
+
+    colonne = next(csv.reader([intestazione.decode('utf-8')]))
+    return colonne, list(zip(confini[:-1], confini[1:]))
+
+
+def _statistiche_intervallo(file_log: Path, colonne: list, inizio: int, fine: int) -> dict:
+    """
+    Legge un blocco di byte del Log e ne calcola le statistiche.
+    """
+    with open(file_log, 'rb') as f:
+        f.seek(inizio)
+        dati = f.read(fine - inizio)
+    if not dati.strip():
+        return statistiche_vuote()
+    df = leggi_tabella_fuelio(io.BytesIO(dati), 'Log', uso='verifica', header=None, names=colonne)
+    return statistiche_blocco(df)
+
+
+@strumenta(file_letti=('file_log',))
+def calcola_statistiche(file_log: str = 'Log_unificato.csv', processi: int = None,
+                        dimensione_blocco: int = DIMENSIONE_BLOCCO) -> dict:
+    """
+    Calcola le statistiche del Log unificato a blocchi, anche in parallelo.
+
+    Args:
+        file_log: Log unificato
+        processi: Numero massimo di processi (default: numero di core; 1 = nessun pool)
+        dimensione_blocco: Dimensione indicativa di un blocco (byte)
+
+    Returns:
+        Dizionario delle statistiche (vedi statistiche_vuote)
+    """
+    file_log = Path(file_log)
+    colonne, blocchi = confini_blocchi(file_log, dimensione_blocco)
+    processi = processi or os.cpu_count() or 1
+    if len(blocchi) <= 1:
+        processi = 1
+
+    risultati = mappa_in_processi(_statistiche_intervallo,
+                                  ((file_log, colonne, inizio, fine) for inizio, fine in blocchi), processi)
+    return reduce(unisci_statistiche, risultati, statistiche_vuote())
+
+
+def stampa_statistiche(statistiche: dict):
+    """
+    Stampa il rapporto di verifica del Log unificato.
+
+    Args:
+        statistiche: Valore restituito da calcola_statistiche
+    """
+    totale = statistiche['righe']
     print(f"\n✅ File caricato con successo!")
-    print(f"   Totale rifornimenti: {len(df)}")
-    
+    print(f"   Totale rifornimenti: {totale}")
+    if totale == 0:
+        print("\n⚠ Il Log non contiene rifornimenti")
+        return
+
     print("\n" + "=" * 60)
     print("STATISTICHE DISTRIBUTORI")
     print("=" * 60)
-    
-    # Conta rifornimenti con/senza distributore
-    con_station = df['StationID (optional)'].notna().sum()
-    senza_station = df['StationID (optional)'].isna().sum()
-    
-    print(f"\nStationID:")
-    print(f"  ✅ Con distributore: {con_station} ({con_station/len(df)*100:.1f}%)")
-    print(f"  ⚠ Senza distributore (NaN): {senza_station} ({senza_station/len(df)*100:.1f}%)")
-    
-    # Conta rifornimenti con/senza coordinate
-    con_lat = df['latitude (optional)'].notna().sum()
-    senza_lat = df['latitude (optional)'].isna().sum()
-    
-    print(f"\nCoordinate:")
-    print(f"  ✅ Con coordinate: {con_lat} ({con_lat/len(df)*100:.1f}%)")
-    print(f"  ⚠ Senza coordinate (NaN): {senza_lat} ({senza_lat/len(df)*100:.1f}%)")
-    
-    # Conta rifornimenti con/senza City
-    con_city = (df['City (optional)'].notna() & (df['City (optional)'] != '')).sum()
-    senza_city = (~df['City (optional)'].notna() | (df['City (optional)'] == '')).sum()
-    
-    print(f"\nCity:")
-    print(f"  ✅ Con nome: {con_city} ({con_city/len(df)*100:.1f}%)")
-    print(f"  ⚠ Senza nome: {senza_city} ({senza_city/len(df)*100:.1f}%)")
-    
+
+    for titolo, con, etichetta_con, etichetta_senza in [
+            ('StationID', statistiche['con_station'], 'Con distributore', 'Senza distributore (NaN)'),
+            ('Coordinate', statistiche['con_coordinate'], 'Con coordinate', 'Senza coordinate (NaN)'),
+            ('City', statistiche['con_city'], 'Con nome', 'Senza nome')]:
+        senza = totale - con
+        print(f"\n{titolo}:")
+        print(f"  ✅ {etichetta_con}: {con} ({con/totale*100:.1f}%)")
+        print(f"  ⚠ {etichetta_senza}: {senza} ({senza/totale*100:.1f}%)")
+
     print("\n" + "=" * 60)
     print("PERIODO E CHILOMETRAGGIO")
     print("=" * 60)
-    
+
     print(f"\nData:")
-    print(f"  Primo rifornimento: {df['Data'].min()}")
-    print(f"  Ultimo rifornimento: {df['Data'].max()}")
-    
+    print(f"  Primo rifornimento: {statistiche['data_min']}")
+    print(f"  Ultimo rifornimento: {statistiche['data_max']}")
+
     print(f"\nChilometraggio:")
-    print(f"  Iniziale: {df['Odo (km)'].min():.0f} km")
-    print(f"  Finale: {df['Odo (km)'].max():.0f} km")
-    print(f"  Totale percorso: {df['Odo (km)'].max() - df['Odo (km)'].min():.0f} km")
-    
+    print(f"  Iniziale: {statistiche['odo_min']:.0f} km")
+    print(f"  Finale: {statistiche['odo_max']:.0f} km")
+    print(f"  Totale percorso: {statistiche['odo_max'] - statistiche['odo_min']:.0f} km")
+
+    if statistiche['consumi']:
+        print(f"\nConsumo ({COLONNA_CONSUMO}):")
+        for serbatoio, (n, media, m2) in sorted(statistiche['consumi'].items()):
+            deviazione = np.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+            print(f"  Serbatoio {serbatoio}: media {media:.2f} km/unità, "
+                  f"deviazione standard {deviazione:.2f} ({n} valori)")
+
     print("\n" + "=" * 60)
     print("PRIMI RIFORNIMENTI SENZA DISTRIBUTORE")
     print("=" * 60)
-    
-    senza_distro = df[df['StationID (optional)'].isna()].head(5)
+
+    senza_distro = statistiche['senza_distro']
     if len(senza_distro) > 0:
         print(f"\nPrime {len(senza_distro)} righe senza distributore:")
-        print(senza_distro[['Data', 'Odo (km)', 'kg', 'StationID (optional)', 
-                           'latitude (optional)', 'longitude (optional)', 'City (optional)']].to_string())
+        print(senza_distro.to_string())
     else:
         print("\n✅ Tutti i rifornimenti hanno un distributore associato!")
-    
+
     print("\n" + "=" * 60)
     print("VERIFICA UNIQUEID")
     print("=" * 60)
-    
-    # Verifica UniqueId sia sequenziale
-    expected_ids = list(range(1, len(df) + 1))
-    actual_ids = df['UniqueId'].tolist()
-    
-    if expected_ids == actual_ids:
-        print(f"  ✅ UniqueId sequenziali da 1 a {len(df)}")
+
+    if statistiche['numero_salti'] == 0:
+        print(f"  ✅ UniqueId sequenziali da 1 a {totale}")
     else:
-        print(f"  ❌ UniqueId NON sequenziali!")
-        # Trova i primi ID non corretti
-        for i, (exp, act) in enumerate(zip(expected_ids[:10], actual_ids[:10])):
-            if exp != act:
-                print(f"     Posizione {i}: atteso {exp}, trovato {act}")
-    
+        print(f"  ❌ UniqueId NON sequenziali! ({statistiche['numero_salti']} salti)")
+        # Primi ID non corretti
+        for posizione, atteso, trovato in statistiche['salti']:
+            print(f"     Posizione {posizione}: atteso {atteso}, trovato {trovato}")
+
     print("\n" + "=" * 60)
-    
-except FileNotFoundError:
-    print("\n❌ ERRORE: File 'Log_unificato.csv' non trovato!")
-    print("   Esegui prima 'python unisci_log_storico.py'")
-except Exception as e:
-    print(f"\n❌ ERRORE: {e}")
-    import traceback
-    traceback.print_exc()
+
+
+def main(argv: list = None):
+    """
+    Verifica il Log unificato da riga di comando.
+    """
+    parser = argparse.ArgumentParser(description="Verifica il Log unificato")
+    parser.add_argument('file_log', nargs='?', default='Log_unificato.csv',
+                        help="Log unificato (default: Log_unificato.csv)")
+    parser.add_argument('--processi', type=int, default=None,
+                        help="numero massimo di processi (default: numero di core)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("VERIFICA LOG UNIFICATO")
+    print("=" * 60)
+
+    try:
+        stampa_statistiche(calcola_statistiche(args.file_log, processi=args.processi))
+    except FileNotFoundError:
+        print(f"\n❌ ERRORE: File '{args.file_log}' non trovato!")
+        print("   Esegui prima 'python unisci_log_storico.py'")
+    except Exception as e:
+        print(f"\n❌ ERRORE: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()